@@ -0,0 +1,251 @@
+"""Конвеєр аватарів: перевірка під час читання, мініатюра, збереження у фоні.
+
+Ендпоінт читає файл частинами (ліміт ``AVATAR_MAX_BYTES``, тип — за сигнатурою
+файлу, а не за ``Content-Type``), позначає користувача ``avatar_status="pending"``
+і одразу відповідає ``202``. Зменшення до ``AVATAR_SIZE`` (Pillow, якщо встановлений)
+і завантаження у сховище виконуються в пулі потоків; після цього ``avatar_url``
+оновлюється, а статус стає ``ready`` (або ``failed``).
+
+Сховище обирається ``AVATAR_STORAGE``: ``cloudinary``, ``local`` (диск, роздається
+з ``AVATAR_LOCAL_URL``), ``s3`` (будь-який S3-сумісний, потрібен boto3) або ``auto`` —
+Cloudinary, якщо налаштований.
+"""
+from __future__ import annotations
+import functools
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Optional, Protocol
+from fastapi import UploadFile
+from . import crud
+from .database import SessionLocal
+from .settings import settings
+
+try:  # опційно: без Pillow зберігається оригінал
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover
+    Image = None
+
+log = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+_EXT = {"image/png": "png", "image/jpeg": "jpg", "image/gif": "gif", "image/webp": "webp"}
+
+
+class AvatarError(Exception):
+    """Помилка, яку роутер перетворює на HTTP-відповідь."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code, self.detail = status_code, detail
+
+
+def sniff_image(head: bytes) -> Optional[str]:
+    """MIME-тип за першими байтами файлу (PNG, JPEG, GIF, WebP)."""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+async def read_image(file: UploadFile, max_bytes: int) -> tuple[bytes, str]:
+    """Читає аплоуд частинами і зупиняється, щойно перевищено ліміт або тип не картинка."""
+    if file.size is not None and file.size > max_bytes:
+        raise AvatarError(413, f"Avatar is larger than {max_bytes} bytes")
+    chunks: list[bytes] = []
+    total, mime = 0, None
+    while chunk := await file.read(CHUNK_SIZE):
+        if mime is None:
+            mime = sniff_image(chunk)
+            if mime is None:
+                raise AvatarError(415, "Avatar must be a PNG, JPEG, GIF or WebP image")
+        total += len(chunk)
+        if total > max_bytes:
+            raise AvatarError(413, f"Avatar is larger than {max_bytes} bytes")
+        chunks.append(chunk)
+    if mime is None:
+        raise AvatarError(400, "Empty file")
+    return b"".join(chunks), mime
+
+
+def make_thumbnail(data: bytes, mime: str, size: int) -> tuple[bytes, str]:
+    """Квадратна мініатюра ``size``×``size``; без Pillow повертає оригінал."""
+    if Image is None or size <= 0:
+        return data, mime
+    with Image.open(io.BytesIO(data)) as img:
+        if img.width * img.height > settings.AVATAR_MAX_PIXELS:
+            raise ValueError(f"image is too large: {img.width}x{img.height}")
+        img = ImageOps.exif_transpose(img)
+        thumb = ImageOps.fit(img, (size, size), method=Image.Resampling.LANCZOS)
+        out = io.BytesIO()
+        if thumb.mode in ("RGBA", "LA", "P"):
+            thumb.convert("RGBA").save(out, format="PNG", optimize=True)
+            return out.getvalue(), "image/png"
+        thumb.convert("RGB").save(out, format="JPEG", quality=85, optimize=True)
+        return out.getvalue(), "image/jpeg"
+
+
+# --- Сховища ---
+
+class Storage(Protocol):
+    def save(self, user_id: int, data: bytes, mime: str) -> str:
+        """Зберігає аватар і повертає публічний URL."""
+
+
+def _version(data: bytes) -> str:
+    # у URL для скидання кешу браузера/CDN: ім'я файлу при перезаписі не змінюється
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+class LocalStorage:
+    def __init__(self, directory: str, base_url: str):
+        self.directory, self.base_url = Path(directory), base_url.rstrip("/")
+
+    def save(self, user_id: int, data: bytes, mime: str) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        name = f"{user_id}.{_EXT[mime]}"
+        for old in self.directory.glob(f"{user_id}.*"):
+            if old.name != name:
+                old.unlink(missing_ok=True)
+        tmp = self.directory / f".{name}.tmp"
+        tmp.write_bytes(data)
+        tmp.replace(self.directory / name)  # атомарно: читач не побачить напівзаписаний файл
+        return f"{self.base_url}/{name}?v={_version(data)}"
+
+
+class CloudinaryStorage:
+    def save(self, user_id: int, data: bytes, mime: str) -> str:
+        import cloudinary.uploader
+        result = cloudinary.uploader.upload(
+            io.BytesIO(data), folder="contacts_api/avatars", public_id=str(user_id),
+            overwrite=True, resource_type="image",
+        )
+        url = result.get("secure_url")
+        if not url:
+            raise RuntimeError("Cloudinary returned no secure_url")
+        return url
+
+
+class S3Storage:
+    def __init__(self, bucket: str, endpoint_url: Optional[str], public_url: Optional[str]):
+        import boto3
+        self.client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.bucket = bucket
+        self.public_url = (public_url or f"{endpoint_url or 'https://s3.amazonaws.com'}/{bucket}").rstrip("/")
+
+    def save(self, user_id: int, data: bytes, mime: str) -> str:
+        key = f"avatars/{user_id}.{_EXT[mime]}"
+        self.client.put_object(Bucket=self.bucket, Key=key, Body=data, ContentType=mime,
+                               CacheControl="public, max-age=31536000")
+        return f"{self.public_url}/{key}?v={_version(data)}"
+
+
+@functools.lru_cache(maxsize=4)
+def _cloudinary_configured(url: Optional[str], name: Optional[str], key: Optional[str], secret: Optional[str]) -> bool:
+    """Конфіг Cloudinary розбирається один раз на набір налаштувань, а не на кожен аплоуд."""
+    import cloudinary
+    cloudinary.config(cloudinary_url=url, secure=True)
+    cfg = cloudinary.config()
+    # якщо по URL не налаштовано — пробуємо окремі змінні
+    if not (cfg.api_key and cfg.api_secret and cfg.cloud_name):
+        cloudinary.config(cloud_name=name, api_key=key, api_secret=secret, secure=True)
+        cfg = cloudinary.config()
+    return bool(cfg.api_key and cfg.api_secret and cfg.cloud_name)
+
+
+@functools.lru_cache(maxsize=4)
+def _storage(kind: str, *config: Optional[str]) -> Storage:
+    if kind == "local":
+        return LocalStorage(*config)
+    if kind == "s3":
+        return S3Storage(*config)
+    return CloudinaryStorage()
+
+
+def get_storage() -> Storage:
+    """Поточне сховище; 503, якщо обране сховище не налаштоване."""
+    kind = settings.AVATAR_STORAGE
+    if kind == "local":
+        return _storage("local", settings.AVATAR_LOCAL_DIR, settings.AVATAR_LOCAL_URL)
+    if kind == "s3":
+        if not settings.AVATAR_S3_BUCKET:
+            raise AvatarError(503, "S3 storage misconfigured: set AVATAR_S3_BUCKET")
+        try:
+            return _storage("s3", settings.AVATAR_S3_BUCKET, settings.AVATAR_S3_ENDPOINT_URL, settings.AVATAR_S3_PUBLIC_URL)
+        except ImportError:
+            raise AvatarError(503, "S3 storage requires boto3")
+    if not _cloudinary_configured(settings.CLOUDINARY_URL, settings.CLOUDINARY_CLOUD_NAME,
+                                  settings.CLOUDINARY_API_KEY, settings.CLOUDINARY_API_SECRET):
+        raise AvatarError(503, "Cloudinary misconfigured: check CLOUDINARY_URL or CLOUDINARY_* vars")
+    return _storage("cloudinary")
+
+
+# --- Фонова обробка ---
+
+_executor: ThreadPoolExecutor | None = None
+_lock = threading.Lock()
+_pending: set[Future] = set()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=settings.AVATAR_WORKERS, thread_name_prefix="avatar")
+    return _executor
+
+
+def _process(user_id: int, data: bytes, mime: str, storage: Storage) -> None:
+    try:
+        thumb, thumb_mime = make_thumbnail(data, mime, settings.AVATAR_SIZE)
+        url = storage.save(user_id, thumb, thumb_mime)
+    except Exception as e:
+        log.warning("Avatar processing failed for user %s: %s", user_id, e)
+        url = None
+    with SessionLocal() as db:
+        crud.set_avatar_status(db, user_id, "ready" if url else "failed", url)
+
+
+def submit(user_id: int, data: bytes, mime: str, storage: Storage) -> Future:
+    """Ставить обробку аватара в пул потоків; відповідь клієнту не чекає на неї."""
+    fut = _get_executor().submit(_process, user_id, data, mime, storage)
+    with _lock:
+        _pending.add(fut)
+    fut.add_done_callback(lambda f: _pending.discard(f))
+    return fut
+
+
+def wait_idle(timeout: float | None = None) -> None:
+    """Чекає завершення всіх поставлених задач (тести, graceful shutdown)."""
+    with _lock:
+        pending = set(_pending)
+    wait(pending, timeout=timeout)
+
+
+def shutdown() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def _after_fork() -> None:
+    # потоки пулу батька не переживають fork; задачі батька — не наші
+    global _executor, _lock
+    _executor, _lock = None, threading.Lock()
+    _pending.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
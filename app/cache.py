@@ -2,24 +2,39 @@
 
 Функції у цьому модулі інкапсулюють взаємодію з Redis, щоб повторно
 використовувати підключення та спростити тестування (можна підмінити клієнт). 
+
+Гарячі ключі (користувачі, meta) додатково тримаються в пам'яті процесу
+(:data:`local`); інвалідизація розсилається іншим воркерам через pub/sub.
 """
 from __future__ import annotations
+import hashlib
 import json
-from typing import Optional, Any, Dict
+import logging
+import os
+import threading
+from typing import Optional, Any, Awaitable, Callable, Dict, Mapping
+from starlette.concurrency import run_in_threadpool
 from .settings import settings
+from .metrics import Gauge, register, timed_redis
+from .local_cache import MISSING, LocalCache, SingleFlight
 
-try:
-    import redis  # type: ignore
-except Exception:  # pragma: no cover
-    redis = None  # дозволяє тестам працювати без реального Redis
+log = logging.getLogger(__name__)
 
+# Модуль redis імпортується лише при першому get_redis() з REDIS_URL (тести підміняють його)
+redis = None
 _client = None
 
 def get_redis():
     """Повертає singleton-клієнт Redis або None, якщо REDIS_URL не задано."""
-    global _client
-    if not settings.REDIS_URL or redis is None:
+    global _client, redis
+    if not settings.REDIS_URL:
         return None
+    if redis is None:
+        try:
+            import redis as redis_module  # type: ignore
+        except Exception:  # pragma: no cover
+            return None  # дозволяє працювати без встановленого redis
+        redis = redis_module
     if _client is None:
         # підтримуємо і redis.from_url, і redis.Redis.from_url
         if hasattr(redis, "from_url"):
@@ -28,37 +43,286 @@ def get_redis():
             _client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
     return _client
 
-def cache_user(user: Any, ttl: int | None = None) -> None:
-    """Кешуємо користувача за ключем user:{id}."""
+# --- In-process рівень і pub/sub інвалідизація ---
+
+INVALIDATION_CHANNEL = "cache:invalidate"
+local = LocalCache(maxsize=settings.LOCAL_CACHE_MAX_KEYS, ttl=settings.LOCAL_CACHE_TTL_SEC)
+flights = SingleFlight()
+
+register(Gauge(
+    "local_cache", "In-process cache tier counters",
+    lambda: {**{(k,): float(v) for k, v in local.stats.items()},
+             ("size",): float(len(local)), ("coalesced",): float(flights.coalesced)},
+    ("stat",),
+))
+
+def _local_enabled() -> bool:
+    # без Redis немає міжворкерної інвалідизації — лишаємо поведінку без рівня в пам'яті
+    return settings.LOCAL_CACHE_TTL_SEC > 0 and get_redis() is not None
+
+def _publish_invalidation(r, *keys: str) -> None:
+    for key in keys:
+        local.delete(key)
+    try:
+        r.publish(INVALIDATION_CHANNEL, json.dumps(keys))
+    except Exception as e:  # інші воркери доживуть до TTL
+        log.warning("Cache invalidation publish failed: %s", e)
+
+class InvalidationListener(threading.Thread):
+    """Фоновий потік: видаляє з :data:`local` ключі, інвалідовані іншими воркерами.
+
+    Після обриву з'єднання весь рівень у пам'яті очищується (повідомлення могли загубитися).
+    """
+
+    def __init__(self, client):
+        super().__init__(name="cache-invalidation", daemon=True)
+        self.client = client
+        self._stopping = threading.Event()
+        self._pubsub = None
+
+    def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                self._pubsub.subscribe(INVALIDATION_CHANNEL)
+                local.clear()
+                while not self._stopping.is_set():
+                    msg = self._pubsub.get_message(timeout=1.0)
+                    if msg and msg.get("type") == "message":
+                        for key in json.loads(msg["data"]):
+                            local.delete(key)
+            except Exception as e:
+                local.clear()
+                log.warning("Cache invalidation listener error: %s", e)
+                self._stopping.wait(1.0)
+            finally:
+                if self._pubsub is not None:
+                    try:
+                        self._pubsub.close()
+                    except Exception:
+                        pass
+
+    def stop(self) -> None:
+        self._stopping.set()
+
+_listener: Optional[InvalidationListener] = None
+
+def start_invalidation_listener() -> None:
+    global _listener
+    r = get_redis()
+    if r is None or settings.LOCAL_CACHE_TTL_SEC <= 0 or _listener is not None:
+        return
+    _listener = InvalidationListener(r)
+    _listener.start()
+
+def stop_invalidation_listener() -> None:
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener.join(timeout=3)
+        _listener = None
+
+def _after_fork() -> None:
+    # Пул з'єднань Redis і потік-слухач батька в дочірньому процесі непридатні;
+    # кеш у пам'яті міг застаріти, поки інвалідизації отримував батько
+    global _client, _listener
+    _client = None
+    _listener = None
+    local.clear()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+def _user_keys(user_id: int) -> tuple[str, str]:
+    """Ключ payload користувача та ключ його лічильника поколінь."""
+    return f"user:{user_id}", f"user:{user_id}:gen"
+
+def _iso(value: Any) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+@timed_redis
+def cache_user(user: Any, ttl: int | None = None, gen: int | None = None) -> None:
+    """Кешуємо користувача за ключем user:{id}.
+
+    ``gen`` — покоління, прочитане *до* звернення до БД (див. :func:`lookup_user`).
+    Якщо між читанням з БД і записом у кеш відбулась інвалідизація, запис
+    отримає застаріле покоління і ніколи не буде відданий.
+    """
     r = get_redis()
     if not r or not user:
         return
+    key, gen_key = _user_keys(user.id)
+    if gen is None:
+        gen = int(r.get(gen_key) or 0)
     data = {
         "id": user.id,
         "email": user.email,
         "is_active": user.is_active,
         "is_verified": user.is_verified,
         "avatar_url": user.avatar_url,
+        "avatar_status": getattr(user, "avatar_status", None),
         "role": getattr(user, "role", "user"),
+        "created_at": _iso(getattr(user, "created_at", None)),
+        "updated_at": _iso(getattr(user, "updated_at", None)),
+        "gen": gen,
     }
-    r.setex(f"user:{user.id}", ttl or settings.CACHE_USER_TTL_SEC, json.dumps(data))
+    r.setex(key, ttl or settings.CACHE_USER_TTL_SEC, json.dumps(data))
 
-def get_cached_user(user_id: int) -> Optional[Dict[str, Any]]:
-    """Читає з кешу користувача за ідентифікатором."""
+@timed_redis
+def lookup_user(user_id: int) -> tuple[Optional[Dict[str, Any]], int]:
+    """Одним MGET читає payload користувача і поточне покоління.
+
+    Повертає ``(payload | None, gen)``; payload з іншим поколінням вважається промахом.
+    """
     r = get_redis()
     if not r:
-        return None
-    s = r.get(f"user:{user_id}")
+        return None, 0
+    key, gen_key = _user_keys(user_id)
+    if _local_enabled():
+        hit = local.get(key)
+        if hit is not MISSING:
+            return hit
+    token = local.token(key)
+    s, raw_gen = r.mget(key, gen_key)
+    gen = int(raw_gen or 0)
     if not s:
-        return None
+        return None, gen
     try:
-        return json.loads(s)
+        data = json.loads(s)
     except Exception:
+        return None, gen
+    if data.get("gen", 0) != gen:
+        return None, gen
+    if _local_enabled():
+        local.set(key, (data, gen), token=token)
+    return data, gen
+
+def peek_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """Лише рівень у пам'яті, без мережі (можна викликати з event loop)."""
+    if not _local_enabled():
         return None
+    hit = local.get(_user_keys(user_id)[0])
+    return None if hit is MISSING else hit[0]
 
+def get_cached_user(user_id: int) -> Optional[Dict[str, Any]]:
+    """Читає з кешу користувача за ідентифікатором."""
+    return lookup_user(user_id)[0]
+
+@timed_redis
 def invalidate_user(user_id: int) -> None:
-    """Видаляє кеш користувача (коли змінюємо профіль/аватар)."""
+    """Видаляє кеш користувача (роль, верифікація, пароль, аватар).
+
+    Окрім видалення ключа збільшуємо покоління, щоб паралельний запит, який
+    прочитав старі дані з БД, не зміг покласти їх назад у кеш.
+    """
+    r = get_redis()
+    if not r:
+        return
+    key, gen_key = _user_keys(user_id)
+    pipe = r.pipeline()
+    pipe.delete(key)
+    pipe.incr(gen_key)
+    # покоління має жити довше за будь-який payload, записаний до інкременту
+    pipe.expire(gen_key, settings.CACHE_USER_TTL_SEC * 2)
+    pipe.execute()
+    _publish_invalidation(r, key)
+
+
+# --- Кеш відповідей списків контактів ---
+
+def _contacts_version_key(owner_id: int) -> str:
+    return f"contacts:{owner_id}:ver"
+
+def response_key(owner_id: int, scope: str, params: Mapping[str, Any]) -> str:
+    """Ключ відповіді: власник + нормалізовані параметри запиту (None відкидаються, порядок не важливий)."""
+    norm = json.dumps({k: v for k, v in params.items() if v is not None}, sort_keys=True, default=str)
+    return f"resp:{owner_id}:{scope}:{hashlib.sha1(norm.encode()).hexdigest()}"
+
+@timed_redis
+def lookup_response(owner_id: int, scope: str, params: Mapping[str, Any]) -> tuple[Optional[Dict[str, Any]], int]:
+    """Одним MGET читає збережену відповідь і версію контактів власника.
+
+    Повертає ``(entry | None, version)``; запис зі старою версією — промах.
+    ``entry`` = ``{"body": <JSON-рядок>, "headers": {...}, "ver": int}``.
+    """
+    r = get_redis()
+    if not r:
+        return None, 0
+    raw, raw_ver = r.mget(response_key(owner_id, scope, params), _contacts_version_key(owner_id))
+    ver = int(raw_ver or 0)
+    if not raw:
+        return None, ver
+    try:
+        entry = json.loads(raw)
+    except Exception:
+        return None, ver
+    if entry.get("ver") != ver:
+        return None, ver
+    return entry, ver
+
+@timed_redis
+def cache_response(owner_id: int, scope: str, params: Mapping[str, Any], ver: int,
+                   body: bytes, headers: Mapping[str, str], ttl: int | None = None) -> None:
+    """Зберігає вже серіалізовану відповідь з версією, прочитаною до запиту в БД."""
+    r = get_redis()
+    if not r:
+        return
+    entry = {"ver": ver, "headers": dict(headers), "body": body.decode()}
+    r.setex(response_key(owner_id, scope, params), ttl or settings.CACHE_RESPONSE_TTL_SEC, json.dumps(entry))
+
+@timed_redis
+def bump_contacts_version(owner_id: int) -> None:
+    """O(1) інвалідизація всіх закешованих відповідей власника (create/update/delete).
+
+    Ключ версії без TTL: після його зникнення версія почалася б знову з нуля
+    і могла б збігтися з версією ще живого запису.
+    """
+    r = get_redis()
+    if not r:
+        return
+    r.incr(_contacts_version_key(owner_id))
+
+
+# --- Значення app_meta (аватар за замовчуванням тощо) ---
+
+def _meta_key(key: str) -> str:
+    return f"meta:{key}"
+
+@timed_redis
+def _redis_get_meta(key: str) -> Any:
+    raw = get_redis().get(_meta_key(key))
+    return MISSING if raw is None else json.loads(raw)["v"]
+
+@timed_redis
+def _redis_fill_meta(key: str, value: Optional[str]) -> None:
+    # NX: не перетираємо значення, яке meta_set записав, поки ми читали БД
+    get_redis().set(_meta_key(key), json.dumps({"v": value}), ex=settings.CACHE_META_TTL_SEC, nx=True)
+
+async def get_meta(key: str, load: Callable[[], Awaitable[Optional[str]]]) -> Optional[str]:
+    """Значення meta: пам'ять → Redis → ``load()`` (БД); конкурентні промахи об'єднуються."""
+    if not _local_enabled():
+        return await load()
+    lk = _meta_key(key)
+    value = local.get(lk)
+    if value is not MISSING:
+        return value
+
+    async def fill() -> Optional[str]:
+        token = local.token(lk)
+        value = await run_in_threadpool(_redis_get_meta, key)
+        if value is MISSING:
+            value = await load()
+            await run_in_threadpool(_redis_fill_meta, key, value)
+        local.set(lk, value, token=token)
+        return value
+
+    return await flights.do(lk, fill)
+
+@timed_redis
+def set_meta(key: str, value: Optional[str]) -> None:
+    """Після запису в БД: оновлює Redis і розсилає інвалідизацію рівня в пам'яті."""
     r = get_redis()
     if not r:
         return
-    r.delete(f"user:{user_id}")
+    r.set(_meta_key(key), json.dumps({"v": value}), ex=settings.CACHE_META_TTL_SEC)
+    _publish_invalidation(r, _meta_key(key))
@@ -0,0 +1,121 @@
+"""Масовий імпорт та експорт контактів (CSV / NDJSON).
+
+Імпорт читає файл потоково, валідує рядки пакетами через ``schemas.ContactCreate``
+і вставляє їх одним ``INSERT`` на пакет. Експорт віддає рядки з серверного курсора
+частинами, не створюючи ORM-об'єктів.
+"""
+from __future__ import annotations
+import csv
+import io
+import json
+from itertools import islice
+from typing import Any, AsyncIterator, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from . import crud, responses, schemas
+
+FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_FIELDS = ["id", "first_name", "last_name", "email", "phone", "birthday", "extra", "created_at", "updated_at"]
+
+Record = Tuple[int, Any]  # (номер рядка у файлі, dict або помилка розбору)
+
+
+def detect_format(explicit: Optional[str], content_type: Optional[str], filename: Optional[str]) -> Optional[str]:
+    """Формат з параметра, Content-Type або розширення файлу."""
+    if explicit:
+        return explicit
+    ctype = (content_type or "").split(";")[0].strip().lower()
+    for fmt, mime in FORMATS.items():
+        if ctype == mime:
+            return fmt
+    if ctype in ("application/jsonl", "application/json-lines"):
+        return "ndjson"
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return None
+
+
+def iter_records(stream: BinaryIO, fmt: str) -> Iterator[Record]:
+    """Потоково читає файл і повертає ``(номер рядка, dict)`` без завантаження всього в пам'ять."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            # порожні значення CSV → None (наприклад, необов'язкове extra)
+            yield reader.line_num, {k: (v if v != "" else None) for k, v in row.items() if k}
+        return
+    for line_no, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, e
+
+
+def take(records: Iterator[Record], size: int) -> List[Record]:
+    return list(islice(records, size))
+
+
+def validate_batch(batch: List[Record]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Валідує пакет рядків; повертає (валідні payload-и, помилки по рядках)."""
+    valid, errors = [], []
+    for row, data in batch:
+        if isinstance(data, Exception):
+            errors.append({"row": row, "errors": [f"invalid JSON: {data}"]})
+            continue
+        if not isinstance(data, dict):
+            errors.append({"row": row, "errors": ["expected an object"]})
+            continue
+        try:
+            valid.append(schemas.ContactCreate.model_validate(data).model_dump())
+        except ValidationError as e:
+            errors.append({
+                "row": row,
+                "errors": [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()],
+            })
+    return valid, errors
+
+
+def encode_rows(rows: List[Any], fmt: str, header: bool = False) -> bytes:
+    """Серіалізує частину рядків експорту."""
+    if fmt == "csv":
+        buf = io.StringIO()
+        writer = csv.writer(buf)
+        if header:
+            writer.writerow(EXPORT_FIELDS)
+        writer.writerows(rows)
+        return buf.getvalue().encode()
+    return b"".join(
+        responses.dumps(dict(zip(EXPORT_FIELDS, row))) + b"\n" for row in rows
+    )
+
+
+async def export_stream(db: Any, owner_id: int, fmt: str, batch_size: int) -> AsyncIterator[bytes]:
+    """Стрімить контакти власника частинами по ``batch_size`` рядків.
+
+    Використовує окрему сесію на тому ж двигуні: сесія запиту закривається
+    раніше, ніж StreamingResponse дочитає тіло.
+    """
+    stmt = crud.export_contacts_stmt(owner_id).execution_options(yield_per=batch_size)
+    if fmt == "csv":
+        yield encode_rows([], fmt, header=True)
+    if isinstance(db, Session):
+        session = Session(bind=db.get_bind())
+        try:
+            result = await run_in_threadpool(session.execute, stmt)
+            while rows := await run_in_threadpool(result.fetchmany, batch_size):
+                yield encode_rows(rows, fmt)
+        finally:
+            await run_in_threadpool(session.close)
+        return
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    async with AsyncSession(bind=db.bind) as session:
+        result = await session.stream(stmt)
+        async for rows in result.partitions(batch_size):
+            yield encode_rows(rows, fmt)
@@ -1,9 +1,16 @@
-from datetime import date, timedelta
-from typing import List, Optional
+import base64
+import calendar
+import json
+from datetime import date, datetime, timedelta
+from typing import List, Optional, Sequence, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import select, or_, func
+from sqlalchemy.engine import Row
+from sqlalchemy import select, insert, update, delete, and_, or_, func, tuple_, case, bindparam
 from . import models, schemas
-from .security import hash_password, verify_password
+from .security import hash_password, verify_password, needs_rehash
+from .cache import bump_contacts_version, invalidate_user, set_meta
+from .database import replica_read, after_commit
+from .settings import settings
 
 
 def _payload_from(data):
@@ -20,22 +27,33 @@ def _payload_from(data):
         return data.__dict__
 
 # --- Users ---
-def create_user(db: Session, data: schemas.UserCreate) -> models.User:
+def create_user(db: Session, data: schemas.UserCreate, hashed_password: Optional[str] = None) -> models.User:
+    """Створює користувача; ``hashed_password`` — готовий хеш (async-шлях хешує поза сесією)."""
     exists = db.scalar(select(func.count()).select_from(models.User).where(models.User.email == data.email))
     if exists:
         raise ValueError("User with this email already exists")
-    user = models.User(email=data.email, hashed_password=hash_password(data.password))
+    user = models.User(email=data.email, hashed_password=hashed_password or hash_password(data.password))
     db.add(user)
     db.commit()
     db.refresh(user)
     return user
 
+@replica_read(retry_on_miss=True)
+def get_user(db: Session, user_id: int) -> Optional[models.User]:
+    return db.get(models.User, user_id)
+
+@replica_read(retry_on_miss=True)
+def get_user_by_email(db: Session, email: str) -> Optional[models.User]:
+    return db.scalar(select(models.User).where(models.User.email == email))
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[models.User]:
     user = db.scalar(select(models.User).where(models.User.email == email))
     if not user:
         return None
     if not verify_password(password, user.hashed_password):
         return None
+    if needs_rehash(user.hashed_password):
+        set_password_hash(db, user, hash_password(password))
     return user
 
 # --- Contacts (scoped by owner) ---
@@ -44,16 +62,45 @@ def create_contact(db: Session, owner_id: int, data: schemas.ContactCreate) -> m
     db.add(obj)
     db.commit()
     db.refresh(obj)
+    after_commit(db, bump_contacts_version, owner_id)
     return obj
 
-def get_contact(db: Session, owner_id: int, contact_id: int) -> Optional[models.Contact]:
+def bulk_create_contacts(db: Session, owner_id: int, rows: List[dict]) -> int:
+    """Вставляє пакет уже провалідованих контактів одним executemany і одним commit."""
+    if not rows:
+        return 0
+    db.execute(insert(models.Contact), [
+        dict(r, owner_id=owner_id, birthday_md=models.birthday_md(r.get("birthday"))) for r in rows
+    ])
+    db.commit()
+    after_commit(db, bump_contacts_version, owner_id)
+    return len(rows)
+
+def export_contacts_stmt(owner_id: int):
+    """SELECT лише колонок (без ORM-об'єктів) для потокового експорту."""
+    c = models.Contact
+    return (
+        select(c.id, c.first_name, c.last_name, c.email, c.phone, c.birthday, c.extra, c.created_at, c.updated_at)
+        .where(c.owner_id == owner_id)
+        .order_by(c.id)
+    )
+
+def _owned_contact(db: Session, owner_id: int, contact_id: int) -> Optional[models.Contact]:
     return db.scalar(select(models.Contact).where(models.Contact.id == contact_id, models.Contact.owner_id == owner_id))
 
-def list_contacts(db: Session, owner_id: int, skip: int = 0, limit: int = 100,
-                  first_name: Optional[str] = None,
-                  last_name: Optional[str] = None,
-                  email: Optional[str] = None) -> List[models.Contact]:
-    stmt = select(models.Contact).where(models.Contact.owner_id == owner_id)
+@replica_read(retry_on_miss=True)
+def get_contact(db: Session, owner_id: int, contact_id: int,
+                fields: Optional[Sequence[str]] = None) -> Optional[models.Contact | Row]:
+    """ORM-контакт або, з ``fields``, рядок лише з цими колонками."""
+    if fields is None:
+        return _owned_contact(db, owner_id, contact_id)
+    c = models.Contact
+    return db.execute(select(*contact_columns(fields)).where(c.id == contact_id, c.owner_id == owner_id)).first()
+
+def _contact_filters(owner_id: int, first_name: Optional[str] = None,
+                     last_name: Optional[str] = None, email: Optional[str] = None) -> list:
+    """Умови WHERE для списку контактів власника (фільтри об'єднуються через OR)."""
+    where = [models.Contact.owner_id == owner_id]
     conditions = []
     if first_name:
         conditions.append(models.Contact.first_name.ilike(f"%{first_name}%"))
@@ -62,12 +109,147 @@ def list_contacts(db: Session, owner_id: int, skip: int = 0, limit: int = 100,
     if email:
         conditions.append(models.Contact.email.ilike(f"%{email}%"))
     if conditions:
-        stmt = stmt.where(or_(*conditions))
+        where.append(or_(*conditions))
+    return where
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def _search_condition(dialect: str, q: str):
+    """Умова пошуку ``q`` по імені, прізвищу та email.
+
+    На PostgreSQL і ILIKE '%q%', і нечіткий оператор pg_trgm ``%`` обслуговуються
+    GIN-індексами ``ix_contacts_*_trgm``; на інших БД (SQLite у тестах) — лише ILIKE.
+    """
+    like = f"%{_escape_like(q)}%"
+    cols = (models.Contact.first_name, models.Contact.last_name, models.Contact.email)
+    conditions = [c.ilike(like, escape="\\") for c in cols]
+    if dialect == "postgresql" and len(q) >= 3:
+        conditions += [c.op("%")(q) for c in cols]
+    return or_(*conditions)
+
+def contact_columns(fields: Optional[Sequence[str]] = None) -> tuple:
+    """Колонки проєкції для полів ContactOut (за замовчуванням — без ``extra``).
+
+    Рядки (Row) замість ORM-сутностей — без identity map і відстеження змін;
+    роутер серіалізує їх напряму (:func:`app.responses.dump_rows`).
+    """
+    return tuple(getattr(models.Contact, f) for f in (fields or schemas.CONTACT_LIST_FIELDS))
+
+@replica_read
+def list_contacts(db: Session, owner_id: int, skip: int = 0, limit: int = 100,
+                  first_name: Optional[str] = None,
+                  last_name: Optional[str] = None,
+                  email: Optional[str] = None,
+                  fields: Optional[Sequence[str]] = None) -> List[Row]:
+    stmt = select(*contact_columns(fields)).where(*_contact_filters(owner_id, first_name, last_name, email))
     stmt = stmt.offset(skip).limit(min(limit, 1000))
-    return list(db.scalars(stmt).all())
+    return list(db.execute(stmt).all())
+
+@replica_read
+def count_contacts(db: Session, owner_id: int,
+                   first_name: Optional[str] = None,
+                   last_name: Optional[str] = None,
+                   email: Optional[str] = None,
+                   q: Optional[str] = None) -> int:
+    """Кількість контактів з тими ж фільтрами, що й у списку (для X-Total-Count)."""
+    stmt = select(func.count()).select_from(models.Contact).where(*_contact_filters(owner_id, first_name, last_name, email))
+    if q:
+        stmt = stmt.where(_search_condition(db.get_bind().dialect.name, q.strip()))
+    return db.scalar(stmt) or 0
+
+@replica_read
+def search_contacts(db: Session, owner_id: int, q: str, skip: int = 0, limit: int = 100,
+                    first_name: Optional[str] = None,
+                    last_name: Optional[str] = None,
+                    email: Optional[str] = None,
+                    fields: Optional[Sequence[str]] = None) -> List[Row]:
+    """Пошук з ранжуванням: спершу збіги з початку імені/прізвища/email, далі за схожістю.
+
+    На PostgreSQL схожість рахує ``similarity()`` з pg_trgm (толерантна до одруківок),
+    на інших БД — лише префікс і алфавітний порядок.
+    """
+    q = q.strip()
+    dialect = db.get_bind().dialect.name
+    cols = (models.Contact.first_name, models.Contact.last_name, models.Contact.email)
+    prefix = f"{_escape_like(q)}%"
+    prefix_hit = case((or_(*[c.ilike(prefix, escape="\\") for c in cols]), 1), else_=0)
+    order = [prefix_hit.desc()]
+    if dialect == "postgresql":
+        order.append(func.greatest(*[func.similarity(c, q) for c in cols]).desc())
+    order += [models.Contact.last_name, models.Contact.first_name, models.Contact.id]
+    stmt = (
+        select(*contact_columns(fields))
+        .where(*_contact_filters(owner_id, first_name, last_name, email), _search_condition(dialect, q))
+        .order_by(*order)
+        .offset(skip)
+        .limit(min(limit, 1000))
+    )
+    return list(db.execute(stmt).all())
+
+# Ключі keyset-пагінації; кожному відповідає композитний індекс (owner_id, ...) у models.Contact
+_CURSOR_KEYS = {
+    "name": (models.Contact.last_name, models.Contact.first_name, models.Contact.id),
+    "id": (models.Contact.id,),
+}
+# Типи значень у курсорі (курсор приходить від клієнта, тож перевіряємо кожне поле)
+_CURSOR_TYPES = {"name": ((str,), (str,), (int,)), "id": ((int,),)}
+_CHANGES_TYPES = ((str, type(None)), (int,), (str,), (int,))
+
+def encode_cursor(order: str, values: tuple) -> str:
+    raw = json.dumps([order, *values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def _decode_token(kind: str, token: str, types: tuple) -> tuple:
+    try:
+        data = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if not isinstance(data, list) or not data or data[0] != kind or len(data) != len(types) + 1:
+        raise ValueError("Invalid cursor")
+    # type(), а не isinstance: bool — теж int
+    if any(type(value) not in allowed for value, allowed in zip(data[1:], types)):
+        raise ValueError("Invalid cursor")
+    return tuple(data[1:])
+
+def decode_cursor(order: str, cursor: str) -> tuple:
+    """Розбирає непрозорий курсор; ValueError, якщо він зіпсований або з іншого сортування."""
+    return _decode_token(order, cursor, _CURSOR_TYPES[order])
+
+@replica_read
+def list_contacts_page(db: Session, owner_id: int, cursor: Optional[str] = None, limit: int = 100,
+                       order: str = "name",
+                       first_name: Optional[str] = None,
+                       last_name: Optional[str] = None,
+                       email: Optional[str] = None,
+                       fields: Optional[Sequence[str]] = None) -> Tuple[List[Row], Optional[str]]:
+    """Keyset-пагінація: ``WHERE (ключ) > (курсор) ORDER BY ключ LIMIT n``.
+
+    Вартість сторінки не залежить від глибини. Повертає ``(контакти, next_cursor)``;
+    ``next_cursor`` — None на останній сторінці. Колонки ключа вибираються завжди,
+    навіть якщо їх немає у ``fields``.
+    """
+    if order not in _CURSOR_KEYS:
+        raise ValueError(f"Unknown order: {order}")
+    keys = _CURSOR_KEYS[order]
+    limit = min(limit, 1000)
+    columns = contact_columns(fields)
+    columns += tuple(k for k in keys if k.key not in {c.key for c in columns})
+    stmt = select(*columns).where(*_contact_filters(owner_id, first_name, last_name, email))
+    if cursor:
+        after = decode_cursor(order, cursor)
+        stmt = stmt.where(tuple_(*keys) > tuple_(*after)) if len(keys) > 1 else stmt.where(keys[0] > after[0])
+    # +1 рядок, щоб дізнатися, чи є наступна сторінка, без окремого COUNT
+    rows = list(db.execute(stmt.order_by(*keys).limit(limit + 1)).all())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(order, tuple(getattr(last, k.key) for k in keys))
+    return rows, next_cursor
 
 def update_contact(db: Session, owner_id: int, contact_id: int, data: schemas.ContactUpdate) -> Optional[models.Contact]:
-    obj = get_contact(db, owner_id, contact_id)
+    obj = _owned_contact(db, owner_id, contact_id)  # читання перед записом — з primary
     if not obj:
         return None
     payload = _payload_from(data)
@@ -76,44 +258,244 @@ def update_contact(db: Session, owner_id: int, contact_id: int, data: schemas.Co
             setattr(obj, k, v)
     db.commit()
     db.refresh(obj)
+    after_commit(db, bump_contacts_version, owner_id)
     return obj
 
+def _db_now(db: Session) -> datetime:
+    """Час БД у тій самій системі відліку, що й колонки ``timestamp`` з ``default=func.now()``.
+
+    На PostgreSQL у колонку без поясу потрапляє локальний час сесії (``TimeZone``) —
+    тому ``LOCALTIMESTAMP``, а не UTC; на SQLite ``CURRENT_TIMESTAMP`` — UTC, як і в колонках.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return db.scalar(select(func.localtimestamp()))
+    return db.scalar(select(func.now()))
+
+def _bury(db: Session, owner_id: int, ids: List[int]) -> None:
+    """Сліди видалень для /contacts/changes (в тій самій транзакції) і прибирання прострочених."""
+    t = models.ContactTombstone
+    cutoff = _db_now(db) - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS)
+    db.execute(delete(t).where(t.owner_id == owner_id, t.deleted_at < cutoff))
+    if ids:
+        # SQLite без AUTOINCREMENT може перевикористати id — старий слід замінюється новим
+        db.execute(delete(t).where(t.contact_id.in_(ids)))
+        db.execute(insert(t), [{"contact_id": i, "owner_id": owner_id} for i in ids])
+
 def delete_contact(db: Session, owner_id: int, contact_id: int) -> bool:
-    obj = get_contact(db, owner_id, contact_id)
+    obj = _owned_contact(db, owner_id, contact_id)  # читання перед записом — з primary
     if not obj:
         return False
     db.delete(obj)
+    _bury(db, owner_id, [contact_id])
     db.commit()
+    after_commit(db, bump_contacts_version, owner_id)
     return True
 
-def upcoming_birthdays(db: Session, owner_id: int, days: int = 7) -> List[models.Contact]:
-    today = date.today()
+def _chunks(ids: list, size: int):
+    size = max(size, 1)
+    for i in range(0, len(ids), size):
+        yield ids[i:i + size]
+
+def batch_update_contacts(db: Session, owner_id: int, items: List[Tuple[int, dict]],
+                          chunk_size: int = 500) -> Tuple[List[int], List[int]]:
+    """Оновлює контакти власника пакетом в одній транзакції.
+
+    ``items`` — пари (id, часткові зміни), згруповані за набором змінюваних колонок.
+    На ``chunk_size`` id групи — ``SELECT id ... FOR UPDATE`` (наявність і власник) і один
+    executemany ``UPDATE ... WHERE id = :_id AND owner_id = :owner``, що пише лише колонки
+    цієї групи: решту полів рядка паралельні запити можуть змінювати без втрат.
+    Повертає (оновлені id, не знайдені id) у порядку запиту.
+    """
+    t = models.Contact.__table__
+    groups: dict[tuple, List[Tuple[int, dict]]] = {}
+    for contact_id, values in items:
+        groups.setdefault(tuple(sorted(values)), []).append((contact_id, values))
+    found: set[int] = set()
+    for keys, group in groups.items():
+        columns = {k: bindparam(k) for k in keys}
+        if "birthday" in keys:
+            # Core UPDATE не викликає @validates — birthday_md задаємо явно
+            columns["birthday_md"] = bindparam("birthday_md")
+        for chunk in _chunks(group, chunk_size):
+            # executemany UPDATE не повертає RETURNING, тож id беремо з блокуючого SELECT
+            # у тій самій транзакції: рядок не зникне і не змінить власника до UPDATE
+            owned = set(db.scalars(
+                select(t.c.id).where(t.c.owner_id == owner_id, t.c.id.in_([i for i, _ in chunk]))
+                .with_for_update()
+            ))
+            found |= owned
+            params = [dict(values, _id=contact_id) for contact_id, values in chunk if contact_id in owned]
+            if not keys or not params:
+                continue  # змін немає — лише перевірка наявності
+            if "birthday" in keys:
+                for row in params:
+                    row["birthday_md"] = models.birthday_md(row["birthday"])
+            db.execute(update(t).where(t.c.id == bindparam("_id"), t.c.owner_id == owner_id).values(columns), params)
+    db.commit()
+    if found:
+        after_commit(db, bump_contacts_version, owner_id)
+    requested = [contact_id for contact_id, _ in items]
+    return [i for i in requested if i in found], [i for i in requested if i not in found]
+
+def batch_delete_contacts(db: Session, owner_id: int, ids: List[int],
+                          chunk_size: int = 500) -> Tuple[List[int], List[int]]:
+    """Видаляє контакти власника чанками ``DELETE ... RETURNING id`` в одній транзакції."""
+    c = models.Contact
+    ids = list(dict.fromkeys(ids))
+    found: set[int] = set()
+    for chunk in _chunks(ids, chunk_size):
+        stmt = delete(c).where(c.owner_id == owner_id, c.id.in_(chunk)).returning(c.id)
+        found.update(db.scalars(stmt.execution_options(synchronize_session=False)))
+    _bury(db, owner_id, [i for i in ids if i in found])
+    db.commit()
+    if found:
+        after_commit(db, bump_contacts_version, owner_id)
+    return [i for i in ids if i in found], [i for i in ids if i not in found]
+
+def _sync_ts(dialect: str, expr):
+    # SQLite зберігає CURRENT_TIMESTAMP текстом без мікросекунд, а параметри — з ними:
+    # порівнюємо нормалізовані значення (на PostgreSQL — як є, з індексом)
+    return func.datetime(expr) if dialect == "sqlite" else expr
+
+def _token_ts(value: str) -> datetime:
+    ts = datetime.fromisoformat(value)
+    if ts.tzinfo is not None:  # знаки містять час у системі відліку колонок, без поясу
+        raise ValueError("Invalid cursor")
+    return ts
+
+def contact_changes(db: Session, owner_id: int, since: Optional[str] = None,
+                    limit: int = 500) -> Tuple[List[models.Contact], List[int], str, bool]:
+    """Контакти, змінені після водяного знака ``since``, і id видалених.
+
+    Дві keyset-стрічки: ``(updated_at, id)`` по контактах і ``(deleted_at, contact_id)``
+    по слідах видалень, обидві обмежені зверху ``now() - SYNC_SETTLE_SEC``. Без ``since`` —
+    повна початкова вибірка. Повертає ``(змінені, видалені id, новий знак, has_more)``.
+    Читає з primary: із реплікою, що відстає, знак міг би "проскочити" ще не доїхалі рядки.
+    ``LookupError`` — знак старший за зберігання слідів, потрібна повна синхронізація.
+    """
+    c, t = models.Contact, models.ContactTombstone
+    dialect = db.get_bind().dialect.name
+    now = _db_now(db)
+    bound = now - timedelta(seconds=settings.SYNC_SETTLE_SEC)
+    if since:
+        c_ts, c_id, d_ts, d_id = _decode_token("changes", since, _CHANGES_TYPES)
+        c_after = (_token_ts(c_ts), c_id) if c_ts else None
+        d_after = (_token_ts(d_ts), d_id)
+        if d_after[0] < now - timedelta(days=settings.SYNC_TOMBSTONE_RETENTION_DAYS):
+            raise LookupError("Sync token expired")
+    else:
+        # початкова вибірка: усі наявні контакти; видалення — лише ті, що будуть після неї
+        c_after, d_after = None, (bound, 0)
+
+    ts = _sync_ts(dialect, c.updated_at)
+    stmt = select(c).where(c.owner_id == owner_id, ts < _sync_ts(dialect, bound))
+    if c_after:
+        stmt = stmt.where(tuple_(ts, c.id) > tuple_(_sync_ts(dialect, c_after[0]), c_after[1]))
+    changed = list(db.scalars(stmt.order_by(c.updated_at, c.id).limit(limit + 1)))
+
+    dts = _sync_ts(dialect, t.deleted_at)
+    tombs = db.execute(
+        select(t.contact_id, t.deleted_at)
+        .where(t.owner_id == owner_id, dts < _sync_ts(dialect, bound),
+               tuple_(dts, t.contact_id) > tuple_(_sync_ts(dialect, d_after[0]), d_after[1]))
+        .order_by(t.deleted_at, t.contact_id).limit(limit + 1)
+    ).all()
+
+    has_more = len(changed) > limit or len(tombs) > limit
+    changed, tombs = changed[:limit], tombs[:limit]
+    if changed:
+        c_after = (changed[-1].updated_at, changed[-1].id)
+    if tombs:
+        d_after = (tombs[-1].deleted_at, tombs[-1].contact_id)
+    token = encode_cursor("changes", (
+        c_after[0].isoformat() if c_after else None, c_after[1] if c_after else 0,
+        d_after[0].isoformat(), d_after[1],
+    ))
+    return changed, [row.contact_id for row in tombs], token, has_more
+
+@replica_read
+def upcoming_birthdays(db: Session, owner_id: int, days: int = 7, skip: int = 0,
+                       limit: Optional[int] = None, today: Optional[date] = None,
+                       fields: Optional[Sequence[str]] = None) -> List[Row]:
+    """Контакти з днем народження у вікні ``[today, today + days]``, за датою найближчого свята.
+
+    Вікно рахується в БД діапазонами по ``birthday_md`` (MMDD) з індексом
+    ``(owner_id, birthday_md)``: окремий діапазон для кожного року, якщо вікно
+    переходить через Новий рік. 29 лютого у невисокосний рік святкується 28-го.
+    """
+    today = today or date.today()
     end = today + timedelta(days=days)
-    contacts = list(db.scalars(select(models.Contact).where(models.Contact.owner_id == owner_id)).all())
-    result = []
-    for c in contacts:
-        b = c.birthday
-        try:
-            next_bd = b.replace(year=today.year)
-        except ValueError:
-            next_bd = date(today.year, 2, 28)  # 29 Feb → 28 Feb у невисокосні роки
-        if next_bd < today:
-            try:
-                next_bd = b.replace(year=today.year + 1)
-            except ValueError:
-                next_bd = date(today.year + 1, 2, 28)
-        if today <= next_bd <= end:
-            result.append(c)
-    return result
+    md = models.Contact.birthday_md
+    segments = []
+    for year in range(today.year, end.year + 1):
+        lo = models.birthday_md(today if year == today.year else date(year, 1, 1))
+        hi = models.birthday_md(end if year == end.year else date(year, 12, 31))
+        cond = md.between(lo, hi)
+        if not calendar.isleap(year) and lo <= 228 <= hi:
+            cond = or_(cond, md == 229)  # 29 Feb → 28 Feb у невисокосні роки
+        segments.append(cond)
+    # дати раніше за сьогоднішню MMDD настануть уже наступного року
+    today_md = models.birthday_md(today)
+    next_year = case((md >= today_md, 0), else_=1)
+    # у невисокосний рік 29.02 стоїть в одному ряду з 28.02
+    feb29_as_28 = [(and_(md == 229, md >= today_md), 228)] if not calendar.isleap(today.year) else []
+    if not calendar.isleap(today.year + 1):
+        feb29_as_28.append((and_(md == 229, md < today_md), 228))
+    day = case(*feb29_as_28, else_=md) if feb29_as_28 else md
+    stmt = (
+        select(*contact_columns(fields))
+        .where(models.Contact.owner_id == owner_id, or_(*segments))
+        .order_by(next_year, day, models.Contact.id)
+        .offset(skip)
+    )
+    if limit is not None:
+        stmt = stmt.limit(min(limit, 1000))
+    return list(db.execute(stmt).all())
 
 
 def set_password(db: Session, user: models.User, new_password: str) -> models.User:
     """Оновлює хеш пароля користувача."""
-    user.hashed_password = hash_password(new_password)
+    return set_password_hash(db, user, hash_password(new_password))
+
+def set_password_hash(db: Session, user: models.User, hashed_password: str) -> models.User:
+    """Зберігає вже обчислений хеш пароля."""
+    user.hashed_password = hashed_password
     db.commit()
     db.refresh(user)
+    after_commit(db, invalidate_user, user.id)
     return user
 
+def set_verified(db: Session, user: models.User) -> models.User:
+    """Позначає email користувача як підтверджений."""
+    user.is_verified = True
+    db.commit()
+    after_commit(db, invalidate_user, user.id)
+    return user
+
+def set_avatar_url(db: Session, user_id: int, url: str) -> Optional[models.User]:
+    """Зберігає новий URL аватара користувача."""
+    obj = db.get(models.User, user_id)
+    if not obj:
+        return None
+    obj.avatar_url = url
+    db.commit()
+    db.refresh(obj)
+    after_commit(db, invalidate_user, obj.id)
+    return obj
+
+def set_avatar_status(db: Session, user_id: int, status: str, url: Optional[str] = None) -> Optional[models.User]:
+    """Оновлює стан обробки аватара (pending/ready/failed) і, якщо готовий, його URL."""
+    obj = db.get(models.User, user_id)
+    if not obj:
+        return None
+    obj.avatar_status = status
+    if url:
+        obj.avatar_url = url
+    db.commit()
+    db.refresh(obj)
+    after_commit(db, invalidate_user, obj.id)
+    return obj
+
 def set_user_role(db: Session, user_id: int, role: str) -> Optional[models.User]:
     """Адмін змінює роль користувача."""
     obj = db.get(models.User, user_id)
@@ -122,8 +504,10 @@ def set_user_role(db: Session, user_id: int, role: str) -> Optional[models.User]
     obj.role = role
     db.commit()
     db.refresh(obj)
+    after_commit(db, invalidate_user, obj.id)
     return obj
 
+@replica_read
 def meta_get(db: Session, key: str) -> Optional[str]:
     m = db.get(models.AppMeta, key)
     return m.value if m else None
@@ -136,3 +520,38 @@ def meta_set(db: Session, key: str, value: str | None) -> None:
         m = models.AppMeta(key=key, value=value)
         db.add(m)
     db.commit()
+    after_commit(db, set_meta, key, value)
+
+
+# --- Refresh-токени (DB-сховище, якщо немає Redis) ---
+
+def refresh_family_create(db: Session, family_id: str, user_id: int, jti: str, expires_at: datetime) -> None:
+    """Нова родина при логіні; заразом прибирає прострочені родини користувача."""
+    F = models.RefreshTokenFamily
+    db.execute(delete(F).where(F.user_id == user_id, F.expires_at <= datetime.utcnow()))
+    db.add(F(id=family_id, user_id=user_id, current_jti=jti, expires_at=expires_at))
+    db.commit()
+
+def refresh_family_rotate(db: Session, family_id: str, old_jti: str, new_jti: str, expires_at: datetime) -> int:
+    """Атомарна ротація: 1 — успіх, 0 — невідома/прострочена родина, -1 — повторне використання.
+
+    Повторно пред'явлений старий jti відкликає всю родину.
+    """
+    F = models.RefreshTokenFamily
+    res = db.execute(
+        update(F)
+        .where(F.id == family_id, F.current_jti == old_jti, F.expires_at > datetime.utcnow())
+        .values(current_jti=new_jti, expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    if res.rowcount == 1:
+        db.commit()
+        return 1
+    gone = db.execute(delete(F).where(F.id == family_id, F.current_jti != old_jti)).rowcount
+    db.commit()
+    return -1 if gone else 0
+
+def refresh_family_revoke(db: Session, family_id: str) -> None:
+    F = models.RefreshTokenFamily
+    db.execute(delete(F).where(F.id == family_id))
+    db.commit()
@@ -0,0 +1,70 @@
+"""Async-версії функцій :mod:`app.crud`.
+
+Кожна функція приймає ``AsyncSession`` або звичайну ``Session`` і виконує
+відповідну синхронну функцію через :func:`app.database.run_db`, тож логіка
+запитів живе в одному місці — у ``crud.py``.
+"""
+import functools
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+from . import crud, models, schemas
+from .database import run_db
+from .security import hash_password_async, verify_password_async, needs_rehash
+
+T = TypeVar("T")
+
+def _async(fn: Callable[..., T]) -> Callable[..., Awaitable[T]]:
+    @functools.wraps(fn)
+    async def wrapper(db: Any, *args: Any, **kwargs: Any) -> T:
+        return await run_db(db, fn, *args, **kwargs)
+    return wrapper
+
+# --- Users ---
+get_user = _async(crud.get_user)
+get_user_by_email = _async(crud.get_user_by_email)
+set_password_hash = _async(crud.set_password_hash)
+
+# bcrypt виконується в пулі процесів поза сесією, у crud передається готовий хеш
+async def create_user(db: Any, data: schemas.UserCreate) -> models.User:
+    hashed = await hash_password_async(data.password)
+    return await run_db(db, crud.create_user, data, hashed_password=hashed)
+
+async def authenticate_user(db: Any, email: str, password: str) -> Optional[models.User]:
+    user = await get_user_by_email(db, email)
+    if not user or not await verify_password_async(password, user.hashed_password):
+        return None
+    if needs_rehash(user.hashed_password):
+        # прозоре перехешування з актуальними параметрами
+        await set_password_hash(db, user, await hash_password_async(password))
+    return user
+
+async def set_password(db: Any, user: models.User, new_password: str) -> models.User:
+    return await set_password_hash(db, user, await hash_password_async(new_password))
+
+set_verified = _async(crud.set_verified)
+set_avatar_url = _async(crud.set_avatar_url)
+set_avatar_status = _async(crud.set_avatar_status)
+set_user_role = _async(crud.set_user_role)
+
+# --- Contacts ---
+create_contact = _async(crud.create_contact)
+bulk_create_contacts = _async(crud.bulk_create_contacts)
+get_contact = _async(crud.get_contact)
+list_contacts = _async(crud.list_contacts)
+list_contacts_page = _async(crud.list_contacts_page)
+count_contacts = _async(crud.count_contacts)
+search_contacts = _async(crud.search_contacts)
+update_contact = _async(crud.update_contact)
+delete_contact = _async(crud.delete_contact)
+batch_update_contacts = _async(crud.batch_update_contacts)
+batch_delete_contacts = _async(crud.batch_delete_contacts)
+contact_changes = _async(crud.contact_changes)
+upcoming_birthdays = _async(crud.upcoming_birthdays)
+
+# --- Meta ---
+meta_get = _async(crud.meta_get)
+meta_set = _async(crud.meta_set)
+
+# --- Refresh-токени ---
+refresh_family_create = _async(crud.refresh_family_create)
+refresh_family_rotate = _async(crud.refresh_family_rotate)
+refresh_family_revoke = _async(crud.refresh_family_revoke)
@@ -1,21 +1,381 @@
-from typing import Generator
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional, TypeVar
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
+from starlette.concurrency import run_in_threadpool
 from .settings import settings
+from .cache import get_redis
+from . import metrics
+
+T = TypeVar("T")
 
 # URL бази даних з .env
 DATABASE_URL = settings.DATABASE_URL  # noqa: N816
 
-# Ініціалізація синхронного двигуна SQLAlchemy
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+def _async_url(url: str, explicit: Optional[str] = None) -> str:
+    """Підбирає async-драйвер для URL (psycopg2 → asyncpg, sqlite → aiosqlite)."""
+    if explicit:
+        return explicit
+    scheme, _, rest = url.partition("://")
+    base = scheme.split("+", 1)[0]
+    driver = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}.get(base)
+    return f"{base}+{driver}://{rest}" if driver else url
+
+class _TimedCheckout:
+    """Міксин пулу: час отримання з'єднання і таймаути — у метрики."""
+
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            metrics.DB_POOL_TIMEOUTS.inc()
+            raise
+        finally:
+            metrics.DB_POOL_WAIT.observe(time.perf_counter() - t0)
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+def engine_options(url: str, is_async: bool = False) -> Dict[str, Any]:
+    """Параметри пулу для ``create_engine`` / ``create_async_engine`` з налаштувань.
+
+    Замість ``pool_pre_ping`` (зайвий ``SELECT 1`` на кожен checkout) — ``pool_recycle``
+    і інвалідація пулу SQLAlchemy при disconnect-помилці (лічильник ``db_disconnects_total``).
+    За PgBouncer у transaction pooling пул тримає PgBouncer, а asyncpg не повинен
+    кешувати prepared statements: наступна транзакція може потрапити на інше з'єднання.
+    """
+    opts: Dict[str, Any] = {"pool_pre_ping": settings.DB_POOL_PRE_PING}
+    if url.startswith("sqlite"):
+        return opts  # пул за замовчуванням SQLAlchemy для SQLite
+    if settings.DB_PGBOUNCER:
+        opts["poolclass"] = NullPool
+        if "+asyncpg" in url:
+            opts["connect_args"] = {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+        return opts
+    opts.update(
+        poolclass=TimedAsyncQueuePool if is_async else TimedQueuePool,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT_SEC,
+        pool_recycle=settings.DB_POOL_RECYCLE_SEC,
+        pool_use_lifo=True,  # зайві з'єднання простоюють і відпадають по recycle
+    )
+    return opts
+
+def pool_stats(eng: Any) -> Dict[str, float]:
+    """Заповненість пулу (для QueuePool; інші пули — порожній словник)."""
+    pool = getattr(eng, "sync_engine", eng).pool
+    if not isinstance(pool, QueuePool):
+        return {}
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": pool._max_overflow,
+        "idle": pool.checkedin(),
+    }
+
+def warm_pool(eng: Any, connections: int) -> int:
+    """Відкриває до ``connections`` з'єднань (``SELECT 1``) і повертає їх у пул.
+
+    Новий інстанс не платить за TCP/TLS/auth першими запитами; повертає кількість
+    фактично відкритих з'єднань (обмежена розміром пулу).
+    """
+    pool = eng.pool
+    if isinstance(pool, QueuePool):
+        connections = min(connections, pool.size() + max(pool._max_overflow, 0))
+    opened = []
+    try:
+        for _ in range(max(connections, 1)):
+            conn = eng.connect()
+            opened.append(conn)
+            conn.exec_driver_sql("SELECT 1")
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
+
+# --- Read-репліки ---
+
+class ReplicaSet:
+    """Round-robin по здорових репліках; після disconnect-помилки репліка
+    виключається на ``retry_after`` секунд."""
+
+    def __init__(self, engines: List[Any], retry_after: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.engines = list(engines)
+        self.retry_after = retry_after
+        self.clock = clock
+        self._down_until: Dict[int, float] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        for eng in self.engines:
+            event.listen(getattr(eng, "sync_engine", eng), "handle_error", functools.partial(self._on_error, eng))
+
+    def _on_error(self, eng: Any, ctx) -> None:
+        # ctx.connection is None — не вдалося навіть під'єднатися
+        if ctx.is_disconnect or ctx.connection is None:
+            self.mark_down(eng)
+
+    def mark_down(self, eng: Any) -> None:
+        with self._lock:
+            self._down_until[id(eng)] = self.clock() + self.retry_after
+
+    def is_healthy(self, eng: Any) -> bool:
+        return self._down_until.get(id(eng), 0.0) <= self.clock()
+
+    def pick(self) -> Optional[Any]:
+        with self._lock:
+            for _ in range(len(self.engines)):
+                eng = self.engines[self._next % len(self.engines)]
+                self._next += 1
+                if self.is_healthy(eng):
+                    return eng
+        return None
+
+class WriteTracker:
+    """Read-your-writes: користувачі, що писали в останні ``window`` секунд, читають з primary.
+
+    Стан у пам'яті процесу (LRU на ``maxsize`` ключів) і, з ``redis``, ще й ключ
+    ``rw:<user_id>`` з TTL ``window``: запит, що потрапив на інший воркер, теж бачить
+    свіжий запис (:func:`load_write_marker`).
+    """
+
+    def __init__(self, window: float = 5.0, maxsize: int = 10_000, clock: Callable[[], float] = time.monotonic,
+                 redis: Optional[Callable[[], Any]] = None):
+        self.window, self.maxsize, self.clock = window, maxsize, clock
+        self.redis = redis or (lambda: None)
+        self._until: OrderedDict[int, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: int) -> None:
+        with self._lock:
+            self._until[user_id] = self.clock() + self.window
+            self._until.move_to_end(user_id)
+            while len(self._until) > self.maxsize:
+                self._until.popitem(last=False)
+
+    def recent(self, user_id: int) -> bool:
+        return self._until.get(user_id, 0.0) > self.clock()
+
+    def mark_shared(self, user_id: int) -> None:
+        r = self.redis()
+        if r is not None:
+            r.set(f"rw:{user_id}", 1, px=max(1, int(self.window * 1000)))
+
+    def recent_shared(self, user_id: int) -> bool:
+        r = self.redis()
+        if r is None:
+            return False
+        try:
+            return bool(r.exists(f"rw:{user_id}"))
+        except Exception:
+            return True  # Redis недоступний — безпечніше читати з primary
+
+class RoutingSession(Session):
+    """Сесія, що відправляє позначені :func:`replica_read` читання на репліку.
+
+    На primary лишаються: запис (flush, INSERT/UPDATE/DELETE), усі читання в сесії
+    після запису, читання користувача з ``info["user_id"]``, який нещодавно писав,
+    і все, що не позначене як read-only. Одна сесія закріплюється за однією реплікою.
+    """
+
+    def __init__(self, *args: Any, replicas: Optional[ReplicaSet] = None,
+                 writes: Optional[WriteTracker] = None, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.replicas = replicas if replicas is not None else sync_replicas
+        self.writes = writes if writes is not None else recent_writes
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        primary = super().get_bind(mapper=mapper, clause=clause, **kw)
+        info = self.info
+        if self._flushing or isinstance(clause, UpdateBase):
+            info["wrote"] = True
+            return primary
+        if self.replicas is None or not info.get("replica_read") or info.get("wrote"):
+            return primary
+        user_id = info.get("user_id")
+        if user_id is not None and (info.get("recent_write") or self.writes.recent(user_id)):
+            return primary
+        eng = info.get("replica")
+        if eng is None or not self.replicas.is_healthy(eng):
+            eng = info["replica"] = self.replicas.pick()
+        if eng is None:
+            return primary
+        return getattr(eng, "sync_engine", eng)
+
+@event.listens_for(RoutingSession, "after_commit")
+def _remember_write(session: Session) -> None:
+    user_id = session.info.get("user_id")
+    if session.info.get("wrote") and user_id is not None:
+        writes = getattr(session, "writes", recent_writes)
+        writes.mark(user_id)
+        # раніше за інвалідизацію кешу з crud: інакше інший воркер міг би прочитати репліку
+        # і покласти застарілу відповідь у кеш під уже новою версією
+        after_commit(session, writes.mark_shared, user_id)
+
+async def load_write_marker(db: Any, user_id: int) -> None:
+    """Позначає сесію, якщо користувач писав через інший воркер (ключ у Redis)."""
+    if not REPLICA_URLS or recent_writes.recent(user_id):
+        return
+    if await run_in_threadpool(recent_writes.recent_shared, user_id):
+        db.info["recent_write"] = True
+
+def replica_read(fn: Callable[..., T] = None, *, retry_on_miss: bool = False):
+    """Позначає функцію crud як read-only: її запити можуть піти на репліку.
+
+    При помилці з'єднання з реплікою запит повторюється на primary.
+    ``retry_on_miss`` — повторити на primary і тоді, коли результат ``None``
+    (запис міг ще не доїхати до репліки: реєстрація → логін, створення → GET).
+    """
+    if fn is None:
+        return functools.partial(replica_read, retry_on_miss=retry_on_miss)
+
+    @functools.wraps(fn)
+    def wrapper(db: Session, *args: Any, **kwargs: Any):
+        info = db.info
+        if info.get("replica_read") or not isinstance(db, RoutingSession) or db.replicas is None:
+            return fn(db, *args, **kwargs)
+        info["replica_read"] = True
+        try:
+            result = fn(db, *args, **kwargs)
+        except exc.DBAPIError as e:
+            on_replica = info.get("replica") is not None
+            if not on_replica or info.get("wrote") or not (e.connection_invalidated or isinstance(e, exc.OperationalError)):
+                raise
+            db.rollback()
+            result = None
+            retry = True
+        else:
+            retry = retry_on_miss and result is None and not info.get("wrote")
+        finally:
+            info["replica_read"] = False
+        if retry:
+            info["replica"] = None
+            info["wrote"] = True  # до кінця сесії — лише primary
+            result = fn(db, *args, **kwargs)
+        return result
+    return wrapper
+
+# Ініціалізація синхронного двигуна SQLAlchemy (startup DDL, скрипти, тести та sync-режим)
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+metrics.instrument_engine(engine)
+
+REPLICA_URLS = [u.strip() for u in (settings.DATABASE_REPLICA_URLS or "").split(",") if u.strip()]
+replica_engines = [create_engine(u, **engine_options(u)) for u in REPLICA_URLS]
+for _eng in replica_engines:
+    metrics.instrument_engine(_eng)
+sync_replicas: Optional[ReplicaSet] = (
+    ReplicaSet(replica_engines, settings.REPLICA_RETRY_SEC) if replica_engines else None
+)
+recent_writes = WriteTracker(settings.REPLICA_STICKY_SEC, redis=get_redis)
 
 # Фабрика сесій
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine, class_=RoutingSession)
+
+# Async-двигун створюється лише при DB_ASYNC=true (потрібен asyncpg/aiosqlite)
+async_engine = None
+AsyncSessionLocal = None
+_async_replicas: Optional[ReplicaSet] = None
+if settings.DB_ASYNC:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    _url = _async_url(DATABASE_URL, settings.ASYNC_DATABASE_URL)
+    async_engine = create_async_engine(_url, **engine_options(_url, is_async=True))
+    metrics.instrument_engine(async_engine)
+    if REPLICA_URLS:
+        _engines = [create_async_engine(_async_url(u), **engine_options(_async_url(u), is_async=True)) for u in REPLICA_URLS]
+        for _eng in _engines:
+            metrics.instrument_engine(_eng)
+        _async_replicas = ReplicaSet(_engines, settings.REPLICA_RETRY_SEC)
+    # expire_on_commit=False: після commit роутери серіалізують об'єкти поза greenlet
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False,
+        sync_session_class=RoutingSession, replicas=_async_replicas,
+    )
 
-def get_db() -> Generator:
-    """Повертає сесію БД для залежностей FastAPI. Закриває сесію після використання."""
+metrics.register(metrics.Gauge(
+    "db_pool", "Connection pool saturation",
+    lambda: {
+        (name, stat): float(v)
+        for name, eng in (("sync", engine), ("async", async_engine)) if eng is not None
+        for stat, v in pool_stats(eng).items()
+    },
+    ("engine", "stat"),
+))
+
+def _after_fork() -> None:
+    """Дочірній процес (gunicorn ``--preload``) не використовує з'єднання батька.
+
+    ``close=False``: сокети належать батьківському процесу — лише прибираємо їх
+    з пулу, нові з'єднання відкриються вже в цьому процесі.
+    """
+    engines = [engine, *replica_engines]
+    if async_engine is not None:
+        engines += [async_engine, *(_async_replicas.engines if _async_replicas else [])]
+    for eng in engines:
+        getattr(eng, "sync_engine", eng).dispose(close=False)
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
+
+async def get_db() -> AsyncGenerator[Any, None]:
+    """Повертає сесію БД для залежностей FastAPI. Закриває сесію після використання.
+
+    При ``DB_ASYNC`` — ``AsyncSession``, інакше звичайна ``Session``.
+    Роутери працюють з обома через :func:`run_db`.
+    """
+    if AsyncSessionLocal is not None:
+        async with AsyncSessionLocal() as db:
+            yield db
+        return
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
+        await run_in_threadpool(db.close)
+
+_DEFERRED = "deferred_effects"
+
+def after_commit(db: Session, fn: Callable[..., Any], *args: Any) -> None:
+    """Побічний ефект після коміту (інвалідизація Redis тощо).
+
+    Зазвичай виконується одразу; всередині ``run_sync`` (код на event loop) —
+    відкладається, і :func:`run_db` виконує його в threadpool.
+    """
+    pending = db.info.get(_DEFERRED)
+    if pending is None:
+        fn(*args)
+    else:
+        pending.append((fn, args))
+
+def _run_effects(effects: list) -> None:
+    for fn, args in effects:
+        fn(*args)
+
+async def run_db(db: Any, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Виконує синхронну функцію ``fn(session, *args, **kwargs)`` не блокуючи event loop.
+
+    Для ``AsyncSession`` — через ``run_sync`` (greenlet, без потоків), а синхронні
+    виклики Redis з :func:`after_commit` — потім у threadpool; для звичайної
+    ``Session`` — усе в threadpool Starlette.
+    """
+    if isinstance(db, Session):
+        return await run_in_threadpool(fn, db, *args, **kwargs)
+    effects: list = []
+    db.info[_DEFERRED] = effects
+    try:
+        return await db.run_sync(fn, *args, **kwargs)
+    finally:
+        db.info.pop(_DEFERRED, None)
+        if effects:
+            await run_in_threadpool(_run_effects, effects)
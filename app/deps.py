@@ -1,31 +1,85 @@
-import time
-from typing import Dict, List
-from fastapi import Depends, HTTPException, status
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional, Union
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from .database import get_db
+from starlette.concurrency import run_in_threadpool
+from .database import get_db, load_write_marker
 from .settings import settings
 from .security import decode_token
-from .cache import get_cached_user, cache_user
-from . import models
+from .cache import cache_user, flights, lookup_user, peek_user
+from . import models, crud_async, ratelimit
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-# Проста in-memory rate-limit для /me (не для продакшну з кількома процесами)
-_calls: Dict[int, List[float]] = {}
-
-def rate_limit_me(user_id: int):
-    now = time.time()
-    window = settings.RATE_LIMIT_ME_WINDOW_SEC
-    max_calls = settings.RATE_LIMIT_ME_CALLS
-    lst = _calls.setdefault(user_id, [])
-    lst[:] = [t for t in lst if now - t < window]
-    if len(lst) >= max_calls:
-        raise HTTPException(status_code=429, detail="Too Many Requests on /me")
-    lst.append(now)
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
-    """Повертає поточного користувача за JWT, використовуючи кеш Redis."""
+Limit = Union[int, Callable[[], int]]
+
+def _value(v: Limit) -> int:
+    return v() if callable(v) else v
+
+async def check_rate(scope: str, key: str, calls: Limit, period: Limit, response: Response) -> None:
+    """Рахує запит для ``scope:key``; 429 з ``Retry-After`` при перевищенні, інакше заголовки X-RateLimit-*."""
+    # клієнт Redis синхронний — виносимо з event loop
+    result = await run_in_threadpool(ratelimit.hit, f"{scope}:{key}", _value(calls), _value(period))
+    if not result.allowed:
+        raise HTTPException(status_code=429, detail=f"Too Many Requests on {scope}", headers=result.headers())
+    response.headers.update(result.headers())
+
+@dataclass(frozen=True, slots=True)
+class Principal:
+    """Легкий read-only користувач для авторизації (без ORM і без сесії БД).
+
+    Будується або з payload кешу (:func:`app.cache.cache_user`), або з ORM-об'єкта
+    при промаху. Для змін профілю роутери завантажують ``models.User`` окремо.
+    """
+    id: int
+    email: str
+    is_active: bool
+    is_verified: bool
+    avatar_url: Optional[str]
+    avatar_status: Optional[str]
+    role: str
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+    @classmethod
+    def from_user(cls, user: models.User) -> "Principal":
+        return cls(
+            id=user.id,
+            email=user.email,
+            is_active=bool(user.is_active),
+            is_verified=bool(user.is_verified),
+            avatar_url=user.avatar_url,
+            avatar_status=user.avatar_status,
+            role=user.role or "user",
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+    @classmethod
+    def from_cache(cls, data: Dict[str, Any]) -> "Principal":
+        def _dt(v: Optional[str]) -> Optional[datetime]:
+            return datetime.fromisoformat(v) if v else None
+        return cls(
+            id=int(data["id"]),
+            email=data["email"],
+            is_active=bool(data["is_active"]),
+            is_verified=bool(data["is_verified"]),
+            avatar_url=data.get("avatar_url"),
+            avatar_status=data.get("avatar_status"),
+            role=data.get("role") or "user",
+            created_at=_dt(data.get("created_at")),
+            updated_at=_dt(data.get("updated_at")),
+        )
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """Повертає поточного користувача за JWT.
+
+    При попаданні в кеш Redis БД не використовується взагалі; при промаху
+    читаємо користувача з БД і кладемо його в кеш з поколінням, прочитаним
+    до запиту в БД (захист від гонки з інвалідизацією).
+    """
     try:
         payload = decode_token(token)
     except Exception:
@@ -33,28 +87,61 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     sub = payload.get("sub")
     if not sub:
         raise HTTPException(status_code=401, detail="Invalid token")
-    cached = get_cached_user(int(sub))
+    user_id = int(sub)
+    db.info["user_id"] = user_id  # read-your-writes для реплік (див. database.RoutingSession)
+    await load_write_marker(db, user_id)
+    # спершу рівень у пам'яті процесу, далі Redis (синхронний клієнт — поза event loop)
+    cached = peek_user(user_id)
+    if cached is None:
+        cached, gen = await run_in_threadpool(lookup_user, user_id)
     if cached:
-        # Створюємо об'єкт User-подібний (легка реконструкція)
-        user = db.get(models.User, int(sub))
-        if user:
-            return user
-    user = db.get(models.User, int(sub))
-    if user:
-        cache_user(user)
-
-    if not user or not user.is_active:
+        principal = Principal.from_cache(cached)
+    else:
+        async def load() -> Optional[Principal]:
+            user = await crud_async.get_user(db, user_id)
+            if not user:
+                return None
+            await run_in_threadpool(cache_user, user, gen=gen)
+            return Principal.from_user(user)
+
+        # конкурентні промахи по одному користувачу — один запит у БД
+        principal = await flights.do(("user", user_id), load)
+        if principal is None:
+            raise HTTPException(status_code=401, detail="User inactive or not found")
+
+    if not principal.is_active:
         raise HTTPException(status_code=401, detail="User inactive or not found")
-    return user
+    return principal
 
-def require_verified(user: models.User = Depends(get_current_user)) -> models.User:
+async def require_verified(user: Principal = Depends(get_current_user)) -> Principal:
     if not user.is_verified:
         raise HTTPException(status_code=403, detail="Email is not verified")
     return user
 
 
-def require_admin(user: models.User = Depends(get_current_user)) -> models.User:
+async def require_admin(user: Principal = Depends(get_current_user)) -> Principal:
     """Перевіряє, що користувач має роль admin."""
     if getattr(user, 'role', 'user') != 'admin':
         raise HTTPException(status_code=403, detail="Admin role required")
     return user
+
+
+def rate_limit(scope: str, calls: Limit, period: Limit):
+    """Залежність: ліміт ``calls`` запитів за ``period`` секунд на користувача.
+
+    ``calls``/``period`` можуть бути функціями (читаються з settings при кожному запиті).
+    Додає заголовки ``X-RateLimit-*``; при перевищенні — 429 з ``Retry-After``.
+    """
+    async def dependency(response: Response, user: Principal = Depends(get_current_user)) -> None:
+        await check_rate(scope, f"u{user.id}", calls, period, response)
+    return dependency
+
+def rate_limit_ip(scope: str, calls: Limit, period: Limit):
+    """Як :func:`rate_limit`, але за IP клієнта (для анонімних ендпоінтів)."""
+    async def dependency(request: Request, response: Response) -> None:
+        ip = request.client.host if request.client else "unknown"
+        await check_rate(scope, f"ip{ip}", calls, period, response)
+    return dependency
+
+# Ліміт для /users/me (за замовчуванням 5 запитів на хвилину)
+rate_limit_me = rate_limit("me", lambda: settings.RATE_LIMIT_ME_CALLS, lambda: settings.RATE_LIMIT_ME_WINDOW_SEC)
@@ -0,0 +1,50 @@
+"""Продакшн-профіль сервера: ``gunicorn -c python:app.gunicorn_conf app.main:app``.
+
+Кілька воркерів uvicorn (за кількістю доступних ядер або ``WEB_WORKERS``) під
+gunicorn: один повільний запит (bcrypt, серіалізація великої сторінки) більше не
+зупиняє весь трафік контейнера. З ``WEB_PRELOAD`` застосунок імпортується один раз
+у master, воркери отримують його через fork; пули БД/Redis, потоки й пули задач
+кожен модуль перестворює в дочірньому процесі сам (``os.register_at_fork``), а
+startup (прогрів, слухач інвалідизації) виконується вже у воркері.
+
+SIGTERM — плавна зупинка: воркери перестають приймати з'єднання, дочікуються
+запитів у роботі (до ``WEB_GRACEFUL_TIMEOUT_SEC``) і виконують shutdown.
+``WEB_MAX_REQUESTS`` (+ jitter) періодично перезапускає воркери.
+"""
+import os
+from .settings import settings
+
+
+def cpu_count() -> int:
+    """Ядра, доступні процесу (з урахуванням affinity/cpuset контейнера)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def worker_count() -> int:
+    # async-воркер завантажує ядро сам, тож по одному на ядро (а не 2N+1, як для sync)
+    return settings.WEB_WORKERS or cpu_count()
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = worker_count()
+preload_app = settings.WEB_PRELOAD
+max_requests = settings.WEB_MAX_REQUESTS
+max_requests_jitter = settings.WEB_MAX_REQUESTS_JITTER if settings.WEB_MAX_REQUESTS else 0
+graceful_timeout = settings.WEB_GRACEFUL_TIMEOUT_SEC
+keepalive = settings.WEB_KEEPALIVE_SEC
+accesslog = None
+errorlog = "-"
+
+
+def on_starting(server) -> None:
+    # Пул bcrypt (HASH_POOL_WORKERS) створюється в кожному воркері: ділимо ядра між ними,
+    # а не N воркерів × N процесів хешування
+    if settings.HASH_POOL_WORKERS is None:
+        settings.HASH_POOL_WORKERS = max(1, cpu_count() // server.num_workers)
+
+
+def post_fork(server, worker) -> None:
+    server.log.info("Worker %s forked (preload=%s)", worker.pid, preload_app)
@@ -0,0 +1,109 @@
+"""In-process кеш (LRU + TTL) перед Redis і single-flight для промахів.
+
+Рівень у пам'яті знімає мережевий round trip для гарячих ключів (користувач
+у ``get_current_user``, аватар за замовчуванням). Узгодженість між воркерами
+тримається на інвалідизації через Redis pub/sub (див. ``cache.py``) і короткому TTL
+як страховці на випадок втраченого повідомлення.
+"""
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+MISSING = object()
+
+
+class LocalCache:
+    """Потокобезпечний LRU з TTL і лічильниками hits/misses/evictions.
+
+    ``token(key)`` + ``set(..., token=...)`` захищають від гонки з інвалідизацією:
+    значення, прочитане до ``delete(key)``, не буде записане після неї.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.maxsize, self.ttl, self.clock = maxsize, ttl, clock
+        self._data: OrderedDict[Hashable, Tuple[float, Any]] = OrderedDict()
+        self._tokens: Dict[Hashable, int] = {}
+        self._epoch = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0, "invalidations": 0}
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.stats["misses"] += 1
+                return MISSING
+            expires, value = item
+            if expires <= self.clock():
+                del self._data[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+            return value
+
+    def token(self, key: Hashable) -> Tuple[int, int]:
+        with self._lock:
+            return self._epoch, self._tokens.get(key, 0)
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None, token: Tuple[int, int] | None = None) -> bool:
+        with self._lock:
+            if token is not None and token != (self._epoch, self._tokens.get(key, 0)):
+                return False  # ключ інвалідовано, поки значення читалось
+            self._data[key] = (self.clock() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+            return True
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            # лічильник лише для ключів, які хтось читає зараз; LRU не росте від інвалідизацій
+            self._tokens[key] = self._tokens.get(key, 0) + 1
+            if len(self._tokens) > self.maxsize:
+                self._tokens.clear()
+                self._epoch += 1
+            self.stats["invalidations"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._tokens.clear()
+            self._epoch += 1
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SingleFlight:
+    """Об'єднує конкурентні промахи по одному ключу в один виклик завантажувача."""
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is not None and fut.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+            return await asyncio.shield(fut)
+        fut = asyncio.get_running_loop().create_future()
+        self._inflight[key] = fut
+        try:
+            result = await fn()
+        except BaseException as e:
+            fut.set_exception(e)
+            fut.exception()  # позначаємо як прочитану, якщо чекачів немає
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            if self._inflight.get(key) is fut:
+                del self._inflight[key]
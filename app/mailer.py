@@ -0,0 +1,423 @@
+"""Черга листів і їх відправка поза web-воркером.
+
+API лише ставить лист у чергу (:func:`enqueue`), а окремий процес
+``python -m app.worker`` забирає їх пакетами і надсилає через пул уже
+автентифікованих SMTP-з'єднань, повторюючи невдалі спроби з експоненційною паузою.
+
+* З Redis черга надійна: задача переходить у список ``mail:processing:<worker>``
+  і видаляється звідти лише після відправки; після падіння воркер повертає свої
+  незавершені задачі в чергу при старті. Список "орендований", поки живий ключ
+  ``mail:heartbeat:<worker>`` (TTL ``MAIL_WORKER_LEASE_SEC``): списки воркерів з
+  простроченою орендою (перезапуск з іншим id) повертають у чергу інші воркери.
+  Відкладені повтори — у ZSET ``mail:delayed``, вичерпані — у ``mail:dead``.
+* Без Redis — черга в пам'яті процесу API з фоновим потоком-відправником
+  (не переживає перезапуск; для dev і тестів).
+"""
+from __future__ import annotations
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+import uuid
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+from .cache import get_redis
+from .settings import settings
+
+if TYPE_CHECKING:  # smtplib/ssl потрібні лише воркеру, що реально надсилає листи
+    import smtplib
+
+log = logging.getLogger(__name__)
+link_log = logging.getLogger("uvicorn.error")
+
+QUEUE_KEY = "mail:queue"
+DELAYED_KEY = "mail:delayed"
+DEAD_KEY = "mail:dead"
+PROCESSING_PREFIX = "mail:processing:"
+HEARTBEAT_PREFIX = "mail:heartbeat:"
+
+Job = Dict[str, Any]
+Transport = Callable[[List[EmailMessage]], List[Optional[Exception]]]
+
+
+def smtp_configured() -> bool:
+    return bool(settings.SMTP_HOST)
+
+
+def new_job(to: str, subject: str, body: str, kind: str = "generic") -> Job:
+    return {"id": uuid.uuid4().hex, "to": to, "subject": subject, "body": body, "kind": kind, "attempts": 0}
+
+
+def build_message(job: Job) -> EmailMessage:
+    smtp_from = settings.SMTP_FROM or settings.SMTP_USER or "no-reply@example.com"
+    msg = EmailMessage()
+    msg["Subject"] = job["subject"]
+    # Якщо SMTP_FROM має вигляд "Name <email>", залишаємо як є; інакше загортаємо
+    msg["From"] = smtp_from if "<" in smtp_from and ">" in smtp_from else formataddr(("", smtp_from))
+    msg["To"] = job["to"]
+    msg.set_content(job["body"])
+    return msg
+
+
+def backoff(attempts: int) -> float:
+    """Пауза перед наступною спробою: BASE * 2^(спроба-1), не більше MAX."""
+    return min(settings.MAIL_RETRY_BASE_SEC * 2 ** max(attempts - 1, 0), settings.MAIL_RETRY_MAX_SEC)
+
+
+# --- SMTP ---
+
+class SMTPPool:
+    """Пул автентифікованих SMTP-сесій: TLS-рукостискання і LOGIN — один раз на з'єднання.
+
+    З'єднання, що простояло довше ``MAIL_SMTP_IDLE_SEC``, перевіряється ``NOOP``;
+    після помилки закривається і наступного разу відкривається заново.
+    """
+
+    def __init__(self, size: int = 1):
+        self.size = size
+        self._idle: "queue.LifoQueue[tuple[smtplib.SMTP, float]]" = queue.LifoQueue()
+        self.opened = 0
+
+    def _connect(self) -> smtplib.SMTP:
+        import smtplib
+        import ssl
+        host, port = settings.SMTP_HOST, int(settings.SMTP_PORT or 587)
+        context = ssl.create_default_context()
+        if port == 465:
+            server: smtplib.SMTP = smtplib.SMTP_SSL(host, port, context=context, timeout=settings.MAIL_SMTP_TIMEOUT_SEC)
+        else:
+            server = smtplib.SMTP(host, port, timeout=settings.MAIL_SMTP_TIMEOUT_SEC)
+            server.ehlo()
+            if settings.SMTP_STARTTLS:
+                server.starttls(context=context)
+                server.ehlo()
+        if settings.SMTP_USER and settings.SMTP_PASSWORD:
+            server.login(settings.SMTP_USER, settings.SMTP_PASSWORD)
+        self.opened += 1
+        return server
+
+    def acquire(self) -> smtplib.SMTP:
+        import smtplib
+        while True:
+            try:
+                server, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - last_used < settings.MAIL_SMTP_IDLE_SEC:
+                return server
+            try:
+                if server.noop()[0] == 250:
+                    return server
+            except (smtplib.SMTPException, OSError):
+                pass
+            self._close(server)
+
+    def release(self, server: smtplib.SMTP, broken: bool = False) -> None:
+        if broken or self._idle.qsize() >= self.size:
+            self._close(server)
+        else:
+            self._idle.put((server, time.monotonic()))
+
+    @staticmethod
+    def _close(server: smtplib.SMTP) -> None:
+        try:
+            server.quit()
+        except Exception:
+            try:
+                server.close()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._close(self._idle.get_nowait()[0])
+            except queue.Empty:
+                return
+
+    def send_batch(self, messages: List[EmailMessage]) -> List[Optional[Exception]]:
+        """Надсилає пакет одним з'єднанням; повертає помилку (або None) для кожного листа."""
+        import smtplib
+        results: List[Optional[Exception]] = []
+        server = None
+        for msg in messages:
+            try:
+                if server is None:
+                    server = self.acquire()
+                server.send_message(msg)
+                results.append(None)
+            except (smtplib.SMTPServerDisconnected, OSError, socket.timeout) as e:
+                # з'єднання зламалось — наступний лист піде новим
+                if server is not None:
+                    self.release(server, broken=True)
+                server = None
+                results.append(e)
+            except smtplib.SMTPException as e:
+                results.append(e)  # відмова для конкретного листа, з'єднання живе
+        if server is not None:
+            self.release(server)
+        return results
+
+
+def log_transport(messages: List[EmailMessage]) -> List[Optional[Exception]]:
+    """SMTP не налаштовано: посилання потрапляють у лог (як і раніше)."""
+    for msg in messages:
+        link_log.info("Email for %s (%s): %s", msg["To"], msg["Subject"], msg.get_content().strip())
+    return [None] * len(messages)
+
+
+def default_transport(pool: SMTPPool) -> Transport:
+    return pool.send_batch if smtp_configured() else log_transport
+
+
+# --- Черги ---
+
+class RedisMailQueue:
+    """Надійна черга на списках Redis (LMOVE у per-worker processing-список)."""
+
+    def __init__(self, client, worker_id: str):
+        self.r = client
+        self.processing = PROCESSING_PREFIX + worker_id
+        self.heartbeat_key = HEARTBEAT_PREFIX + worker_id
+
+    def push(self, job: Job) -> None:
+        self.r.lpush(QUEUE_KEY, json.dumps(job))
+
+    def _requeue(self, processing: str) -> int:
+        moved = 0
+        while self.r.lmove(processing, QUEUE_KEY, "RIGHT", "LEFT") is not None:
+            moved += 1
+        return moved
+
+    def heartbeat(self) -> None:
+        """Продовжує оренду processing-списку цього воркера."""
+        self.r.set(self.heartbeat_key, "1", px=int(settings.MAIL_WORKER_LEASE_SEC * 1000))
+
+    def release(self) -> None:
+        self.r.delete(self.heartbeat_key)
+
+    def recover(self) -> int:
+        """Повертає в чергу задачі, які цей воркер не встиг завершити до падіння."""
+        self.heartbeat()
+        return self._requeue(self.processing)
+
+    def reclaim_stale(self) -> int:
+        """Повертає в чергу задачі з processing-списків воркерів, чия оренда минула."""
+        moved = 0
+        for key in self.r.scan_iter(match=PROCESSING_PREFIX + "*"):
+            if key == self.processing or self.r.exists(HEARTBEAT_PREFIX + key[len(PROCESSING_PREFIX):]):
+                continue
+            # LMOVE атомарний: кілька воркерів, що забирають той самий список, не дублюють задачі
+            moved += self._requeue(key)
+        return moved
+
+    def promote_due(self, now: float) -> None:
+        for raw in self.r.zrangebyscore(DELAYED_KEY, 0, now, start=0, num=100):
+            if self.r.zrem(DELAYED_KEY, raw):  # хто видалив — той і переносить
+                self.r.lpush(QUEUE_KEY, raw)
+
+    def take(self, max_items: int, timeout: float) -> List[tuple[str, Job]]:
+        first = self.r.blmove(QUEUE_KEY, self.processing, timeout, "RIGHT", "LEFT")
+        if first is None:
+            return []
+        raws = [first]
+        while len(raws) < max_items:
+            raw = self.r.lmove(QUEUE_KEY, self.processing, "RIGHT", "LEFT")
+            if raw is None:
+                break
+            raws.append(raw)
+        return [(raw, json.loads(raw)) for raw in raws]
+
+    def ack(self, raw: str) -> None:
+        self.r.lrem(self.processing, 1, raw)
+
+    def retry(self, raw: str, job: Job, at: float) -> None:
+        pipe = self.r.pipeline()
+        pipe.zadd(DELAYED_KEY, {json.dumps(job): at})
+        pipe.lrem(self.processing, 1, raw)
+        pipe.execute()
+
+    def dead(self, raw: str, job: Job) -> None:
+        pipe = self.r.pipeline()
+        pipe.lpush(DEAD_KEY, json.dumps(job))
+        pipe.lrem(self.processing, 1, raw)
+        pipe.execute()
+
+
+class LocalMailQueue:
+    """Черга в пам'яті процесу (fallback без Redis); повтори — через heap за часом."""
+
+    def __init__(self):
+        self._q: "queue.Queue[Job]" = queue.Queue()
+        self._delayed: List[tuple[float, Job]] = []
+        self._lock = threading.Lock()
+        self.dead_jobs: List[Job] = []
+
+    def push(self, job: Job) -> None:
+        self._q.put(job)
+
+    def recover(self) -> int:
+        return 0
+
+    def heartbeat(self) -> None:
+        pass
+
+    def release(self) -> None:
+        pass
+
+    def reclaim_stale(self) -> int:
+        return 0
+
+    def promote_due(self, now: float) -> None:
+        with self._lock:
+            due = [j for at, j in self._delayed if at <= now]
+            self._delayed = [(at, j) for at, j in self._delayed if at > now]
+        for job in due:
+            self._q.put(job)
+
+    def take(self, max_items: int, timeout: float) -> List[tuple[str, Job]]:
+        try:
+            jobs = [self._q.get(timeout=timeout)]
+        except queue.Empty:
+            return []
+        while len(jobs) < max_items:
+            try:
+                jobs.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return [(job["id"], job) for job in jobs]
+
+    def ack(self, raw: str) -> None:
+        pass
+
+    def retry(self, raw: str, job: Job, at: float) -> None:
+        with self._lock:
+            self._delayed.append((at, job))
+
+    def dead(self, raw: str, job: Job) -> None:
+        self.dead_jobs.append(job)
+
+    def pending(self) -> int:
+        return self._q.qsize() + len(self._delayed)
+
+
+# --- Воркер ---
+
+class MailWorker:
+    """Цикл: перенести відкладені → взяти пакет → надіслати → ack / retry / dead."""
+
+    def __init__(self, mail_queue, transport: Optional[Transport] = None, batch_size: Optional[int] = None,
+                 clock: Callable[[], float] = time.time):
+        self.queue = mail_queue
+        self.pool = SMTPPool(size=settings.MAIL_SMTP_POOL_SIZE)
+        self.transport = transport
+        self.batch_size = batch_size or settings.MAIL_BATCH_SIZE
+        self.clock = clock
+        self._stop = threading.Event()
+        self._next_reclaim = 0.0
+        self.sent = 0
+        self.failed = 0
+
+    def run_once(self, timeout: float = 1.0) -> int:
+        """Обробляє один пакет; повертає кількість взятих задач."""
+        now = self.clock()
+        self.queue.heartbeat()
+        if now >= self._next_reclaim:
+            self._next_reclaim = now + settings.MAIL_WORKER_LEASE_SEC
+            reclaimed = self.queue.reclaim_stale()
+            if reclaimed:
+                log.warning("Requeued %d emails abandoned by workers with expired leases", reclaimed)
+        self.queue.promote_due(now)
+        batch = self.queue.take(self.batch_size, timeout)
+        if not batch:
+            return 0
+        transport = self.transport or default_transport(self.pool)
+        results = transport([build_message(job) for _, job in batch])
+        for (raw, job), error in zip(batch, results):
+            if error is None:
+                self.queue.ack(raw)
+                self.sent += 1
+                continue
+            job = dict(job, attempts=job.get("attempts", 0) + 1, error=str(error))
+            self.failed += 1
+            if job["attempts"] >= settings.MAIL_MAX_ATTEMPTS:
+                log.error("Giving up on email %s to %s after %d attempts: %s", job["id"], job["to"], job["attempts"], error)
+                self.queue.dead(raw, job)
+            else:
+                delay = backoff(job["attempts"])
+                log.warning("Email %s to %s failed (%s), retry in %.0fs", job["id"], job["to"], error, delay)
+                self.queue.retry(raw, job, self.clock() + delay)
+        return len(batch)
+
+    def run(self) -> None:
+        recovered = self.queue.recover()
+        if recovered:
+            log.info("Requeued %d unfinished emails", recovered)
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:  # Redis недоступний тощо — не падаємо
+                log.warning("Mail worker error: %s", e)
+                self._stop.wait(1.0)
+        self.pool.close()
+        try:
+            self.queue.release()
+        except Exception:
+            pass
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+# --- Постановка в чергу (з API) ---
+
+_local_queue: Optional[LocalMailQueue] = None
+_local_worker: Optional[MailWorker] = None
+_local_lock = threading.Lock()
+
+
+def _local() -> LocalMailQueue:
+    """Черга в пам'яті з ліниво запущеним потоком-відправником."""
+    global _local_queue, _local_worker
+    with _local_lock:
+        if _local_queue is None:
+            _local_queue = LocalMailQueue()
+        if _local_worker is None:
+            _local_worker = MailWorker(_local_queue)
+            threading.Thread(target=_local_worker.run, name="mail-local", daemon=True).start()
+        return _local_queue
+
+
+def enqueue(to: str, subject: str, body: str, kind: str = "generic") -> Job:
+    """Ставить лист у чергу (Redis або локальну); не чекає на SMTP."""
+    job = new_job(to, subject, body, kind)
+    r = get_redis()
+    if r is not None:
+        try:
+            r.lpush(QUEUE_KEY, json.dumps(job))
+            return job
+        except Exception as e:
+            log.warning("Redis mail queue unavailable, using local queue: %s", e)
+    _local().push(job)
+    return job
+
+
+def stop_local_worker() -> None:
+    global _local_worker
+    if _local_worker is not None:
+        _local_worker.stop()
+        _local_worker = None
+
+
+def _after_fork() -> None:
+    # потік-відправник батька не пережив fork, а листи в його черзі надішле батько
+    global _local_queue, _local_worker, _local_lock
+    _local_queue, _local_worker, _local_lock = None, None, threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
@@ -1,23 +1,38 @@
+import time
+_IMPORT_STARTED = time.perf_counter()  # до решти імпортів: фаза "import" холодного старту
+
+import asyncio
+import functools
 import logging
+import os
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi import Request
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import text
 from .database import engine
-from .models import Base
 from .routers import contacts, auth, users
 from .settings import settings
+from .security import HashingBusyError, shutdown_hashing_pool, hashing_stats
+from . import avatars, cache, mailer, metrics, migrate, readiness
+from .responses import FastJSONResponse
 
 log = logging.getLogger("contacts_api")
 
 app = FastAPI(
     title="Contacts API",
     description="REST API з аутентифікацією, JWT, верифікацією email, CORS, Cloudinary аватари",
-    version="2.0.0"
+    version="2.0.0",
+    default_response_class=FastJSONResponse,  # orjson замість stdlib json (app/responses.py)
 )
 
+# Метрики латентності / SQL / Redis на запит (див. GET /metrics)
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.register(metrics.Gauge(
+    "password_hashing", "bcrypt pool: queue, rejections, wait/hash seconds",
+    lambda: {(k,): float(v) for k, v in hashing_stats().items()}, ("stat",),
+))
+
 # CORS
 allow_origins = [o.strip() for o in (settings.CORS_ALLOW_ORIGINS or "*").split(",")]
 app.add_middleware(
@@ -26,39 +41,79 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Next-Cursor", "ETag"],
 )
 
+_warmup_task: asyncio.Task | None = None
+
 @app.on_event("startup")
-def on_startup():
-    # Створюємо таблиці (демо без Alembic)
-    Base.metadata.create_all(bind=engine)
-    # Легка міграція owner_id (працює на PostgreSQL; якщо свіжа БД — пропуститься)
-    try:
-        with engine.begin() as conn:
-            conn.execute(text("ALTER TABLE contacts ADD COLUMN IF NOT EXISTS owner_id INTEGER"))
-            conn.execute(text("""DO $$ BEGIN
-                IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'contacts_owner_id_fkey') THEN
-                    ALTER TABLE contacts ADD CONSTRAINT contacts_owner_id_fkey
-                    FOREIGN KEY (owner_id) REFERENCES users (id) ON DELETE CASCADE;
-                END IF;
-            END $$;"""))
-            conn.execute(text("CREATE INDEX IF NOT EXISTS ix_contacts_owner_id ON contacts (owner_id)"))
-    except Exception as e:
-        log.warning("Migration step failed (safe to ignore if fresh DB): %s", e)
+async def on_startup():
+    global _warmup_task
+    t0 = time.perf_counter()
+    # Схема — через `python -m app.migrate` (окремий крок перед стартом, див. Dockerfile);
+    # тут лише перевірка, щоб не працювати з неактуальною БД
+    if settings.DB_MIGRATE_ON_STARTUP:
+        migrate.migrate(engine)
+    if settings.DB_SCHEMA_CHECK:
+        migrate.check_schema(engine)
+    # інвалідизація рівня кешу в пам'яті від інших воркерів (лише з Redis)
+    cache.start_invalidation_listener()
+    readiness.timings["startup"] = time.perf_counter() - t0
+    # Прогрів — у фоні: `/` відповідає одразу, `/ready` зеленіє після прогріву
+    readiness.reset()
+    _warmup_task = asyncio.get_running_loop().create_task(readiness.warm_up())
+
+@app.on_event("shutdown")
+def on_shutdown():
+    if _warmup_task is not None:
+        _warmup_task.cancel()
+    cache.stop_invalidation_listener()
+    mailer.stop_local_worker()
+    avatars.shutdown()
+    shutdown_hashing_pool()
+
+@app.exception_handler(HashingBusyError)
+async def hashing_busy_handler(request: Request, exc: HashingBusyError):
+    # Backpressure: черга bcrypt переповнена — просимо клієнта повторити пізніше
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
 
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(contacts.router)
 
 # Прості шаблони UI
+if settings.AVATAR_STORAGE == "local":
+    # аватари з локального сховища (у проді краще віддавати через nginx/CDN)
+    os.makedirs(settings.AVATAR_LOCAL_DIR, exist_ok=True)
+    app.mount(settings.AVATAR_LOCAL_URL, StaticFiles(directory=settings.AVATAR_LOCAL_DIR), name="avatars")
 app.mount('/static', StaticFiles(directory=str((__file__[:-8] + '/web/static'))), name='static')
-templates = Jinja2Templates(directory=str((__file__[:-8] + '/web/templates')))
+
+@functools.lru_cache(maxsize=None)
+def _templates():
+    # jinja2 потрібен лише для /ui — не імпортуємо його при старті
+    from fastapi.templating import Jinja2Templates
+    return Jinja2Templates(directory=str((__file__[:-8] + '/web/templates')))
 
 @app.get('/ui')
 async def ui_index(request: Request):
-    return templates.TemplateResponse('index.html', {"request": request})
+    return _templates().TemplateResponse('index.html', {"request": request})
 
 
 @app.get("/", tags=["health"])
 def healthcheck():
+    """Liveness: процес відповідає (без звернень до БД)."""
     return {"status": "ok"}
+
+@app.get("/ready", tags=["health"])
+async def ready():
+    """Readiness: 200 лише після прогріву пулів; обов'язковий крок, що впав, повторюється тут."""
+    if not readiness.state["ready"] and not readiness.state["warming"] and _warmup_task is not None and _warmup_task.done():
+        await readiness.warm_up()
+    body = {"status": "ready" if readiness.state["ready"] else "starting", "checks": readiness.checks}
+    return JSONResponse(status_code=200 if readiness.state["ready"] else 503, content=body)
+
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+readiness.timings["import"] = time.perf_counter() - _IMPORT_STARTED
@@ -0,0 +1,265 @@
+"""Метрики продуктивності у форматі Prometheus (без зовнішніх залежностей).
+
+* ``MetricsMiddleware`` — латентність і кількість запитів за шаблоном маршруту;
+* :func:`instrument_engine` — кількість і час SQL-запитів (глобально і на запит);
+* :func:`timed_redis` — час операцій Redis у ``app/cache.py``;
+* :func:`render` — текст для ``GET /metrics``.
+
+Статистика поточного запиту живе в ``ContextVar``, тож її бачать і threadpool
+(контекст копіюється), і ``run_sync`` async-сесії.
+"""
+from __future__ import annotations
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import event
+from .settings import settings
+
+log = logging.getLogger("contacts_api.slow")
+db_log = logging.getLogger("contacts_api.db")
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+LabelValues = Tuple[str, ...]
+
+
+def _fmt_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    parts = [f'{n}="{str(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = ()):
+        self.name, self.doc, self.labels = name, doc, labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels: str) -> float:
+        return self._values.get(labels, 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, v in sorted(self._values.items()):
+                lines.append(f"{self.name}{_fmt_labels(self.labels, labels)} {v}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, doc: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name, self.doc, self.labels, self.buckets = name, doc, labels, buckets
+        self._values: Dict[LabelValues, List[float]] = {}  # [лічильники бакетів..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            row = self._values.get(labels)
+            if row is None:
+                row = self._values[labels] = [0.0] * (len(self.buckets) + 2)
+            for i, b in enumerate(self.buckets):
+                if value <= b:
+                    row[i] += 1
+            row[-2] += value
+            row[-1] += 1
+
+    def count(self, *labels: str) -> float:
+        row = self._values.get(labels)
+        return row[-1] if row else 0.0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, row in sorted(self._values.items()):
+                for b, c in zip(self.buckets, row):
+                    le = 'le="%s"' % b
+                    lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, labels, le)} {c}")
+                inf = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labels, labels, inf)} {row[-1]}")
+                lines.append(f"{self.name}_sum{_fmt_labels(self.labels, labels)} {row[-2]}")
+                lines.append(f"{self.name}_count{_fmt_labels(self.labels, labels)} {row[-1]}")
+        return lines
+
+
+class Gauge:
+    """Значення обчислюється при кожному скрейпі (``fn`` повертає {labels: value})."""
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], Dict[LabelValues, float]], labels: Tuple[str, ...] = ()):
+        self.name, self.doc, self.fn, self.labels = name, doc, fn, labels
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} gauge"]
+        try:
+            values = self.fn()
+        except Exception:  # метрики не повинні ламати /metrics
+            return []
+        for labels, v in sorted(values.items()):
+            lines.append(f"{self.name}{_fmt_labels(self.labels, labels)} {v}")
+        return lines
+
+
+_registry: List[Any] = []
+
+
+def register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def render() -> str:
+    lines: List[str] = []
+    for m in _registry:
+        lines.extend(m.render())
+    return "\n".join(lines) + "\n"
+
+
+HTTP_REQUESTS = register(Counter("http_requests_total", "HTTP requests", ("method", "route", "status")))
+HTTP_LATENCY = register(Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route")))
+DB_QUERIES = register(Counter("db_queries_total", "SQL statements executed"))
+DB_LATENCY = register(Histogram("db_query_duration_seconds", "SQL statement latency"))
+DB_PER_REQUEST = register(Histogram("db_queries_per_request", "SQL statements per HTTP request", ("route",), COUNT_BUCKETS))
+DB_POOL_WAIT = register(Histogram("db_pool_checkout_seconds", "Time to obtain a pooled connection (wait + connect)"))
+DB_POOL_TIMEOUTS = register(Counter("db_pool_timeouts_total", "Checkouts that hit DB_POOL_TIMEOUT_SEC"))
+DB_DISCONNECTS = register(Counter("db_disconnects_total", "Disconnect errors (pool invalidated)"))
+REDIS_LATENCY = register(Histogram("redis_op_duration_seconds", "Redis cache operation latency", ("op",)))
+
+
+# --- Статистика поточного запиту ---
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    redis_ops: int = 0
+    redis_seconds: float = 0.0
+    statements: Optional[List[str]] = None  # лише при увімкненому slow log
+    started: float = field(default_factory=time.perf_counter)
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+class request_scope:
+    """Контекст збору статистики запиту (використовується middleware і тестами)."""
+
+    def __init__(self, collect_sql: bool = False):
+        self.stats = RequestStats(statements=[] if collect_sql else None)
+
+    def __enter__(self) -> RequestStats:
+        self._token = _current.set(self.stats)
+        return self.stats
+
+    def __exit__(self, *exc) -> None:
+        _current.reset(self._token)
+
+
+# --- SQLAlchemy ---
+
+def instrument_engine(engine) -> None:
+    """Підписується на події двигуна (для AsyncEngine — на ``sync_engine``)."""
+    target = getattr(engine, "sync_engine", engine)
+    if getattr(target, "_metrics_instrumented", False):
+        return
+    target._metrics_instrumented = True
+
+    @event.listens_for(target, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(target, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        DB_QUERIES.inc()
+        DB_LATENCY.observe(elapsed)
+        stats = _current.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.db_seconds += elapsed
+            if stats.statements is not None and len(stats.statements) < 100:
+                stats.statements.append(f"[{elapsed * 1000:.1f}ms] {' '.join(statement.split())}")
+
+    @event.listens_for(target, "handle_error")
+    def _error(ctx):
+        # after_cursor_execute не викликається для запиту з помилкою
+        starts = ctx.connection.info.get("query_start") if ctx.connection is not None else None
+        if starts:
+            starts.pop()
+        if ctx.is_disconnect:
+            # SQLAlchemy інвалідує весь пул: наступні checkout-и отримають нові з'єднання
+            DB_DISCONNECTS.inc()
+            db_log.warning("Database disconnect detected, pool invalidated: %s", ctx.original_exception)
+
+
+# --- Redis ---
+
+def timed_redis(fn):
+    """Декоратор для функцій cache.py: час операції в гістограму і в статистику запиту."""
+    op = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+            REDIS_LATENCY.observe(elapsed, op)
+            stats = _current.get()
+            if stats is not None:
+                stats.redis_ops += 1
+                stats.redis_seconds += elapsed
+    return wrapper
+
+
+# --- ASGI middleware ---
+
+class MetricsMiddleware:
+    """Чистий ASGI-middleware (без BaseHTTPMiddleware, щоб не додавати накладних витрат)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        slow_ms = settings.SLOW_REQUEST_MS
+        with request_scope(collect_sql=slow_ms is not None) as stats:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                elapsed = time.perf_counter() - stats.started
+                # FastAPI кладе знайдений маршрут у scope["route"]; шаблон, а не сирий шлях
+                route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+                method = scope["method"]
+                HTTP_REQUESTS.inc(method, route, str(status_code))
+                HTTP_LATENCY.observe(elapsed, method, route)
+                DB_PER_REQUEST.observe(stats.queries, route)
+                if slow_ms is not None and elapsed * 1000 >= slow_ms:
+                    log.warning(
+                        "Slow request %s %s %d: %.1fms, %d SQL (%.1fms), %d Redis (%.1fms)\n%s",
+                        method, scope["path"], status_code, elapsed * 1000, stats.queries,
+                        stats.db_seconds * 1000, stats.redis_ops, stats.redis_seconds * 1000,
+                        "\n".join(stats.statements or []),
+                    )
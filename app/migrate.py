@@ -0,0 +1,299 @@
+"""Версійовані міграції схеми: ``python -m app.migrate [--status]``.
+
+Запускаються окремим кроком перед стартом API (див. ``Dockerfile``), а не в
+``on_startup``. На PostgreSQL увесь прогін тримає advisory lock, тож кілька
+інстансів, що стартують одночасно, мігрують по черзі: перший застосовує
+міграції, решта бачать їх уже застосованими. Застосовані версії — у таблиці
+``schema_migrations``. API при старті лише перевіряє схему
+(:func:`check_schema`) і відмовляється працювати з неактуальною БД.
+
+Правила для нових міграцій: додавати в кінець :data:`MIGRATIONS` з наступним
+номером, не змінювати вже випущені; індекси на ``contacts`` — через
+:func:`create_index` (``CREATE INDEX CONCURRENTLY`` на PostgreSQL, поза транзакцією).
+Таблиці створюються з власних знімків схеми в цьому модулі, а не з ``app.models``:
+інакше зміст уже випущеної міграції змінювався б разом із моделями.
+"""
+from __future__ import annotations
+import argparse
+import logging
+import sys
+from dataclasses import dataclass
+from typing import Callable, Optional
+from sqlalchemy import (Boolean, Column, Date, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text,
+                        func, inspect, select, text)
+from sqlalchemy.engine import Connection, Engine
+from .models import Base
+
+log = logging.getLogger("contacts_api.migrate")
+
+# Ключ pg_advisory_lock, спільний для всіх інстансів цього застосунку
+MIGRATION_LOCK_KEY = 7_340_019
+
+_meta = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _meta,
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("name", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False, server_default=func.now()),
+)
+
+
+class SchemaError(RuntimeError):
+    """Схема БД не відповідає коду (є незастосовані міграції або бракує таблиць/колонок)."""
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    apply: Callable[[Connection], None]
+    # False — виконується поза транзакцією (потрібно для CREATE INDEX CONCURRENTLY)
+    transactional: bool = True
+
+
+# --- Операції ---
+
+def _is_pg(conn: Connection) -> bool:
+    return conn.dialect.name == "postgresql"
+
+
+def add_column(conn: Connection, table: str, column: str, ddl: str) -> None:
+    """ADD COLUMN, якщо колонки ще немає (працює і на SQLite, де немає IF NOT EXISTS)."""
+    if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def create_index(conn: Connection, name: str, table: str, columns: str, using: Optional[str] = None) -> None:
+    """Індекс без блокування запису на PostgreSQL (``CONCURRENTLY``).
+
+    Перерваний ``CREATE INDEX CONCURRENTLY`` лишає INVALID-індекс, який ``IF NOT EXISTS``
+    вважав би наявним, — такий індекс спершу видаляється.
+    """
+    if not _is_pg(conn):
+        conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+        return
+    invalid = conn.execute(text(
+        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+        "WHERE c.relname = :name AND NOT i.indisvalid"), {"name": name}).first()
+    if invalid:
+        conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    method = f" USING {using}" if using else ""
+    conn.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table}{method} ({columns})"))
+
+
+# --- Знімки схеми (не змінювати: їх уже застосовано до наявних БД) ---
+
+# Міграція 1: схема до версійованих міграцій
+_v1 = MetaData()
+Table(
+    "app_meta", _v1,
+    Column("key", String(100), primary_key=True),
+    Column("value", Text, nullable=True),
+)
+Table(
+    "users", _v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("email", String(255), unique=True, index=True, nullable=False),
+    Column("hashed_password", String(255), nullable=False),
+    Column("is_active", Boolean, nullable=False),
+    Column("is_verified", Boolean, nullable=False, index=True),
+    Column("avatar_url", String(500), nullable=True),
+    Column("role", String(20), nullable=False, index=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+)
+Table(
+    "contacts", _v1,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("first_name", String(100), nullable=False, index=True),
+    Column("last_name", String(100), nullable=False, index=True),
+    Column("email", String(255), nullable=False, index=True),
+    Column("phone", String(50), nullable=False, index=True),
+    Column("birthday", Date, nullable=False, index=True),
+    Column("extra", Text, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("updated_at", DateTime, nullable=False),
+    Column("owner_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True),
+)
+Table(
+    "refresh_token_families", _v1,
+    Column("id", String(36), primary_key=True),
+    Column("user_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("current_jti", String(36), nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+)
+
+# Міграція 8
+_v8 = MetaData()
+Table("users", _v8, Column("id", Integer, primary_key=True))  # лише ціль FK, не створюється
+_tombstones_v8 = Table(
+    "contact_tombstones", _v8,
+    Column("contact_id", Integer, primary_key=True, autoincrement=False),
+    Column("owner_id", Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+    Column("deleted_at", DateTime, nullable=False),
+    Index("ix_contact_tombstones_owner_deleted_id", "owner_id", "deleted_at", "contact_id"),
+)
+
+
+# --- Міграції ---
+
+def _initial(conn: Connection) -> None:
+    # Порожня БД отримує схему v1; для існуючої створюються лише відсутні таблиці,
+    # а колонки/індекси додають наступні (ідемпотентні) міграції
+    _v1.create_all(conn)
+
+
+def _contacts_owner(conn: Connection) -> None:
+    add_column(conn, "contacts", "owner_id", "INTEGER")
+    if _is_pg(conn):
+        conn.execute(text("""DO $$ BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'contacts_owner_id_fkey') THEN
+                ALTER TABLE contacts ADD CONSTRAINT contacts_owner_id_fkey
+                FOREIGN KEY (owner_id) REFERENCES users (id) ON DELETE CASCADE NOT VALID;
+            END IF;
+        END $$;"""))
+
+
+def _validate_owner_fk(conn: Connection) -> None:
+    # NOT VALID + окремий VALIDATE: перевірка рядків не тримає блокування, що заважає запису
+    if _is_pg(conn):
+        conn.execute(text("ALTER TABLE contacts VALIDATE CONSTRAINT contacts_owner_id_fkey"))
+
+
+def _birthday_md(conn: Connection) -> None:
+    add_column(conn, "contacts", "birthday_md", "SMALLINT")
+    if _is_pg(conn):
+        conn.execute(text("UPDATE contacts SET birthday_md = EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday) "
+                          "WHERE birthday_md IS NULL"))
+    else:
+        conn.execute(text("UPDATE contacts SET birthday_md = CAST(strftime('%m%d', birthday) AS INTEGER) "
+                          "WHERE birthday_md IS NULL"))
+
+
+def _avatar_status(conn: Connection) -> None:
+    add_column(conn, "users", "avatar_status", "VARCHAR(20)")
+
+
+def _contacts_indexes(conn: Connection) -> None:
+    create_index(conn, "ix_contacts_owner_id", "contacts", "owner_id")
+    create_index(conn, "ix_contacts_owner_name_id", "contacts", "owner_id, last_name, first_name, id")
+    create_index(conn, "ix_contacts_owner_id_id", "contacts", "owner_id, id")
+    create_index(conn, "ix_contacts_owner_birthday_md", "contacts", "owner_id, birthday_md")
+
+
+def _contacts_trgm(conn: Connection) -> None:
+    if not _is_pg(conn):
+        return
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    for col in ("first_name", "last_name", "email"):
+        create_index(conn, f"ix_contacts_{col}_trgm", "contacts", f"{col} gin_trgm_ops", using="gin")
+
+
+def _contact_tombstones(conn: Connection) -> None:
+    _tombstones_v8.create(conn, checkfirst=True)
+
+
+def _contacts_updated_index(conn: Connection) -> None:
+    create_index(conn, "ix_contacts_owner_updated_id", "contacts", "owner_id, updated_at, id")
+
+
+MIGRATIONS: list[Migration] = [
+    Migration(1, "initial schema", _initial),
+    Migration(2, "contacts.owner_id", _contacts_owner),
+    Migration(3, "validate contacts.owner_id fk", _validate_owner_fk, transactional=False),
+    Migration(4, "contacts.birthday_md", _birthday_md),
+    Migration(5, "users.avatar_status", _avatar_status),
+    Migration(6, "contacts keyset/birthday indexes", _contacts_indexes, transactional=False),
+    Migration(7, "contacts trigram search indexes", _contacts_trgm, transactional=False),
+    Migration(8, "contact_tombstones", _contact_tombstones),
+    Migration(9, "contacts (owner_id, updated_at, id) index", _contacts_updated_index, transactional=False),
+]
+
+
+# --- Запуск ---
+
+def applied_versions(conn: Connection) -> set[int]:
+    if not inspect(conn).has_table(schema_migrations.name):
+        return set()
+    return set(conn.execute(select(schema_migrations.c.version)).scalars())
+
+
+def migrate(eng: Optional[Engine] = None) -> list[int]:
+    """Застосовує незастосовані міграції по порядку; повертає їхні версії."""
+    if eng is None:
+        from .database import engine as eng
+    done: list[int] = []
+    with eng.connect() as raw:
+        # окреме autocommit-з'єднання: тримає advisory lock і виконує нетранзакційні кроки
+        lock_conn = raw.execution_options(isolation_level="AUTOCOMMIT")
+        pg = _is_pg(lock_conn)
+        if pg:
+            lock_conn.execute(text("SELECT pg_advisory_lock(:k)"), {"k": MIGRATION_LOCK_KEY})
+        try:
+            _meta.create_all(lock_conn)
+            applied = applied_versions(lock_conn)
+            for m in MIGRATIONS:
+                if m.version in applied:
+                    continue
+                log.info("Applying migration %04d: %s", m.version, m.name)
+                if m.transactional:
+                    with eng.begin() as conn:
+                        if pg:
+                            # не стояти в черзі за довгою транзакцією, блокуючи весь запис у таблицю
+                            conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+                        m.apply(conn)
+                        conn.execute(schema_migrations.insert().values(version=m.version, name=m.name))
+                else:
+                    m.apply(lock_conn)
+                    lock_conn.execute(schema_migrations.insert().values(version=m.version, name=m.name))
+                done.append(m.version)
+        finally:
+            if pg:
+                lock_conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": MIGRATION_LOCK_KEY})
+    return done
+
+
+def check_schema(eng: Optional[Engine] = None) -> None:
+    """Кидає :class:`SchemaError`, якщо БД відстає від коду; викликається при старті API."""
+    if eng is None:
+        from .database import engine as eng
+    with eng.connect() as conn:
+        missing = [m.version for m in MIGRATIONS if m.version not in applied_versions(conn)]
+        if missing:
+            raise SchemaError(f"Database schema is not up to date (pending migrations: {missing}); "
+                              "run `python -m app.migrate`")
+        insp = inspect(conn)
+        tables = set(insp.get_table_names())
+        for table in Base.metadata.sorted_tables:
+            if table.name not in tables:
+                raise SchemaError(f"Table {table.name!r} is missing; add a migration")
+            columns = {c["name"] for c in insp.get_columns(table.name)}
+            absent = [c.name for c in table.columns if c.name not in columns]
+            if absent:
+                raise SchemaError(f"Columns {absent} of {table.name!r} are missing; add a migration")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--status", action="store_true", help="показати застосовані/очікуючі міграції і вийти")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    from sqlalchemy import create_engine
+    from .database import engine
+    from .settings import settings
+    if settings.MIGRATE_DATABASE_URL:
+        engine = create_engine(settings.MIGRATE_DATABASE_URL)
+
+    if args.status:
+        with engine.connect() as conn:
+            applied = applied_versions(conn)
+        for m in MIGRATIONS:
+            print(f"{m.version:04d} {'applied' if m.version in applied else 'pending':8} {m.name}")
+        return 0
+    done = migrate(engine)
+    log.info("Applied %d migration(s); schema version %d", len(done), MIGRATIONS[-1].version)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,23 @@
 from datetime import date, datetime
-from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, Date, Text, func, ForeignKey, Boolean
+from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, validates
+from sqlalchemy import String, Integer, SmallInteger, Date, Text, func, ForeignKey, Boolean, Index, DDL, event
 
 class Base(DeclarativeBase):
     pass
 
+# pg_trgm потрібен для GIN-індексів пошуку контактів (лише PostgreSQL)
+event.listen(
+    Base.metadata, "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
+
+def _trgm_index(column: str) -> Index:
+    """GIN-індекс з gin_trgm_ops: обслуговує ILIKE '%term%' та оператор схожості %."""
+    return Index(
+        f"ix_contacts_{column}_trgm", column,
+        postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"},
+    ).ddl_if(dialect="postgresql")
+
 class AppMeta(Base):
     __tablename__ = "app_meta"
     key: Mapped[str] = mapped_column(String(100), primary_key=True)
@@ -18,21 +31,72 @@ class User(Base):
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     is_verified: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
     avatar_url: Mapped[str | None] = mapped_column(String(500), nullable=True)
+    avatar_status: Mapped[str | None] = mapped_column(String(20), nullable=True)  # pending | ready | failed
     role: Mapped[str] = mapped_column(String(20), default="user", index=True)
     created_at: Mapped[datetime] = mapped_column(default=func.now())
     updated_at: Mapped[datetime] = mapped_column(default=func.now(), onupdate=func.now())
     contacts: Mapped[list['Contact']] = relationship(back_populates="owner", cascade="all, delete-orphan")
 
+class RefreshTokenFamily(Base):
+    """Ланцюжок refresh-токенів від одного логіну; дійсний лише останній ``current_jti``.
+
+    Використовується, коли Redis не налаштований (див. ``token_store.py``).
+    Відкликана родина просто видаляється.
+    """
+    __tablename__ = "refresh_token_families"
+    id: Mapped[str] = mapped_column(String(36), primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
+    current_jti: Mapped[str] = mapped_column(String(36))
+    expires_at: Mapped[datetime] = mapped_column()
+
+def birthday_md(value: date | None) -> int | None:
+    """День року у форматі MMDD (29 лютого → 229) для індексованого пошуку днів народження."""
+    return value.month * 100 + value.day if value else None
+
+def _birthday_md_default(context) -> int | None:
+    # Для Core insert().values(...) без явного birthday_md
+    return birthday_md(context.get_current_parameters().get("birthday"))
+
 class Contact(Base):
     __tablename__ = "contacts"
+    __table_args__ = (
+        # keyset-пагінація GET /contacts (order=name / order=id)
+        Index("ix_contacts_owner_name_id", "owner_id", "last_name", "first_name", "id"),
+        Index("ix_contacts_owner_id_id", "owner_id", "id"),
+        # вікно днів народження: діапазон по birthday_md в межах власника
+        Index("ix_contacts_owner_birthday_md", "owner_id", "birthday_md"),
+        # інкрементальна синхронізація GET /contacts/changes
+        Index("ix_contacts_owner_updated_id", "owner_id", "updated_at", "id"),
+        # пошук GET /contacts?q=...
+        _trgm_index("first_name"),
+        _trgm_index("last_name"),
+        _trgm_index("email"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     first_name: Mapped[str] = mapped_column(String(100), index=True)
     last_name: Mapped[str] = mapped_column(String(100), index=True)
     email: Mapped[str] = mapped_column(String(255), index=True)
     phone: Mapped[str] = mapped_column(String(50), index=True)
     birthday: Mapped[date] = mapped_column(Date, index=True)
+    birthday_md: Mapped[int | None] = mapped_column(SmallInteger, nullable=True, default=_birthday_md_default)
     extra: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(default=func.now())
     updated_at: Mapped[datetime] = mapped_column(default=func.now(), onupdate=func.now())
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), index=True)
     owner: Mapped['User'] = relationship(back_populates="contacts")
+
+    @validates("birthday")
+    def _sync_birthday_md(self, key, value):
+        self.birthday_md = birthday_md(value)
+        return value
+
+class ContactTombstone(Base):
+    """Слід видаленого контакту: GET /contacts/changes повідомляє клієнтам про видалення.
+
+    Зберігається ``SYNC_TOMBSTONE_RETENTION_DAYS``; старіші сліди прибираються при видаленнях власника.
+    """
+    __tablename__ = "contact_tombstones"
+    __table_args__ = (Index("ix_contact_tombstones_owner_deleted_id", "owner_id", "deleted_at", "contact_id"),)
+    contact_id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    owner_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    deleted_at: Mapped[datetime] = mapped_column(default=func.now())
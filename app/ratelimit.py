@@ -0,0 +1,139 @@
+"""Rate limiting за алгоритмом GCRA (generic cell rate algorithm).
+
+Для кожного ключа зберігається лише одне число — TAT (theoretical arrival time),
+тому перевірка коштує O(1) незалежно від вікна. Основна реалізація — атомарний
+Lua-скрипт у Redis (спільний ліміт для всіх воркерів); якщо Redis не налаштований
+або недоступний — in-memory варіант з обмеженою LRU-таблицею ключів.
+"""
+from __future__ import annotations
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, NamedTuple, Optional
+from .cache import get_redis
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+
+class RateLimitResult(NamedTuple):
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # секунд до наступного дозволеного запиту (0, якщо дозволено)
+    reset: float        # секунд до повного відновлення ліміту
+
+    def headers(self) -> dict[str, str]:
+        h = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(self.remaining),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+        }
+        if not self.allowed:
+            h["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+        return h
+
+
+def _gcra(tat: Optional[float], now: float, limit: int, period: float) -> tuple[RateLimitResult, Optional[float]]:
+    """Один крок GCRA. Повертає результат і новий TAT (None, якщо запит відхилено)."""
+    interval = period / limit
+    tat = max(tat or now, now)
+    new_tat = tat + interval
+    allow_at = new_tat - period
+    if now < allow_at:
+        return RateLimitResult(False, limit, 0, allow_at - now, tat - now), None
+    remaining = int((period - (new_tat - now)) // interval)
+    return RateLimitResult(True, limit, remaining, 0.0, new_tat - now), new_tat
+
+
+class MemoryRateLimiter:
+    """In-process GCRA; кількість ключів обмежена ``maxsize`` (LRU-витіснення)."""
+
+    def __init__(self, maxsize: int = 10_000, clock: Callable[[], float] = time.monotonic):
+        self.maxsize = maxsize
+        self.clock = clock
+        self._tats: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, limit: int, period: float) -> RateLimitResult:
+        with self._lock:
+            now = self.clock()
+            result, new_tat = _gcra(self._tats.get(key), now, limit, period)
+            if new_tat is not None:
+                self._tats[key] = new_tat
+            if key in self._tats:
+                self._tats.move_to_end(key)
+            while len(self._tats) > self.maxsize:
+                self._tats.popitem(last=False)
+            return result
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tats.clear()
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+# KEYS[1] — ключ; ARGV[1] — період (мс), ARGV[2] — ліміт. Час береться з Redis (TIME),
+# щоб усі воркери мали спільний годинник. Повертає {allowed, remaining, retry_after_ms, reset_ms}.
+_GCRA_LUA = """
+local period = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local interval = period / limit
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local new_tat = tat + interval
+local allow_at = new_tat - period
+if now < allow_at then
+  return {0, 0, math.ceil(allow_at - now), math.ceil(tat - now)}
+end
+redis.call('SET', KEYS[1], string.format('%.3f', new_tat), 'PX', math.ceil(new_tat - now))
+return {1, math.floor((period - (new_tat - now)) / interval), 0, math.ceil(new_tat - now)}
+"""
+
+
+class RedisRateLimiter:
+    """GCRA в Redis: одна атомарна операція (EVALSHA) на запит."""
+
+    def __init__(self, client, prefix: str = "rl"):
+        self.client = client
+        self.prefix = prefix
+        self._script = client.register_script(_GCRA_LUA)
+
+    def hit(self, key: str, limit: int, period: float) -> RateLimitResult:
+        allowed, remaining, retry_ms, reset_ms = self._script(
+            keys=[f"{self.prefix}:{key}"], args=[int(period * 1000), limit],
+        )
+        return RateLimitResult(bool(allowed), limit, int(remaining), retry_ms / 1000, reset_ms / 1000)
+
+
+memory_limiter = MemoryRateLimiter(maxsize=settings.RATE_LIMIT_MEMORY_MAX_KEYS)
+_redis_limiter: Optional[RedisRateLimiter] = None
+
+
+def get_limiter():
+    """Redis-лімітер, якщо Redis налаштований, інакше in-memory."""
+    global _redis_limiter
+    r = get_redis()
+    if r is None:
+        return memory_limiter
+    if _redis_limiter is None or _redis_limiter.client is not r:
+        _redis_limiter = RedisRateLimiter(r)
+    return _redis_limiter
+
+
+def hit(key: str, limit: int, period: float) -> RateLimitResult:
+    """Реєструє запит для ``key``; при збої Redis деградує до in-memory ліміту."""
+    limiter = get_limiter()
+    try:
+        return limiter.hit(key, limit, period)
+    except Exception as e:
+        if limiter is memory_limiter:
+            raise
+        log.warning("Redis rate limiter failed, falling back to memory: %s", e)
+        return memory_limiter.hit(key, limit, period)
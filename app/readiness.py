@@ -0,0 +1,88 @@
+"""Прогрів інстансу перед трафіком і стан для ``GET /ready``.
+
+``GET /`` — liveness: процес живий і відповідає одразу після старту.
+``GET /ready`` — readiness: ``503``, доки не прогріті пул БД, Redis, JWT і пул bcrypt;
+балансувальник/Kubernetes не шле запити на холодний под.
+Тривалість фаз старту — ``startup_seconds{phase=...}`` у ``/metrics``.
+"""
+from __future__ import annotations
+import logging
+import time
+from typing import Callable, Dict, List, Tuple
+from starlette.concurrency import run_in_threadpool
+from . import cache, database, metrics, security
+from .settings import settings
+
+log = logging.getLogger("contacts_api.startup")
+
+timings: Dict[str, float] = {}
+checks: Dict[str, str] = {}
+state = {"ready": False, "warming": False}
+
+metrics.register(metrics.Gauge(
+    "startup_seconds", "Cold start phases: import, startup, warm_*, total",
+    lambda: {(k,): v for k, v in timings.items()}, ("phase",),
+))
+
+
+def _warm_db() -> None:
+    database.warm_pool(database.engine, settings.DB_POOL_WARM)
+    for eng in database.replica_engines:
+        database.warm_pool(eng, 1)
+
+
+def _warm_redis() -> None:
+    r = cache.get_redis()
+    if r is not None:
+        r.ping()
+
+
+def _warm_jwt() -> None:
+    # імпорт python-jose/PyJWT і перший підпис/перевірка
+    security.decode_token(security.create_access_token(subject=0))
+
+
+# (назва, функція, обов'язкова для готовності); без Redis і bcrypt-пулу API деградує, але працює
+STEPS: List[Tuple[str, Callable[[], None], bool]] = [
+    ("db", _warm_db, True),
+    ("redis", _warm_redis, False),
+    ("jwt", _warm_jwt, True),
+    ("hashing", security.warm_hashing_pool, False),
+]
+
+
+async def warm_up() -> bool:
+    """Виконує ще не успішні кроки прогріву (у threadpool); повертає готовність."""
+    state["warming"] = True
+    t0 = time.perf_counter()
+    try:
+        for name, fn, _ in STEPS:
+            if checks.get(name) == "ok":
+                continue
+            t = time.perf_counter()
+            try:
+                await run_in_threadpool(fn)
+                checks[name] = "ok"
+            except Exception as e:
+                checks[name] = f"error: {e.__class__.__name__}"
+                log.warning("Warm-up step %s failed: %s", name, e)
+            timings[f"warm_{name}"] = time.perf_counter() - t
+    finally:
+        state["warming"] = False
+    state["ready"] = all(checks.get(name) == "ok" for name, _, required in STEPS if required)
+    if state["ready"] and "total" not in timings:
+        timings["warmup"] = time.perf_counter() - t0
+        timings["total"] = timings.get("import", 0.0) + timings.get("startup", 0.0) + timings["warmup"]
+        if timings["total"] > settings.STARTUP_BUDGET_SEC:
+            log.warning("Cold start took %.2fs (budget %.2fs): %s; profile imports with "
+                        "`python -m benchmarks.bench_startup`", timings["total"], settings.STARTUP_BUDGET_SEC,
+                        {k: round(v, 3) for k, v in timings.items()})
+    return state["ready"]
+
+
+def reset() -> None:
+    """Новий цикл старту (тести, повторний startup після fork)."""
+    timings.pop("total", None)
+    timings.pop("warmup", None)
+    checks.clear()
+    state["ready"] = False
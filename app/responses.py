@@ -0,0 +1,34 @@
+"""Швидка JSON-серіалізація відповідей.
+
+:func:`dumps` — orjson, якщо встановлений, інакше серіалізатор pydantic-core
+(теж без stdlib ``json``). :class:`FastJSONResponse` — ``default_response_class``
+застосунку. Списки контактів оминають Pydantic зовсім: ``crud`` повертає рядки
+проєкції (:func:`app.crud.contact_columns`), які серіалізуються напряму.
+"""
+from __future__ import annotations
+from typing import Any, Iterable, Optional, Sequence
+from fastapi.responses import JSONResponse
+from pydantic_core import to_json
+
+try:  # опційно: без orjson — pydantic-core
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return to_json(content)
+
+
+def dump_rows(rows: Iterable[Any], fields: Optional[Sequence[str]] = None) -> bytes:
+    """JSON-масив з рядків SQLAlchemy (``Row``) — ключі як у назвах колонок (або лише ``fields``)."""
+    if fields is None:
+        return dumps([row._asdict() for row in rows])
+    return dumps([{f: row._mapping[f] for f in fields} for row in rows])
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
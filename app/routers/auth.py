@@ -3,19 +3,17 @@ from fastapi import (
     Depends, 
     HTTPException, 
     status, 
-    BackgroundTasks, 
     Request,
     Response
 )
 from sqlalchemy.orm import Session
 from fastapi.security import OAuth2PasswordRequestForm
-from .. import schemas, crud, models
+from .. import schemas, crud_async, mailer, token_store
 from ..database import get_db
-from ..security import create_access_token, create_email_token, decode_token, create_refresh_token, create_password_reset_token
+from ..deps import check_rate
+from ..security import create_access_token, create_email_token, decode_token, create_password_reset_token
 from ..settings import settings
-import smtplib, ssl
-from email.message import EmailMessage
-from email.utils import formataddr
+from fastapi.concurrency import run_in_threadpool
 import logging
 import uuid
 
@@ -29,88 +27,50 @@ def _build_verify_url(request: Request, token: str) -> str:
     return f"{scheme}://{host}/auth/verify-email?token={token}"
 
 def send_verify_email(email: str, token: str, request: Request) -> None:
-    """Надіслати лист верифікації. Підтримка STARTTLS(587) та SSL(465). 
-    Якщо SMTP не налаштований/помилка — лог і м’яке продовження."""
+    """Поставити лист верифікації в чергу (відправляє воркер, див. ``app/mailer.py``).
+    Якщо SMTP не налаштовано — воркер пише лінк у лог."""
     verify_url = _build_verify_url(request, token)
-
-    smtp_host = settings.SMTP_HOST
-    smtp_user = settings.SMTP_USER
-    smtp_pass = settings.SMTP_PASSWORD
-    smtp_port = int(settings.SMTP_PORT or 587)
-    # Красивий From: або явно заданий SMTP_FROM, або сам обліковий запис
-    smtp_from = getattr(settings, "SMTP_FROM", None) or smtp_user or "no-reply@example.com"
-
-    # Формуємо лист
-    msg = EmailMessage()
-    msg["Subject"] = "Verify your email"
-    # Якщо SMTP_FROM має вигляд "Name <email>", залишаємо як є; інакше загортаємо красиво
-    if "<" in smtp_from and ">" in smtp_from:
-        msg["From"] = smtp_from
-    else:
-        msg["From"] = formataddr(("", smtp_from))
-    msg["To"] = email
-    msg.set_content(f"Click to verify: {verify_url}")
-
-    # Якщо SMTP не налаштовано — просто лог і вихід
-    if not (smtp_host and smtp_user and smtp_pass):
-        logging.getLogger("uvicorn.error").info("Verify link for %s: %s", email, verify_url)
-        return
-
-    try:
-        context = ssl.create_default_context()
-        if smtp_port == 465:
-            with smtplib.SMTP_SSL(smtp_host, smtp_port, context=context, timeout=15) as server:
-                server.login(smtp_user, smtp_pass)
-                server.send_message(msg)
-        else:
-            with smtplib.SMTP(smtp_host, smtp_port, timeout=15) as server:
-                server.ehlo()
-                server.starttls(context=context)
-                server.ehlo()
-                server.login(smtp_user, smtp_pass)
-                server.send_message(msg)
-        # Успіх — дамо зрозуміти у runtime-логах
-        logging.getLogger("uvicorn.error").info("Verification email sent to %s", email)
-    except smtplib.SMTPAuthenticationError as e:
-        log.warning("SMTP auth failed: %s. Gmail потребує App Password і повний email у SMTP_USER.", e)
-        logging.getLogger("uvicorn.error").info("Verify link for %s: %s", email, verify_url)
-    except Exception as e:
-        log.warning("SMTP send failed, fallback to log: %s", e)
-        logging.getLogger("uvicorn.error").info("Verify link for %s: %s", email, verify_url)
+    mailer.enqueue(email, "Verify your email", f"Click to verify: {verify_url}", kind="verify")
 
 @router.post("/register", response_model=schemas.UserOut, status_code=status.HTTP_201_CREATED)
-def register(payload: schemas.UserCreate, background: BackgroundTasks, request: Request,
+async def register(payload: schemas.UserCreate, request: Request,
              response: Response, db: Session = Depends(get_db)):
     try:
-        user = crud.create_user(db, payload)
+        user = await crud_async.create_user(db, payload)
     except ValueError as e:
         raise HTTPException(status_code=409, detail=str(e))
     token = create_email_token(user.email)
 
     # Якщо SMTP не налаштовано — підкажемо лінк через заголовок + лог
-    if not (settings.SMTP_HOST and settings.SMTP_USER and settings.SMTP_PASSWORD):
+    if not mailer.smtp_configured():
         verify_url = _build_verify_url(request, token)
         logging.getLogger("uvicorn.error").info("Verify link for %s: %s", user.email, verify_url)
         response.headers["X-Verify-Email"] = verify_url
 
-    # Відправка листа — у фоні; якщо впаде — лінк потрапить у лог
-    background.add_task(send_verify_email, user.email, token, request)
+    # Лист — у чергу (LPUSH у Redis), SMTP у запиті не чекаємо
+    await run_in_threadpool(send_verify_email, user.email, token, request)
     return user
 
 
-@router.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_rate_limit(request: Request, response: Response, form_data: OAuth2PasswordRequestForm = Depends()) -> None:
+    """Ліміт спроб логіну на пару IP + email (захист від перебору, спільний для воркерів через Redis)."""
+    ip = request.client.host if request.client else "unknown"
+    await check_rate("login", f"{ip}:{form_data.username.lower()}",
+                     settings.RATE_LIMIT_LOGIN_CALLS, settings.RATE_LIMIT_LOGIN_WINDOW_SEC, response)
+
+@router.post("/login", response_model=schemas.Token, dependencies=[Depends(login_rate_limit)])
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
     """Логін видає пару токенів: access і refresh."""
-    user = crud.authenticate_user(db, email=form_data.username, password=form_data.password)
+    user = await crud_async.authenticate_user(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     access = create_access_token(subject=user.id, scope="access")
-    refresh = create_refresh_token(subject=user.id)
+    refresh = await token_store.issue(db, user.id)
     # Повертаємо обидва токени; фронтенд зберігатиме refresh окремо
     return {"access_token": access, "token_type": "bearer", "refresh_token": refresh}
 
 @router.get("/verify-email")
-def verify_email(token: str, db: Session = Depends(get_db)):
+async def verify_email(token: str, db: Session = Depends(get_db)):
     try:
         payload = decode_token(token)
     except Exception:
@@ -118,36 +78,51 @@ def verify_email(token: str, db: Session = Depends(get_db)):
     if payload.get("scope") != "email_verification":
         raise HTTPException(status_code=400, detail="Invalid token scope")
     email = payload.get("sub")
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await crud_async.get_user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     if user.is_verified:
         return {"detail": "Already verified"}
-    user.is_verified = True
-    db.commit()
+    await crud_async.set_verified(db, user)
     return {"detail": "Email verified"}
 
 
 @router.post("/refresh", response_model=schemas.Token)
-def refresh_token(body: schemas.RefreshRequest):
+async def refresh_token(body: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """Ротація: старий refresh-токен стає недійсним, повертається нова пара токенів."""
+    try:
+        payload = decode_token(body.refresh_token)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid refresh token")
+    if payload.get("scope") != "refresh":
+        raise HTTPException(status_code=401, detail="Invalid token scope")
+    try:
+        refresh = await token_store.rotate(db, payload)
+    except token_store.RefreshTokenError as e:
+        raise HTTPException(status_code=401, detail=str(e))
+    access = create_access_token(subject=int(payload["sub"]), scope="access")
+    return {"access_token": access, "token_type": "bearer", "refresh_token": refresh}
+
+@router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
+async def logout(body: schemas.RefreshRequest, db: Session = Depends(get_db)):
+    """Відкликає refresh-токен (і всю його родину). Access-токен доживає до свого exp."""
     try:
         payload = decode_token(body.refresh_token)
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid refresh token")
     if payload.get("scope") != "refresh":
         raise HTTPException(status_code=401, detail="Invalid token scope")
-    user_id = int(payload["sub"])
-    access = create_access_token(subject=user_id, scope="access")
-    return {"access_token": access, "token_type": "bearer"}
+    await token_store.revoke(db, payload)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
 
 @router.post("/forgot-password")
-def forgot_password(request: Request, background: BackgroundTasks, db: Session = Depends(get_db)):
-    """Надсилає лінк для скидання пароля (якщо SMTP не налаштовано — пише в логи і повертає заголовок)."""
+async def forgot_password(request: Request, db: Session = Depends(get_db)):
+    """Ставить у чергу лист з лінком для скидання пароля (лінк також у логах і у відповіді)."""
     data = request.query_params or {}
     email = data.get("email")
     if not email:
         raise HTTPException(status_code=400, detail="email is required as query parameter")
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await crud_async.get_user_by_email(db, email)
     if not user:
         # не розкриваємо, що користувач відсутній
         return {"detail": "If email exists, reset link will be sent"}
@@ -155,10 +130,11 @@ def forgot_password(request: Request, background: BackgroundTasks, db: Session =
     host = request.headers.get("host", "localhost:8000")
     link = f"http://{host}/auth/reset-password?token={token}"
     logging.getLogger("uvicorn.error").info("Password reset link for %s: %s", email, link)
+    await run_in_threadpool(mailer.enqueue, email, "Reset your password", f"Reset your password: {link}", "reset")
     return {"detail": "Reset link generated", "reset_link": link}
 
 @router.post("/reset-password")
-def reset_password(token: str, new_password: str, db: Session = Depends(get_db)):
+async def reset_password(token: str, new_password: str, db: Session = Depends(get_db)):
     """Скидання пароля за токеном."""
     try:
         payload = decode_token(token)
@@ -167,9 +143,9 @@ def reset_password(token: str, new_password: str, db: Session = Depends(get_db))
     if payload.get("scope") != "password_reset":
         raise HTTPException(status_code=400, detail="Invalid token scope")
     email = payload.get("sub")
-    user = db.query(models.User).filter(models.User.email == email).first()
+    user = await crud_async.get_user_by_email(db, email)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    crud.set_password(db, user, new_password)
+    await crud_async.set_password(db, user, new_password)
     return {"detail": "Password updated"}
 
@@ -1,50 +1,222 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import hashlib
+from datetime import date
+from typing import Any, Awaitable, Callable, Dict, List, Literal, Optional, Tuple
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from ..database import get_db
-from .. import schemas, crud
-from ..deps import require_verified
-from .. import models
+from .. import cache, schemas, crud_async, contacts_io, responses
+from ..settings import settings
+from ..deps import Principal, require_verified
 
 router = APIRouter(prefix="/contacts", tags=["contacts"])
 
 @router.post("", response_model=schemas.ContactOut, status_code=status.HTTP_201_CREATED)
-def create_contact(payload: schemas.ContactCreate, db: Session = Depends(get_db), user: models.User = Depends(require_verified)):
-    return crud.create_contact(db, owner_id=user.id, data=payload)
+async def create_contact(payload: schemas.ContactCreate, db: Session = Depends(get_db), user: Principal = Depends(require_verified)):
+    return await crud_async.create_contact(db, owner_id=user.id, data=payload)
 
-@router.get("", response_model=List[schemas.ContactOut])
-def list_contacts(
+_FIELDS_DESCRIPTION = "Поля через кому, напр. first_name,phone (id — завжди)"
+
+def _fields(raw: Optional[str], default: tuple) -> tuple:
+    try:
+        return schemas.parse_contact_fields(raw, default)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in header.split(",")}
+    return etag in tags or "*" in tags
+
+def _json_list(request: Request, body: bytes, headers: Dict[str, str]) -> Response:
+    if _not_modified(request, headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _cached_list(request: Request, owner_id: int, scope: str, params: Dict[str, Any], fields: tuple,
+                       compute: Callable[[], Awaitable[Tuple[list, Dict[str, str]]]]) -> Response:
+    """Відповідь зі списком контактів через кеш Redis.
+
+    Попадання віддає збережений JSON без ORM і Pydantic. Версію контактів власника
+    читаємо до запиту в БД: якщо її підняв паралельний запис, запис у кеш уже застарілий.
+    """
+    entry, ver = await run_in_threadpool(cache.lookup_response, owner_id, scope, params)
+    if entry is not None:
+        return _json_list(request, entry["body"].encode(), entry["headers"])
+    items, headers = await compute()
+    body = responses.dump_rows(items, fields)
+    headers = {**headers, "ETag": _etag(body), "Cache-Control": "private, no-cache"}
+    await run_in_threadpool(cache.cache_response, owner_id, scope, params, ver, body, headers)
+    return _json_list(request, body, headers)
+
+@router.get("", response_model=List[schemas.ContactSlim])
+async def list_contacts(
+    request: Request,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     first_name: Optional[str] = Query(None),
     last_name: Optional[str] = Query(None),
     email: Optional[str] = Query(None),
+    q: Optional[str] = Query(None, min_length=1, max_length=100, description="Пошук по імені, прізвищу та email з ранжуванням"),
+    mode: Literal["offset", "cursor"] = Query("offset", description="cursor — keyset-пагінація, наступна сторінка в X-Next-Cursor"),
+    cursor: Optional[str] = Query(None, description="Непрозорий курсор з X-Next-Cursor (вмикає mode=cursor)"),
+    order: Literal["name", "id"] = Query("name", description="Ключ сортування в режимі cursor"),
+    with_total: bool = Query(False, description="Повернути загальну кількість у X-Total-Count"),
+    fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION + "; за замовчуванням усі, крім extra"),
+    db: Session = Depends(get_db),
+    user: Principal = Depends(require_verified),
+):
+    cols = _fields(fields, schemas.CONTACT_LIST_FIELDS)
+    filters = dict(first_name=first_name, last_name=last_name, email=email)
+    if mode == "offset" and cursor is None:
+        order = None  # не впливає на offset-режим — не дробимо кеш
+    params = dict(filters, skip=skip, limit=limit, q=q, mode=mode, cursor=cursor, order=order, with_total=with_total,
+                  fields=",".join(cols))
+
+    async def compute() -> Tuple[list, Dict[str, str]]:
+        headers: Dict[str, str] = {}
+        if with_total:
+            headers["X-Total-Count"] = str(await crud_async.count_contacts(db, owner_id=user.id, q=q, **filters))
+        if q:
+            # результати пошуку впорядковані за релевантністю, тому лише offset-пагінація
+            return await crud_async.search_contacts(db, owner_id=user.id, q=q, skip=skip, limit=limit, fields=cols, **filters), headers
+        if mode == "offset" and cursor is None:
+            return await crud_async.list_contacts(db, owner_id=user.id, skip=skip, limit=limit, fields=cols, **filters), headers
+        try:
+            items, next_cursor = await crud_async.list_contacts_page(db, owner_id=user.id, cursor=cursor, limit=limit, order=order,
+                                                                     fields=cols, **filters)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+        return items, headers
+
+    return await _cached_list(request, user.id, "list", params, cols, compute)
+
+@router.post("/import", response_model=schemas.ImportReport)
+async def import_contacts(
+    file: UploadFile = File(..., description="CSV із заголовком або NDJSON (один JSON-об'єкт на рядок)"),
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Якщо не задано — з Content-Type / розширення"),
+    db: Session = Depends(get_db),
+    user: Principal = Depends(require_verified),
+):
+    """Масовий імпорт: потокове читання, валідація і вставка пакетами по IMPORT_BATCH_SIZE."""
+    fmt = contacts_io.detect_format(format, file.content_type, file.filename)
+    if fmt is None:
+        raise HTTPException(status_code=415, detail="Unsupported format: use CSV or NDJSON")
+    records = contacts_io.iter_records(file.file, fmt)
+    inserted, failed, errors = 0, 0, []
+    while batch := await run_in_threadpool(contacts_io.take, records, settings.IMPORT_BATCH_SIZE):
+        valid, batch_errors = await run_in_threadpool(contacts_io.validate_batch, batch)
+        inserted += await crud_async.bulk_create_contacts(db, owner_id=user.id, rows=valid)
+        failed += len(batch_errors)
+        errors.extend(batch_errors[: max(0, settings.IMPORT_MAX_ERRORS - len(errors))])
+    return {"inserted": inserted, "failed": failed, "errors": errors, "errors_truncated": failed > len(errors)}
+
+@router.get("/export")
+async def export_contacts(
+    format: Literal["csv", "ndjson"] = Query("ndjson"),
     db: Session = Depends(get_db),
-    user: models.User = Depends(require_verified),
+    user: Principal = Depends(require_verified),
 ):
-    return crud.list_contacts(db, owner_id=user.id, skip=skip, limit=limit, first_name=first_name, last_name=last_name, email=email)
+    """Потоковий експорт усіх контактів власника з серверного курсора."""
+    return StreamingResponse(
+        contacts_io.export_stream(db, user.id, format, settings.EXPORT_BATCH_SIZE),
+        media_type=contacts_io.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="contacts.{format}"'},
+    )
+
+def _check_batch_size(n: int) -> None:
+    if n > settings.CONTACTS_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"Too many items: max {settings.CONTACTS_BATCH_MAX_ITEMS} per request")
+
+@router.patch("/batch", response_model=schemas.ContactBatchUpdateResult)
+async def batch_update_contacts(payload: schemas.ContactBatchUpdate, db: Session = Depends(get_db),
+                                user: Principal = Depends(require_verified)):
+    """Часткове оновлення багатьох контактів в одній транзакції; відсутні/чужі id — у ``not_found``."""
+    _check_batch_size(len(payload.items))
+    items = [(i.id, i.model_dump(exclude={"id"}, exclude_none=True)) for i in payload.items]
+    updated, not_found = await crud_async.batch_update_contacts(
+        db, owner_id=user.id, items=items, chunk_size=settings.CONTACTS_BATCH_CHUNK_SIZE)
+    return {"updated": updated, "not_found": not_found}
+
+@router.delete("/batch", response_model=schemas.ContactBatchDeleteResult)
+async def batch_delete_contacts(payload: schemas.ContactBatchDelete, db: Session = Depends(get_db),
+                                user: Principal = Depends(require_verified)):
+    """Видалення багатьох контактів в одній транзакції; відсутні/чужі id — у ``not_found``."""
+    _check_batch_size(len(payload.ids))
+    deleted, not_found = await crud_async.batch_delete_contacts(
+        db, owner_id=user.id, ids=payload.ids, chunk_size=settings.CONTACTS_BATCH_CHUNK_SIZE)
+    return {"deleted": deleted, "not_found": not_found}
+
+@router.get("/changes", response_model=schemas.ContactChanges)
+async def contact_changes(
+    since: Optional[str] = Query(None, description="Водяний знак з попередньої відповіді (next); без нього — повна вибірка"),
+    limit: int = Query(500, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    user: Principal = Depends(require_verified),
+):
+    """Інкрементальна синхронізація: створені/змінені контакти і id видалених після ``since``."""
+    try:
+        changed, deleted, token, has_more = await crud_async.contact_changes(db, owner_id=user.id, since=since, limit=limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid sync token")
+    except LookupError:
+        raise HTTPException(status_code=410, detail="Sync token expired: resync without since")
+    return {"changed": changed, "deleted": deleted, "next": token, "has_more": has_more}
 
 @router.get("/{contact_id}", response_model=schemas.ContactOut)
-def get_contact(contact_id: int, db: Session = Depends(get_db), user: models.User = Depends(require_verified)):
-    obj = crud.get_contact(db, owner_id=user.id, contact_id=contact_id)
+async def get_contact(
+    contact_id: int,
+    fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION + "; за замовчуванням усі"),
+    db: Session = Depends(get_db),
+    user: Principal = Depends(require_verified),
+):
+    cols = _fields(fields, None) if fields else None
+    obj = await crud_async.get_contact(db, owner_id=user.id, contact_id=contact_id, fields=cols)
     if not obj:
         raise HTTPException(status_code=404, detail="Contact not found")
+    if cols:
+        # неповний контакт не пройде ContactOut — серіалізуємо рядок напряму
+        return Response(content=responses.dumps(obj._asdict()), media_type="application/json")
     return obj
 
 @router.put("/{contact_id}", response_model=schemas.ContactOut)
-def update_contact(contact_id: int, payload: schemas.ContactUpdate, db: Session = Depends(get_db), user: models.User = Depends(require_verified)):
-    obj = crud.update_contact(db, owner_id=user.id, contact_id=contact_id, data=payload)
+async def update_contact(contact_id: int, payload: schemas.ContactUpdate, db: Session = Depends(get_db), user: Principal = Depends(require_verified)):
+    obj = await crud_async.update_contact(db, owner_id=user.id, contact_id=contact_id, data=payload)
     if not obj:
         raise HTTPException(status_code=404, detail="Contact not found")
     return obj
 
 @router.delete("/{contact_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_contact(contact_id: int, db: Session = Depends(get_db), user: models.User = Depends(require_verified)):
-    ok = crud.delete_contact(db, owner_id=user.id, contact_id=contact_id)
+async def delete_contact(contact_id: int, db: Session = Depends(get_db), user: Principal = Depends(require_verified)):
+    ok = await crud_async.delete_contact(db, owner_id=user.id, contact_id=contact_id)
     if not ok:
         raise HTTPException(status_code=404, detail="Contact not found")
     return None
 
-@router.get("/birthdays/upcoming", response_model=List[schemas.ContactOut])
-def birthdays_upcoming(days: int = Query(7, ge=1, le=365), db: Session = Depends(get_db), user: models.User = Depends(require_verified)):
-    return crud.upcoming_birthdays(db, owner_id=user.id, days=days)
+@router.get("/birthdays/upcoming", response_model=List[schemas.ContactSlim])
+async def birthdays_upcoming(
+    request: Request,
+    days: int = Query(7, ge=1, le=365),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = Query(None, description=_FIELDS_DESCRIPTION + "; за замовчуванням усі, крім extra"),
+    db: Session = Depends(get_db),
+    user: Principal = Depends(require_verified),
+):
+    cols = _fields(fields, schemas.CONTACT_LIST_FIELDS)
+    today = date.today()
+    params = dict(days=days, skip=skip, limit=limit, today=today.isoformat(), fields=",".join(cols))  # вікно залежить від дати
+
+    async def compute() -> Tuple[list, Dict[str, str]]:
+        return await crud_async.upcoming_birthdays(db, owner_id=user.id, days=days, skip=skip, limit=limit, today=today,
+                                                   fields=cols), {}
+
+    return await _cached_list(request, user.id, "birthdays", params, cols, compute)
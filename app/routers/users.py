@@ -1,80 +1,51 @@
-import os
 from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
 from sqlalchemy.orm import Session
-import cloudinary, cloudinary.uploader
-from .. import models, schemas
-from ..deps import get_current_user, rate_limit_me, require_admin
-from ..cache import invalidate_user
-from .. import crud
+from .. import avatars, cache, schemas
+from ..deps import Principal, get_current_user, rate_limit_me, require_admin
+from .. import crud_async
 from ..database import get_db
 from ..settings import settings
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-def _ensure_cloudinary():
-    """Перевіряє конфіг Cloudinary щоразу перед аплоудом (коментарі українською)."""
-    # 1) Пробуємо URL
-    cloudinary.config(cloudinary_url=settings.CLOUDINARY_URL, secure=True)
-    cfg = cloudinary.config()
-    # 2) Якщо по URL не налаштовано — пробуємо окремі змінні
-    if not (cfg.api_key and cfg.api_secret and cfg.cloud_name):
-        cloudinary.config(
-            cloud_name=settings.CLOUDINARY_CLOUD_NAME,
-            api_key=settings.CLOUDINARY_API_KEY,
-            api_secret=settings.CLOUDINARY_API_SECRET,
-            secure=True,
-        )
-        cfg = cloudinary.config()
-    if not (cfg.api_key and cfg.api_secret and cfg.cloud_name):
-        raise HTTPException(
-            status_code=503,
-            detail="Cloudinary misconfigured: check CLOUDINARY_URL or CLOUDINARY_* vars",
-        )
-    return cfg
-
 @router.get("/me", response_model=schemas.UserOut)
-def me(current_user: models.User = Depends(get_current_user)):
-    # Ліміт на 5 запитів на хвилину
-    rate_limit_me(current_user.id)
+async def me(current_user: Principal = Depends(get_current_user), _: None = Depends(rate_limit_me)):
+    # Ліміт RATE_LIMIT_ME_CALLS запитів за RATE_LIMIT_ME_WINDOW_SEC (GCRA, Redis або in-memory)
     return current_user
 
-@router.post("/me/avatar", status_code=status.HTTP_201_CREATED, response_model=schemas.UserOut)
-def upload_avatar(
+@router.post("/me/avatar", status_code=status.HTTP_202_ACCEPTED, response_model=schemas.UserOut)
+async def upload_avatar(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user),
+    current_user: Principal = Depends(get_current_user),
 ):
-    _ensure_cloudinary()
-    try:
-        result = cloudinary.uploader.upload(
-            file.file,
-            folder="contacts_api/avatars",
-            public_id=str(current_user.id),
-            overwrite=True,
-            resource_type="image",
-        )
-    except Exception as e:
-        # Узкий 502, чтобы отличать сетевые/SDK проблемы Cloudinary
-        raise HTTPException(status_code=502, detail=f"Cloudinary upload failed: {e.__class__.__name__}") from e
+    """Приймає аватар і одразу повертає ``avatar_status="pending"``.
 
-    url = result.get("secure_url")
-    if not url:
-        raise HTTPException(status_code=500, detail="Upload failed")
-    current_user.avatar_url = url
-    db.commit()
-    db.refresh(current_user)
-    invalidate_user(current_user.id)
-    return current_user
+    Мініатюра і завантаження у сховище — у фоні (``app/avatars.py``); результат
+    видно в ``GET /users/me``: ``ready`` з новим ``avatar_url`` або ``failed``.
+    """
+    try:
+        storage = avatars.get_storage()
+        data, mime = await avatars.read_image(file, settings.AVATAR_MAX_BYTES)
+    except avatars.AvatarError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail) from e
+    # Principal read-only — змінюємо ORM-користувача
+    user = await crud_async.set_avatar_status(db, current_user.id, "pending")
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    avatars.submit(current_user.id, data, mime, storage)
+    return user
 
 @router.post("/admin/default-avatar", status_code=status.HTTP_201_CREATED)
-def set_default_avatar(url: str, db: Session = Depends(get_db), admin: models.User = Depends(require_admin)):
+async def set_default_avatar(url: str, db: Session = Depends(get_db), admin: Principal = Depends(require_admin)):
     """Адмін встановлює глобальний аватар за замовчуванням (використовується, якщо у користувача немає avatar_url)."""
-    crud.meta_set(db, "default_avatar_url", url)
+    await crud_async.meta_set(db, "default_avatar_url", url)
     return {"detail": "Default avatar updated", "url": url}
 
 @router.get("/default-avatar")
-def get_default_avatar(db: Session = Depends(get_db)):
+async def get_default_avatar(db: Session = Depends(get_db)):
     """Повертає поточний глобальний аватар за замовчуванням."""
     from ..settings import settings as s
-    url = crud.meta_get(db, "default_avatar_url") or s.DEFAULT_AVATAR_URL
+    # майже завжди з пам'яті процесу (cache.get_meta), БД — лише при холодному кеші
+    url = await cache.get_meta("default_avatar_url", lambda: crud_async.meta_get(db, "default_avatar_url")) or s.DEFAULT_AVATAR_URL
     return {"url": url}
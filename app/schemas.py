@@ -1,6 +1,6 @@
 from datetime import date, datetime
 from typing import Optional, Annotated, TypeAlias, Literal
-from pydantic import BaseModel, EmailStr, Field, StringConstraints
+from pydantic import BaseModel, EmailStr, Field, StringConstraints, model_validator
 
 # Явные алиасы типов вместо constr(...), а то ругается что не соответствует рекомендациям в Pydantic v2
 PhoneStr: TypeAlias = Annotated[str, StringConstraints(min_length=5, max_length=50)]
@@ -18,6 +18,7 @@ class UserOut(UserBase):
     is_active: bool
     is_verified: bool
     avatar_url: Optional[str] = None
+    avatar_status: Optional[Literal["pending", "ready", "failed"]] = None
     created_at: datetime
     updated_at: datetime
     class Config:
@@ -62,3 +63,71 @@ class ContactOut(ContactBase):
     owner_id: int
     class Config:
         from_attributes = True
+
+# --- Вибір полів (?fields=) ---
+CONTACT_FIELDS = tuple(ContactOut.model_fields)
+# Списки за замовчуванням без extra: необмежені нотатки не роздувають вибірку й відповідь
+CONTACT_LIST_FIELDS = tuple(f for f in CONTACT_FIELDS if f != "extra")
+
+def parse_contact_fields(raw: Optional[str], default: tuple = CONTACT_FIELDS) -> tuple:
+    """``"first_name,phone"`` → поля у порядку ContactOut, ``id`` — завжди; ValueError на невідомих."""
+    if not raw:
+        return default
+    requested = {f.strip() for f in raw.split(",") if f.strip()}
+    unknown = requested - set(CONTACT_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return tuple(f for f in CONTACT_FIELDS if f in requested or f == "id")
+
+class ContactSlim(BaseModel):
+    """Контакт із ``?fields=``: лише запитані поля (решта відсутні у відповіді)."""
+    id: int
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    email: Optional[EmailStr] = None
+    phone: Optional[str] = None
+    birthday: Optional[date] = None
+    extra: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    owner_id: Optional[int] = None
+
+class ImportRowError(BaseModel):
+    row: int
+    errors: list[str]
+
+class ImportReport(BaseModel):
+    inserted: int
+    failed: int
+    errors: list[ImportRowError]
+    errors_truncated: bool = False
+
+# --- Пакетні зміни контактів ---
+class ContactPatch(ContactUpdate):
+    id: int
+
+class ContactBatchUpdate(BaseModel):
+    items: list[ContactPatch] = Field(..., min_length=1)
+
+    @model_validator(mode="after")
+    def _unique_ids(self):
+        if len({i.id for i in self.items}) != len(self.items):
+            raise ValueError("duplicate contact ids in items")
+        return self
+
+class ContactBatchDelete(BaseModel):
+    ids: list[int] = Field(..., min_length=1)
+
+class ContactBatchUpdateResult(BaseModel):
+    updated: list[int]
+    not_found: list[int]
+
+class ContactBatchDeleteResult(BaseModel):
+    deleted: list[int]
+    not_found: list[int]
+
+class ContactChanges(BaseModel):
+    changed: list[ContactOut]
+    deleted: list[int]
+    next: str          # водяний знак для наступного ?since=
+    has_more: bool     # є ще зміни: одразу запитати знову з next
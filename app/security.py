@@ -1,43 +1,270 @@
+import asyncio
+import functools
+import hashlib
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Any
-from jose import jwt
+from typing import Any, Callable
 from passlib.context import CryptContext
+from .local_cache import MISSING, LocalCache
 from .settings import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# min_rounds = default_rounds: хеші зі старою "вартістю" needs_update → перехешування при логіні
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+)
+
+class HashingBusyError(RuntimeError):
+    """Черга пулу хешування переповнена (мапиться на 503)."""
+
+# --- Пул процесів для bcrypt ---
+# bcrypt займає ~200–300 мс CPU, тому виконується в окремих процесах,
+# а кількість задач у черзі обмежена HASH_QUEUE_MAX (backpressure).
+_executor: ProcessPoolExecutor | None = None
+_lock = threading.Lock()
+_in_flight = 0
+_stats: dict[str, float] = {
+    "submitted": 0, "rejected": 0, "completed": 0,
+    "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+    "hash_seconds_total": 0.0, "hash_seconds_max": 0.0,
+}
+
+def _pool_size() -> int:
+    if settings.HASH_POOL_WORKERS is not None:
+        return settings.HASH_POOL_WORKERS
+    return os.cpu_count() or 1
+
+def _timed(fn: Callable[..., Any], submitted_at: float, *args: Any) -> tuple[Any, float, float]:
+    """Виконується у воркері: повертає результат, час очікування в черзі і час хешування."""
+    started = time.time()
+    result = fn(*args)
+    return result, started - submitted_at, time.time() - started
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(plain: str, hashed: str) -> bool:
+    return pwd_context.verify(plain, hashed)
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                # spawn: воркери не успадковують потоки й з'єднання веб-процесу
+                _executor = ProcessPoolExecutor(
+                    max_workers=_pool_size(), mp_context=multiprocessing.get_context("spawn"),
+                )
+    return _executor
+
+def _record(wait: float, spent: float) -> None:
+    with _lock:
+        _stats["completed"] += 1
+        _stats["wait_seconds_total"] += wait
+        _stats["wait_seconds_max"] = max(_stats["wait_seconds_max"], wait)
+        _stats["hash_seconds_total"] += spent
+        _stats["hash_seconds_max"] = max(_stats["hash_seconds_max"], spent)
+
+def _submit(fn: Callable[..., Any], *args: Any) -> Future:
+    """Ставить задачу в пул; при переповненій черзі — HashingBusyError."""
+    global _in_flight
+    with _lock:
+        if _in_flight >= settings.HASH_QUEUE_MAX:
+            _stats["rejected"] += 1
+            raise HashingBusyError("Password hashing queue is full")
+        _in_flight += 1
+        _stats["submitted"] += 1
+    try:
+        fut = _get_executor().submit(_timed, fn, time.time(), *args)
+    except Exception:
+        _release(None)
+        raise
+    fut.add_done_callback(_release)
+    return fut
+
+def _release(fut: Future | None) -> None:
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+    if fut is not None and not fut.cancelled() and fut.exception() is None:
+        _, wait, spent = fut.result()
+        _record(wait, spent)
+
+def _run(fn: Callable[..., Any], *args: Any) -> Any:
+    if _pool_size() <= 0:
+        # HASH_POOL_WORKERS=0 — інлайн-режим (скрипти, налагодження)
+        result, wait, spent = _timed(fn, time.time(), *args)
+        _record(wait, spent)
+        return result
+    return _submit(fn, *args).result()[0]
+
+async def _run_async(fn: Callable[..., Any], *args: Any) -> Any:
+    if _pool_size() <= 0:
+        return await asyncio.to_thread(_run, fn, *args)
+    result, _, _ = await asyncio.wrap_future(_submit(fn, *args))
+    return result
+
+def hashing_stats() -> dict[str, float]:
+    """Знімок метрик пулу: черга, відмови, час очікування і хешування."""
+    with _lock:
+        return dict(_stats, in_flight=_in_flight, workers=_pool_size(), queue_max=settings.HASH_QUEUE_MAX)
+
+def warm_hashing_pool() -> None:
+    """Запускає процеси пулу bcrypt заздалегідь: spawn + імпорт passlib — сотні мс на процес."""
+    workers = _pool_size()
+    if workers <= 0:
+        return
+    executor = _get_executor()
+    for fut in [executor.submit(os.getpid) for _ in range(workers)]:
+        fut.result()
+
+def shutdown_hashing_pool() -> None:
+    global _executor
+    with _lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def _after_fork() -> None:
+    # Пул процесів батька (його потоки керування не пережили fork) — не наш: новий створиться ліниво
+    global _executor, _in_flight, _lock
+    _executor, _in_flight, _lock = None, 0, threading.Lock()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork)
 
 def hash_password(password: str) -> str:
     # Хешуємо пароль (український коментар)
-    return pwd_context.hash(password)
+    return _run(_hash, password)
 
 def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+    return _run(_verify, plain, hashed)
+
+async def hash_password_async(password: str) -> str:
+    """Як :func:`hash_password`, але не блокує event loop."""
+    return await _run_async(_hash, password)
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    """Як :func:`verify_password`, але не блокує event loop."""
+    return await _run_async(_verify, plain, hashed)
+
+def needs_rehash(hashed: str) -> bool:
+    """True, якщо хеш створено зі старими параметрами (наприклад, менше rounds)."""
+    return pwd_context.needs_update(hashed)
+
+# --- JWT ---
+
+# python-jose (~0.1 с на імпорт через cryptography) і PyJWT завантажуються при першому
+# використанні; до трафіку це робить прогрів перед /ready (див. main.py)
+@functools.lru_cache(maxsize=None)
+def _jose():
+    from jose import jwt
+    return jwt
+
+@functools.lru_cache(maxsize=None)
+def _pyjwt():
+    try:
+        import jwt as pyjwt  # type: ignore  # PyJWT: швидший за python-jose (опціонально)
+    except Exception:  # pragma: no cover
+        return None
+    return pyjwt
+
+def _signing_keys() -> dict[str | None, str]:
+    """``kid`` → секрет. ``JWT_KEYS="k2:new,k1:old"``; токени без ``kid`` перевіряються ``SECRET_KEY``."""
+    keys: dict[str | None, str] = {None: settings.SECRET_KEY}
+    for item in (settings.JWT_KEYS or "").split(","):
+        kid, sep, secret = item.strip().partition(":")
+        if sep and kid and secret:
+            keys[kid] = secret
+    return keys
+
+def _encode(payload: dict[str, Any]) -> str:
+    """Підписує активним ключем (``JWT_ACTIVE_KID``) з ``kid`` у заголовку."""
+    kid = settings.JWT_ACTIVE_KID
+    if kid is None:
+        return _jose().encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    secret = _signing_keys().get(kid)
+    if secret is None:
+        raise RuntimeError(f"JWT_ACTIVE_KID {kid!r} is not in JWT_KEYS")
+    return _jose().encode(payload, secret, algorithm=settings.JWT_ALGORITHM, headers={"kid": kid})
+
+def _use_pyjwt() -> bool:
+    backend = settings.JWT_BACKEND
+    if backend not in ("pyjwt", "auto"):
+        return False
+    if backend == "pyjwt" and _pyjwt() is None:
+        raise RuntimeError("JWT_BACKEND=pyjwt requires the PyJWT package")
+    return _pyjwt() is not None
+
+def _verify_token(token: str) -> dict[str, Any]:
+    """Повна перевірка підпису і ``exp`` ключем з ``kid`` заголовка.
+
+    З PyJWT заголовок теж читає PyJWT: python-jose на шляху перевірки не завантажується.
+    """
+    pyjwt = _pyjwt() if _use_pyjwt() else None
+    jwt = pyjwt or _jose()
+    kid = jwt.get_unverified_header(token).get("kid")
+    secret = _signing_keys().get(kid)
+    if secret is None:
+        if pyjwt is not None:
+            raise pyjwt.InvalidTokenError(f"Unknown key id: {kid}")
+        from jose import JWTError
+        raise JWTError(f"Unknown key id: {kid}")
+    return jwt.decode(token, secret, algorithms=[settings.JWT_ALGORITHM])
+
+# Розкодовані claims валідних токенів до їх exp; ключ — дайджест токена
+_token_cache = LocalCache(maxsize=settings.TOKEN_CACHE_MAX_KEYS, ttl=0)
+
+def decode_token(token: str) -> dict[str, Any]:
+    """Перевіряє токен і повертає claims; повторні перевірки того ж токена — з кешу."""
+    digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    if settings.TOKEN_CACHE_MAX_KEYS > 0:
+        hit = _token_cache.get(digest)
+        if hit is not MISSING:
+            claims, exp = hit
+            if exp > time.time():
+                return dict(claims)
+    claims = _verify_token(token)
+    exp = claims.get("exp")
+    if settings.TOKEN_CACHE_MAX_KEYS > 0 and isinstance(exp, (int, float)):
+        _token_cache.set(digest, (claims, exp), ttl=max(0.0, exp - time.time()))
+    return dict(claims)
+
+def clear_token_cache() -> None:
+    _token_cache.clear()
 
 def create_access_token(subject: str | int, expires_minutes: int | None = None, scope: str = "access") -> str:
     expire = datetime.now(tz=timezone.utc) + timedelta(minutes=expires_minutes or settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode: dict[str, Any] = {"sub": str(subject), "exp": expire, "scope": scope}
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return _encode(to_encode)
 
 def create_email_token(email: str) -> str:
     expire = datetime.now(tz=timezone.utc) + timedelta(hours=settings.EMAIL_TOKEN_EXPIRE_HOURS)
     data = {"sub": email, "scope": "email_verification", "exp": expire}
-    return jwt.encode(data, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
-
-def decode_token(token: str) -> dict[str, Any]:
-    return jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    return _encode(data)
 
 
 import uuid
 
-def create_refresh_token(subject: str | int) -> str:
-    """Створює refresh-токен з довшим строком життя та унікальним JTI."""
+def create_refresh_token(subject: str | int, family: str | None = None, jti: str | None = None) -> str:
+    """Створює refresh-токен з довшим строком життя та унікальним JTI.
+
+    ``family`` — ідентифікатор ланцюжка ротацій (див. ``token_store.py``).
+    """
     expire = datetime.now(tz=timezone.utc) + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
-    jti = str(uuid.uuid4())
-    payload: dict[str, Any] = {"sub": str(subject), "exp": expire, "scope": "refresh", "jti": jti}
-    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    payload: dict[str, Any] = {"sub": str(subject), "exp": expire, "scope": "refresh", "jti": jti or str(uuid.uuid4())}
+    if family:
+        payload["fam"] = family
+    return _encode(payload)
 
 def create_password_reset_token(email: str) -> str:
     """Токен для скидання пароля; scope=password_reset."""
     expire = datetime.now(tz=timezone.utc) + timedelta(hours=1)
     payload: dict[str, Any] = {"sub": email, "exp": expire, "scope": "password_reset"}
-    return jwt.encode(payload, settings.SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
+    return _encode(payload)
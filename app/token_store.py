@@ -0,0 +1,122 @@
+"""Сховище refresh-токенів: ротація, відкликання і виявлення повторного використання.
+
+Кожен логін відкриває *родину* токенів; у родині дійсний лише останній ``jti``.
+``/auth/refresh`` атомарно замінює його новим. Якщо пред'явлено вже замінений
+токен (його вкрали або він витік), родина відкликається повністю: і зловмисник,
+і власник мусять увійти знову.
+
+З Redis кожна операція — один round trip (Lua-скрипт для ротації, pipeline для
+видачі); без Redis — таблиця ``refresh_token_families``.
+"""
+from __future__ import annotations
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict
+from starlette.concurrency import run_in_threadpool
+from . import crud_async
+from .cache import get_redis
+from .security import create_refresh_token
+from .settings import settings
+
+log = logging.getLogger(__name__)
+
+
+class RefreshTokenError(Exception):
+    """Токен невідомий, прострочений, відкликаний або використаний повторно (``reused``)."""
+
+    def __init__(self, detail: str, reused: bool = False):
+        super().__init__(detail)
+        self.reused = reused
+
+
+# KEYS[1] — ключ родини; ARGV: старий jti, новий jti, TTL (с). 1 — ok, 0 — немає родини, -1 — reuse
+_ROTATE_LUA = """
+local cur = redis.call('HGET', KEYS[1], 'jti')
+if not cur then return 0 end
+if cur ~= ARGV[1] then
+  redis.call('DEL', KEYS[1])
+  return -1
+end
+redis.call('HSET', KEYS[1], 'jti', ARGV[2])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[3]))
+return 1
+"""
+_rotate_script = None
+
+
+def _family_key(family: str) -> str:
+    return f"rtfam:{family}"
+
+
+def _ttl() -> int:
+    return settings.REFRESH_TOKEN_EXPIRE_DAYS * 86400
+
+
+def _redis():
+    if settings.REFRESH_TOKEN_STORE == "db":
+        return None
+    r = get_redis()
+    if r is None and settings.REFRESH_TOKEN_STORE == "redis":
+        raise RuntimeError("REFRESH_TOKEN_STORE=redis requires REDIS_URL")
+    return r
+
+
+def _redis_issue(r, family: str, jti: str, user_id: int) -> None:
+    pipe = r.pipeline()
+    pipe.hset(_family_key(family), mapping={"jti": jti, "uid": user_id})
+    pipe.expire(_family_key(family), _ttl())
+    pipe.execute()
+
+
+def _redis_rotate(r, family: str, old_jti: str, new_jti: str) -> int:
+    global _rotate_script
+    if _rotate_script is None or _rotate_script.registered_client is not r:
+        _rotate_script = r.register_script(_ROTATE_LUA)
+    return int(_rotate_script(keys=[_family_key(family)], args=[old_jti, new_jti, _ttl()]))
+
+
+def _expires_at() -> datetime:
+    return datetime.utcnow() + timedelta(seconds=_ttl())
+
+
+async def issue(db: Any, user_id: int) -> str:
+    """Відкриває нову родину (логін) і повертає її перший refresh-токен."""
+    family, jti = str(uuid.uuid4()), str(uuid.uuid4())
+    r = _redis()
+    if r is not None:
+        await run_in_threadpool(_redis_issue, r, family, jti, user_id)
+    else:
+        await crud_async.refresh_family_create(db, family, user_id, jti, _expires_at())
+    return create_refresh_token(user_id, family=family, jti=jti)
+
+
+async def rotate(db: Any, claims: Dict[str, Any]) -> str:
+    """Замінює пред'явлений токен новим з тієї ж родини; інакше :class:`RefreshTokenError`."""
+    family, old_jti = claims.get("fam"), claims.get("jti")
+    if not family or not old_jti:
+        raise RefreshTokenError("Refresh token is not tracked; please log in again")
+    new_jti = str(uuid.uuid4())
+    r = _redis()
+    if r is not None:
+        status = await run_in_threadpool(_redis_rotate, r, family, old_jti, new_jti)
+    else:
+        status = await crud_async.refresh_family_rotate(db, family, old_jti, new_jti, _expires_at())
+    if status == -1:
+        log.warning("Refresh token reuse detected for user %s; family %s revoked", claims.get("sub"), family)
+        raise RefreshTokenError("Refresh token reuse detected; all sessions of this login were revoked", reused=True)
+    if status != 1:
+        raise RefreshTokenError("Refresh token revoked or expired")
+    return create_refresh_token(claims["sub"], family=family, jti=new_jti)
+
+
+async def revoke(db: Any, claims: Dict[str, Any]) -> None:
+    """Відкликає родину пред'явленого токена (logout)."""
+    family = claims.get("fam")
+    if not family:
+        return
+    r = _redis()
+    if r is not None:
+        await run_in_threadpool(r.delete, _family_key(family))
+    else:
+        await crud_async.refresh_family_revoke(db, family)
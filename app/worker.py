@@ -0,0 +1,39 @@
+"""Воркер черги листів: ``python -m app.worker [--id NAME]``.
+
+Потребує ``REDIS_URL``; кілька воркерів можуть працювати паралельно,
+кожен зі своїм processing-списком (``--id``, за замовчуванням — hostname:pid).
+Id не мусить бути стабільним: задачі воркера, що зник, повертають у чергу інші
+після завершення його оренди (``MAIL_WORKER_LEASE_SEC``).
+"""
+from __future__ import annotations
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+from . import mailer
+from .cache import get_redis
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--id", default=f"{socket.gethostname()}:{os.getpid()}")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    r = get_redis()
+    if r is None:
+        logging.error("REDIS_URL is not set: without Redis emails are sent by the API process itself")
+        return 1
+    worker = mailer.MailWorker(mailer.RedisMailQueue(r, args.id))
+    # SIGTERM/SIGINT: доробити поточний пакет і вийти
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda *_: worker.stop())
+    logging.info("Mail worker %s started (smtp=%s)", args.id, "on" if mailer.smtp_configured() else "log only")
+    worker.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""Мікробенчмарк накладних витрат автентифікації на запит.
+
+Порівнює ``security.decode_token`` без кешу (python-jose, PyJWT — якщо встановлений)
+і з кешем розкодованих токенів, а також повний ``deps.get_current_user`` при
+попаданні в кеш користувача (fakeredis + рівень у пам'яті).
+
+Запуск::
+
+    python -m benchmarks.bench_auth --iterations 20000
+"""
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import time
+from types import SimpleNamespace
+from typing import Callable
+
+
+def _per_call_us(fn: Callable[[], object], iterations: int) -> float:
+    fn()  # прогрів
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return round((time.perf_counter() - t0) / iterations * 1e6, 2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    import fakeredis
+    from app import cache, deps, security
+    from app.settings import settings
+
+    token = security.create_access_token(1)
+    result: dict[str, float] = {}
+
+    settings.TOKEN_CACHE_MAX_KEYS = 0
+    settings.JWT_BACKEND = "jose"
+    result["decode_jose_us"] = _per_call_us(lambda: security.decode_token(token), args.iterations)
+    if security._pyjwt() is not None:
+        settings.JWT_BACKEND = "pyjwt"
+        result["decode_pyjwt_us"] = _per_call_us(lambda: security.decode_token(token), args.iterations)
+    settings.TOKEN_CACHE_MAX_KEYS = 10000
+    result["decode_cached_us"] = _per_call_us(lambda: security.decode_token(token), args.iterations)
+
+    # get_current_user з попаданням у кеш користувача: БД не використовується
+    settings.REDIS_URL = "redis://fakeredis"
+    cache._client = fakeredis.FakeRedis(decode_responses=True)
+    user = type("U", (), {"id": 1, "email": "bench@example.com", "is_active": True, "is_verified": True,
+                          "avatar_url": None, "role": "user", "created_at": None, "updated_at": None})()
+    cache.cache_user(user)
+    cache.lookup_user(1)  # Redis → пам'ять
+
+    db = SimpleNamespace(info={})  # сесія не знадобиться: користувач у кеші
+
+    async def run(mode: str) -> float:
+        settings.TOKEN_CACHE_MAX_KEYS = 0 if mode == "before" else 10000
+        settings.LOCAL_CACHE_TTL_SEC = 0 if mode == "before" else 30.0
+        settings.JWT_BACKEND = "jose"
+        security.clear_token_cache()
+        await deps.get_current_user(token, db=db)
+        n = args.iterations // 4
+        t0 = time.perf_counter()
+        for _ in range(n):
+            await deps.get_current_user(token, db=db)
+        return round((time.perf_counter() - t0) / n * 1e6, 2)
+
+    result["get_current_user_before_us"] = asyncio.run(run("before"))
+    result["get_current_user_after_us"] = asyncio.run(run("after"))
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Вартість запиту і серіалізації сторінки контактів (мс на ``--page`` рядків).
+
+Порівнює шляхи ``GET /contacts``:
+
+* ``orm_response_model`` — ORM-сутності → ``response_model`` (валідація Pydantic з
+  ``from_attributes``, ``jsonable``-dict) → stdlib ``json`` (стандартний FastAPI);
+* ``orm_pydantic_json`` — ORM → ``TypeAdapter.validate_python`` → ``dump_json``;
+* ``projection_fast`` — ``crud.list_contacts`` (рядки проєкції, усі поля) → ``responses.dump_rows``;
+* ``projection_default`` — те саме з полями за замовчуванням (без ``extra``);
+* ``projection_slim`` — ``?fields=first_name,last_name,phone``.
+
+Для кожного окремо — час запиту (``query``) і серіалізації (``serialize``).
+
+Запуск::
+
+    python -m benchmarks.bench_serialization --page 1000 --repeat 50
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from datetime import date, datetime
+from typing import Callable, List
+
+EMAIL = "bench-serialization@example.com"
+
+
+def seed(db, crud, models, contacts: int) -> int:
+    from sqlalchemy import insert
+
+    user = crud.create_user(db, type("obj", (), {"email": EMAIL, "password": "password123"}))
+    now = datetime.utcnow()
+    db.execute(insert(models.Contact), [{
+        "owner_id": user.id, "first_name": f"First{i}", "last_name": f"Last{i % 97}",
+        "email": f"contact{i}@example.com", "phone": f"+380{500000000 + i}",
+        "birthday": date(1970 + i % 40, 1 + i % 12, 1 + i % 28),
+        "extra": "note " * (i % 8), "created_at": now, "updated_at": now,
+    } for i in range(contacts)])
+    db.commit()
+    return user.id
+
+
+def median_ms(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="за замовчуванням — тимчасова SQLite")
+    parser.add_argument("--page", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp}/serialization.db"
+        from fastapi.encoders import jsonable_encoder
+        from pydantic import TypeAdapter
+        from sqlalchemy import select
+        from app import crud, models, responses, schemas
+        from app.database import SessionLocal, engine
+
+        models.Base.metadata.create_all(bind=engine)
+        db = SessionLocal()
+        owner_id = seed(db, crud, models, args.page)
+        adapter = TypeAdapter(List[schemas.ContactOut])
+
+        def orm_rows():
+            db.expunge_all()  # як у новій сесії запиту: без готових сутностей в identity map
+            return list(db.scalars(select(models.Contact).where(models.Contact.owner_id == owner_id).limit(args.page)))
+
+        def projection(fields):
+            return lambda: crud.list_contacts(db, owner_id, limit=args.page, fields=fields)
+
+        projection_rows = projection(schemas.CONTACT_FIELDS)
+        slim = schemas.parse_contact_fields("first_name,last_name,phone")
+
+        entities, rows = orm_rows(), projection_rows()
+        # той самий JSON незалежно від шляху
+        assert json.loads(adapter.dump_json(adapter.validate_python(entities))) == json.loads(responses.dump_rows(rows))
+
+        paths = {
+            "orm_response_model": (orm_rows, lambda items: json.dumps(
+                jsonable_encoder(adapter.dump_python(adapter.validate_python(items), mode="json")),
+                ensure_ascii=False, separators=(",", ":")).encode()),
+            "orm_pydantic_json": (orm_rows, lambda items: adapter.dump_json(adapter.validate_python(items))),
+            "projection_fast": (projection_rows, responses.dump_rows),
+            "projection_default": (projection(None), responses.dump_rows),
+            "projection_slim": (projection(slim), responses.dump_rows),
+        }
+        report = {"dialect": engine.dialect.name, "page": args.page,
+                  "json_backend": "orjson" if responses.orjson is not None else "pydantic-core", "paths": {}}
+        for name, (query, serialize) in paths.items():
+            items = query()
+            q_ms, s_ms = median_ms(query, args.repeat), median_ms(lambda: serialize(items), args.repeat)
+            report["paths"][name] = {"query_ms": round(q_ms, 2), "serialize_ms": round(s_ms, 2),
+                                     "total_ms": round(q_ms + s_ms, 2), "bytes": len(serialize(items))}
+        base = report["paths"]["orm_response_model"]["total_ms"]
+        report["speedup_vs_response_model"] = round(base / report["paths"]["projection_fast"]["total_ms"], 1)
+        db.close()
+        engine.dispose()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""Холодний старт: профіль імпорту ``app.main`` і час до ``/ready``.
+
+Імпорт профілюється через ``python -X importtime`` в окремому процесі (медіана
+``--runs`` запусків); звіт — найдорожчі пакети за власним часом і модулі ``app.*``
+за сукупним. ``--ready`` додатково піднімає uvicorn і міряє час до ``200`` на ``/ready``.
+З ``--budget-ms`` завершується з кодом 1, якщо імпорт повільніший (для CI).
+
+Запуск::
+
+    python -m benchmarks.bench_startup --runs 5 --ready --budget-ms 1500
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+import httpx
+
+
+def _env(database_url: str) -> dict:
+    env = dict(os.environ, DATABASE_URL=database_url, DB_MIGRATE_ON_STARTUP="true", PYTHONDONTWRITEBYTECODE="1")
+    env.setdefault("REDIS_URL", "")
+    return env
+
+
+def profile_import(env: dict) -> tuple[float, dict, dict]:
+    """Повертає (загальний час, мс), self-час за пакетами і сукупний час модулів app.*."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                          env=env, capture_output=True, text=True, check=True)
+    by_package: dict[str, float] = defaultdict(float)
+    app_modules: dict[str, float] = {}
+    total = 0.0
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        module = name.strip()
+        by_package[module.split(".")[0]] += int(self_us) / 1000
+        if module.startswith("app"):
+            app_modules[module] = int(cumulative_us) / 1000
+        if module == "app.main":
+            total = int(cumulative_us) / 1000
+    return total, by_package, app_modules
+
+
+def time_to_ready(env: dict, timeout: float = 60.0) -> float:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                            env=env)
+    try:
+        while time.perf_counter() - t0 < timeout:
+            try:
+                if httpx.get(f"http://127.0.0.1:{port}/ready", timeout=1.0).status_code == 200:
+                    return time.perf_counter() - t0
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError("server did not become ready")
+    finally:
+        proc.terminate()
+        proc.wait(10)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--database-url", default=None, help="за замовчуванням — тимчасова SQLite")
+    parser.add_argument("--ready", action="store_true", help="також виміряти час до /ready (uvicorn)")
+    parser.add_argument("--budget-ms", type=float, default=None)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(args.database_url or f"sqlite:///{tmp}/startup_test.db")
+        runs = [profile_import(env) for _ in range(args.runs)]
+        total = statistics.median(r[0] for r in runs)
+        _, by_package, app_modules = min(runs, key=lambda r: abs(r[0] - total))
+        result = {
+            "import_ms": round(total, 1),
+            "top_packages_self_ms": {k: round(v, 1) for k, v in sorted(by_package.items(), key=lambda kv: -kv[1])[:args.top]},
+            "app_modules_cumulative_ms": {k: round(v, 1) for k, v in sorted(app_modules.items(), key=lambda kv: -kv[1])[:args.top]},
+        }
+        if args.ready:
+            result["time_to_ready_s"] = round(time_to_ready(env), 3)
+    print(json.dumps(result, indent=2))
+    if args.budget_ms is not None and total > args.budget_ms:
+        print(f"import of app.main took {total:.0f} ms, budget {args.budget_ms:.0f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
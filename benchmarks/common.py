@@ -0,0 +1,60 @@
+"""Спільні утиліти бенчмарків: очікування сервера, навантаження та зведення латентності."""
+from __future__ import annotations
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable, List
+
+import httpx
+
+Request = Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]]
+
+
+def wait_ready(base_url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(base_url + "/ready", timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"server at {base_url} did not start")
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """RPS і перцентилі латентності (мс) для серії запитів."""
+    if not latencies:
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+    latencies = sorted(latencies)
+    pct = lambda p: round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2)  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2),
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+    }
+
+
+async def run_load(client: httpx.AsyncClient, request: Request, concurrency: int,
+                   duration: float, ok: tuple = (200,)) -> dict:
+    """``concurrency`` воркерів викликають ``request(client, worker_no)`` протягом ``duration`` секунд."""
+    latencies: List[float] = []
+    errors = 0
+    stop_at = time.perf_counter() + duration
+
+    async def worker(n: int) -> None:
+        nonlocal errors
+        while time.perf_counter() < stop_at:
+            t0 = time.perf_counter()
+            resp = await request(client, n)
+            latencies.append(time.perf_counter() - t0)
+            if resp.status_code not in ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return summarize(latencies, errors, time.perf_counter() - started)
@@ -0,0 +1,76 @@
+import asyncio
+from datetime import date
+import pytest
+from sqlalchemy import create_engine
+from app import crud_async, database
+from app.database import SessionLocal, run_db
+from app.models import Base
+
+
+def _contact(first: str) -> dict:
+    return {"first_name": first, "last_name": "Async", "email": f"{first.lower()}@x.com",
+            "phone": "12345", "birthday": date(1990, 1, 1), "extra": None}
+
+
+def test_crud_async_with_sync_session():
+    async def scenario():
+        db = SessionLocal()
+        try:
+            u = await crud_async.create_user(db, type("obj", (), {"email": "as1@example.com", "password": "password123"}))
+            await crud_async.create_contact(db, u.id, _contact("Ann"))
+            rows = await crud_async.list_contacts(db, u.id)
+            assert [c.first_name for c in rows] == ["Ann"]
+            assert await run_db(db, lambda s, uid: s.get(type(u), uid).email, u.id) == "as1@example.com"
+        finally:
+            db.close()
+    asyncio.run(scenario())
+
+
+def test_crud_async_with_async_session(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    url = f"sqlite:///{tmp_path / 'async_test.db'}"
+    Base.metadata.create_all(create_engine(url))
+    aengine = create_async_engine(database._async_url(url))
+    Session = async_sessionmaker(aengine, expire_on_commit=False)
+
+    async def scenario():
+        async with Session() as db:
+            u = await crud_async.create_user(db, type("obj", (), {"email": "as2@example.com", "password": "password123"}))
+            await crud_async.create_contact(db, u.id, _contact("Bob"))
+            rows = await crud_async.list_contacts(db, u.id, first_name="Bo")
+            assert len(rows) == 1 and rows[0].owner_id == u.id
+            assert await crud_async.delete_contact(db, u.id, rows[0].id) is True
+        await aengine.dispose()
+    asyncio.run(scenario())
+
+
+class _RunSyncSession:
+    """Як ``AsyncSession``: ``run_sync`` виконує код прямо в потоці event loop."""
+
+    def __init__(self, db):
+        self.sync_session, self.info = db, db.info
+
+    async def run_sync(self, fn, *args, **kwargs):
+        return fn(self.sync_session, *args, **kwargs)
+
+
+def test_redis_side_effects_leave_event_loop(monkeypatch):
+    # Синхронний Redis не викликається з коду, що виконується на event loop
+    import threading
+    from app import crud
+    threads = []
+    monkeypatch.setattr(crud, "bump_contacts_version", lambda owner_id: threads.append(threading.get_ident()))
+
+    async def scenario():
+        db = SessionLocal()
+        try:
+            u = crud.create_user(db, type("obj", (), {"email": "as3@example.com", "password": "password123"}))
+            await crud_async.create_contact(_RunSyncSession(db), u.id, _contact("Cid"))
+            assert "deferred_effects" not in db.info
+        finally:
+            db.close()
+        return threading.get_ident()
+    loop_thread = asyncio.run(scenario())
+    assert len(threads) == 1 and threads[0] != loop_thread
@@ -0,0 +1,84 @@
+import struct
+import zlib
+import pytest
+from fastapi.testclient import TestClient
+from app import avatars
+from app.settings import settings
+from tests.helpers import register_and_login
+
+
+def _png(width: int = 2, height: int = 2) -> bytes:
+    """Мінімальний валідний PNG (RGB) без Pillow."""
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+    raw = b"".join(b"\x00" + b"\xff\x00\x00" * width for _ in range(height))
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(raw)) + chunk(b"IEND", b"")
+
+
+@pytest.fixture
+def local_storage(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "AVATAR_STORAGE", "local")
+    monkeypatch.setattr(settings, "AVATAR_LOCAL_DIR", str(tmp_path))
+    return tmp_path
+
+
+def _headers(client: TestClient, email: str) -> dict:
+    return {"Authorization": f"Bearer {register_and_login(client, email, 'password123')}"}
+
+
+def test_upload_returns_pending_then_becomes_ready(client: TestClient, local_storage):
+    h = _headers(client, "av1@example.com")
+    r = client.post("/users/me/avatar", headers=h, files={"file": ("a.png", _png(), "application/octet-stream")})
+    assert r.status_code == 202
+    assert r.json()["avatar_status"] == "pending"
+    avatars.wait_idle(5)
+
+    me = client.get("/users/me", headers=h).json()
+    assert me["avatar_status"] == "ready"
+    assert me["avatar_url"].startswith(f"{settings.AVATAR_LOCAL_URL}/{me['id']}.")
+    [saved] = list(local_storage.glob(f"{me['id']}.*"))
+    assert saved.read_bytes().startswith(b"\x89PNG")
+
+
+def test_upload_rejects_non_images_and_oversized_files(client: TestClient, local_storage, monkeypatch):
+    h = _headers(client, "av2@example.com")
+    # тип визначається за вмістом, а не за заявленим Content-Type
+    r = client.post("/users/me/avatar", headers=h, files={"file": ("a.png", b"not an image", "image/png")})
+    assert r.status_code == 415
+    monkeypatch.setattr(settings, "AVATAR_MAX_BYTES", 100)
+    r = client.post("/users/me/avatar", headers=h, files={"file": ("a.png", _png(64, 64) + b"\x00" * 200, "image/png")})
+    assert r.status_code == 413
+    assert client.get("/users/me", headers=h).json()["avatar_status"] is None
+
+
+def test_failed_processing_is_reported(client: TestClient, local_storage, monkeypatch):
+    h = _headers(client, "av3@example.com")
+
+    class Broken:
+        def save(self, user_id, data, mime):
+            raise OSError("disk full")
+    monkeypatch.setattr(avatars, "get_storage", lambda: Broken())
+    r = client.post("/users/me/avatar", headers=h, files={"file": ("a.png", _png(), "image/png")})
+    assert r.status_code == 202
+    avatars.wait_idle(5)
+    me = client.get("/users/me", headers=h).json()
+    assert me["avatar_status"] == "failed" and me["avatar_url"] is None
+
+
+def test_sniff_image_signatures():
+    assert avatars.sniff_image(_png()) == "image/png"
+    assert avatars.sniff_image(b"\xff\xd8\xff\xe0rest") == "image/jpeg"
+    assert avatars.sniff_image(b"GIF89a....") == "image/gif"
+    assert avatars.sniff_image(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "image/webp"
+    assert avatars.sniff_image(b"<svg") is None
+
+
+def test_thumbnail_is_square_and_small():
+    Image = pytest.importorskip("PIL.Image")
+    import io
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 400), "red").save(buf, format="JPEG")
+    data, mime = avatars.make_thumbnail(buf.getvalue(), "image/jpeg", 128)
+    assert mime == "image/jpeg"
+    assert Image.open(io.BytesIO(data)).size == (128, 128)
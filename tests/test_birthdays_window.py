@@ -0,0 +1,50 @@
+from datetime import date, timedelta
+from app import crud, models
+from app.database import SessionLocal
+
+
+def _python_window(contacts, today: date, days: int):
+    """Еталонна семантика (попередня реалізація на Python)."""
+    end = today + timedelta(days=days)
+    result = []
+    for c in contacts:
+        b = c.birthday
+        try:
+            next_bd = b.replace(year=today.year)
+        except ValueError:
+            next_bd = date(today.year, 2, 28)
+        if next_bd < today:
+            try:
+                next_bd = b.replace(year=today.year + 1)
+            except ValueError:
+                next_bd = date(today.year + 1, 2, 28)
+        if today <= next_bd <= end:
+            result.append((next_bd, c.id))
+    return [cid for _, cid in sorted(result)]
+
+
+def test_sql_window_matches_python_semantics():
+    db = SessionLocal()
+    owner = crud.create_user(db, type("obj", (), {"email": "bday@example.com", "password": "password123"}))
+    start = date(1992, 1, 1)  # високосний рік: по одному контакту на кожен день, включно з 29.02
+    # у зворотному порядку, щоб id 29.02 був меншим за id 28.02 (порядок при рівних датах)
+    db.add_all([
+        models.Contact(first_name="B", last_name=str(i), email=f"b{i}@x.com", phone="12345",
+                       birthday=start + timedelta(days=i), owner_id=owner.id)
+        for i in reversed(range(366))
+    ])
+    db.commit()
+    contacts = list(db.query(models.Contact).filter(models.Contact.owner_id == owner.id))
+    assert all(c.birthday_md == c.birthday.month * 100 + c.birthday.day for c in contacts)
+
+    todays = [date(2023, 2, 27), date(2023, 2, 28), date(2023, 3, 1), date(2024, 2, 28), date(2024, 2, 29),
+              date(2024, 3, 1), date(2023, 12, 31), date(2024, 12, 31), date(2025, 1, 1), date(2023, 6, 15),
+              date(2027, 3, 1), date(2027, 2, 27)]
+    for today in todays:
+        for days in (1, 2, 7, 30, 180, 364, 365):
+            got = [c.id for c in crud.upcoming_birthdays(db, owner.id, days=days, today=today)]
+            assert got == _python_window(contacts, today, days), (today, days)
+
+    page = crud.upcoming_birthdays(db, owner.id, days=30, skip=5, limit=3, today=date(2024, 2, 20))
+    assert [c.id for c in page] == _python_window(contacts, date(2024, 2, 20), 30)[5:8]
+    db.close()
@@ -0,0 +1,96 @@
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+from app.settings import settings
+from tests.test_contacts_full_flow import auth
+
+
+def _create(client: TestClient, h: dict, n: int) -> list[int]:
+    ids = []
+    for i in range(n):
+        body = {"first_name": f"N{i}", "last_name": "Batch", "email": f"b{i}@ex.com", "phone": "555555", "birthday": "1990-01-01"}
+        ids.append(client.post("/contacts", json=body, headers=h).json()["id"])
+    return ids
+
+
+def test_batch_update_mixed_payloads_and_reports_not_found(client: TestClient, monkeypatch):
+    h, other = auth(client, "batch1@example.com"), auth(client, "batch2@example.com")
+    ids = _create(client, h, 5)
+    foreign = _create(client, other, 1)[0]
+    monkeypatch.setattr(settings, "CONTACTS_BATCH_CHUNK_SIZE", 2)
+
+    items = [{"id": i, "last_name": "Renamed"} for i in ids[:4]]
+    items.append({"id": ids[4], "birthday": "1990-03-15", "phone": "777777"})
+    items += [{"id": foreign, "last_name": "Hijack"}, {"id": 999999, "last_name": "Ghost"}]
+    r = client.patch("/contacts/batch", json={"items": items}, headers=h)
+    assert r.status_code == 200
+    assert r.json() == {"updated": ids, "not_found": [foreign, 999999]}
+
+    contacts = {c["id"]: c for c in client.get("/contacts", headers=h).json()}
+    assert all(contacts[i]["last_name"] == "Renamed" for i in ids[:4])
+    assert contacts[ids[4]]["phone"] == "777777" and contacts[ids[4]]["birthday"] == "1990-03-15"
+    assert client.get(f"/contacts/{foreign}", headers=other).json()["last_name"] == "Batch"
+
+
+def test_batch_update_keeps_birthday_md_in_sync(client: TestClient):
+    h = auth(client, "batch3@example.com")
+    [cid] = _create(client, h, 1)
+    # Core UPDATE оминає @validates: без явного birthday_md контакт не потрапив би у вікно
+    soon = (date.today() + timedelta(days=1)).replace(year=2000)
+    r = client.patch("/contacts/batch", json={"items": [{"id": cid, "birthday": soon.isoformat()}]}, headers=h)
+    assert r.json()["updated"] == [cid]
+    upcoming = client.get("/contacts/birthdays/upcoming", params={"days": 3}, headers=h).json()
+    assert [c["id"] for c in upcoming] == [cid]
+
+
+def test_batch_delete(client: TestClient, monkeypatch):
+    h = auth(client, "batch4@example.com")
+    ids = _create(client, h, 3)
+    monkeypatch.setattr(settings, "CONTACTS_BATCH_CHUNK_SIZE", 2)
+    r = client.request("DELETE", "/contacts/batch", json={"ids": ids + [424242]}, headers=h)
+    assert r.status_code == 200
+    assert r.json() == {"deleted": ids, "not_found": [424242]}
+    assert client.get("/contacts", headers=h).json() == []
+
+
+def test_batch_validation(client: TestClient, monkeypatch):
+    h = auth(client, "batch5@example.com")
+    dup = client.patch("/contacts/batch", json={"items": [{"id": 1, "phone": "123456"}, {"id": 1, "phone": "654321"}]}, headers=h)
+    assert dup.status_code == 422
+    monkeypatch.setattr(settings, "CONTACTS_BATCH_MAX_ITEMS", 2)
+    r = client.request("DELETE", "/contacts/batch", json={"ids": [1, 2, 3]}, headers=h)
+    assert r.status_code == 413
+
+
+def test_batch_update_writes_only_patched_columns(client: TestClient, db_session):
+    from sqlalchemy import event
+    from app import crud
+    h = auth(client, "batch6@example.com")
+    ids = _create(client, h, 5)
+    owner_id = client.get("/users/me", headers=h).json()["id"]
+    updates = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("UPDATE"):
+            updates.append((statement, executemany))
+
+    bind = db_session.get_bind()
+    event.listen(bind, "before_cursor_execute", on_execute)
+    try:
+        items = [(ids[0], {"phone": "111111"}), (ids[1], {"phone": "222222"}),
+                 (ids[2], {"last_name": "Other", "birthday": date(1991, 2, 3)}), (ids[3], {}),
+                 (ids[4], {"phone": "333333"}), (424242, {"phone": "444444"})]
+        updated, not_found = crud.batch_update_contacts(db_session, owner_id, items, chunk_size=10)
+    finally:
+        event.remove(bind, "before_cursor_execute", on_execute)
+    assert updated == ids and not_found == [424242]
+    # один executemany на групу з однаковим набором колонок; SET — лише ці колонки
+    [(phone_sql, many), (other_sql, _)] = updates
+    assert many is True
+    set_clause = phone_sql.upper().split(" WHERE ")[0]
+    assert "PHONE" in set_clause and "LAST_NAME" not in set_clause and "BIRTHDAY" not in set_clause
+    assert "PHONE" not in other_sql.upper().split(" WHERE ")[0]
+    contacts = {c["id"]: c for c in client.get("/contacts", headers=h).json()}
+    assert [contacts[i]["phone"] for i in (ids[0], ids[1], ids[4])] == ["111111", "222222", "333333"]
+    assert contacts[ids[0]]["last_name"] == "Batch"
+    assert contacts[ids[2]]["last_name"] == "Other" and contacts[ids[2]]["phone"] == "555555"
+    assert contacts[ids[2]]["birthday"] == "1991-02-03"
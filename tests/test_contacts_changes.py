@@ -0,0 +1,104 @@
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from app import crud, database, schemas
+from app.crud import encode_cursor
+from app.settings import settings
+from tests.test_contacts_full_flow import auth
+
+
+def _create(client: TestClient, h: dict, name: str) -> int:
+    body = {"first_name": name, "last_name": "Sync", "email": f"{name.lower()}@ex.com", "phone": "555555", "birthday": "1990-01-01"}
+    return client.post("/contacts", json=body, headers=h).json()["id"]
+
+
+def _tick():
+    # SQLite зберігає час із точністю до секунди: наступна зміна — вже в новій секунді
+    time.sleep(1.1)
+
+
+def test_changes_reports_updates_creates_and_deletes(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SEC", 0)
+    h = auth(client, "sync1@example.com")
+    a, b = _create(client, h, "Ann"), _create(client, h, "Bob")
+    _tick()
+
+    r = client.get("/contacts/changes", headers=h)
+    assert r.status_code == 200
+    first = r.json()
+    assert [c["id"] for c in first["changed"]] == [a, b]
+    assert first["deleted"] == [] and first["has_more"] is False
+
+    client.put(f"/contacts/{a}", json={"phone": "111111"}, headers=h)
+    client.delete(f"/contacts/{b}", headers=h)
+    c = _create(client, h, "Cid")
+    _tick()
+
+    second = client.get("/contacts/changes", params={"since": first["next"]}, headers=h).json()
+    assert [x["id"] for x in second["changed"]] == [a, c]
+    assert second["changed"][0]["phone"] == "111111"
+    assert second["deleted"] == [b]
+
+    third = client.get("/contacts/changes", params={"since": second["next"]}, headers=h).json()
+    assert third == {"changed": [], "deleted": [], "next": second["next"], "has_more": False}
+
+
+def test_changes_pages_and_settle_window(client: TestClient, monkeypatch):
+    h = auth(client, "sync2@example.com")
+    ids = [_create(client, h, f"P{i}") for i in range(3)]
+    # свіжі записи ще "осідають" — не віддаються, доки не мине SYNC_SETTLE_SEC
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SEC", 60)
+    assert client.get("/contacts/changes", headers=h).json()["changed"] == []
+
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SEC", 0)
+    _tick()
+    seen, since = [], None
+    while True:
+        params = {"limit": 2, **({"since": since} if since else {})}
+        page = client.get("/contacts/changes", params=params, headers=h).json()
+        seen += [x["id"] for x in page["changed"]]
+        since = page["next"]
+        if not page["has_more"]:
+            break
+    assert seen == ids
+    # чужі контакти не видно
+    other = auth(client, "sync3@example.com")
+    assert client.get("/contacts/changes", headers=other).json()["changed"] == []
+
+
+def test_changes_rejects_bad_and_expired_tokens(client: TestClient, monkeypatch):
+    h = auth(client, "sync4@example.com")
+    assert client.get("/contacts/changes", params={"since": "garbage"}, headers=h).status_code == 400
+    # курсор пагінації списку — не водяний знак
+    cursor = encode_cursor("name", ("Lee", "Ann", 1))
+    assert client.get("/contacts/changes", params={"since": cursor}, headers=h).status_code == 400
+    forged = encode_cursor("changes", ("2024-01-01T00:00:00", "1", [], 0))
+    assert client.get("/contacts/changes", params={"since": forged}, headers=h).status_code == 400
+    token = client.get("/contacts/changes", headers=h).json()["next"]
+    monkeypatch.setattr(settings, "SYNC_TOMBSTONE_RETENTION_DAYS", -1)
+    r = client.get("/contacts/changes", params={"since": token}, headers=h)
+    assert r.status_code == 410
+
+
+@pytest.mark.skipif(database.engine.dialect.name != "postgresql", reason="часовий пояс сесії є лише в PostgreSQL")
+def test_changes_window_in_non_utc_session(client: TestClient, monkeypatch):
+    # Колонки — timestamp без поясу в локальному часі сесії: вікно й межа мають бути в ньому ж
+    monkeypatch.setattr(settings, "SYNC_SETTLE_SEC", 0)
+    tokyo = create_engine(database.engine.url, connect_args={"options": "-c timezone=Asia/Tokyo"})
+    db = sessionmaker(bind=tokyo)()
+    try:
+        user = crud.create_user(db, schemas.UserCreate(email="sync-tz@example.com", password="password123"))
+        contact = crud.create_contact(db, user.id, schemas.ContactCreate(
+            first_name="Ann", last_name="Tz", email="ann-tz@ex.com", phone="555555", birthday="1990-01-01"))
+        time.sleep(0.01)
+        changed, deleted, token, _ = crud.contact_changes(db, user.id, None, 100)
+        assert [c.id for c in changed] == [contact.id] and deleted == []
+        crud.delete_contact(db, user.id, contact.id)
+        time.sleep(0.01)
+        changed, deleted, _, _ = crud.contact_changes(db, user.id, token, 100)
+        assert changed == [] and deleted == [contact.id]
+    finally:
+        db.close()
+        tokyo.dispose()
@@ -0,0 +1,63 @@
+from fastapi.testclient import TestClient
+from tests.test_contacts_full_flow import auth
+
+
+def _create(client: TestClient, h: dict, n: int) -> list[int]:
+    ids = []
+    for i in range(n):
+        body = {"first_name": f"F{i}", "last_name": "Fields", "email": f"f{i}@ex.com", "phone": "555555",
+                "birthday": "1990-01-01", "extra": "long note " * 50}
+        ids.append(client.post("/contacts", json=body, headers=h).json()["id"])
+    return ids
+
+
+def test_list_omits_extra_and_honours_fields(client: TestClient):
+    h = auth(client, "fields1@example.com")
+    ids = _create(client, h, 3)
+
+    default = client.get("/contacts", headers=h).json()
+    assert all("extra" not in c and {"first_name", "email", "updated_at"} <= c.keys() for c in default)
+
+    slim = client.get("/contacts", params={"fields": "phone, first_name"}, headers=h).json()
+    assert slim == [{"id": i, "first_name": f"F{n}", "phone": "555555"} for n, i in enumerate(ids)]
+
+    with_extra = client.get("/contacts", params={"fields": "extra"}, headers=h).json()
+    assert [c.keys() for c in with_extra] == [{"id", "extra"}] * 3 and with_extra[0]["extra"].startswith("long note")
+
+    search = client.get("/contacts", params={"q": "F1", "fields": "first_name"}, headers=h).json()
+    assert search == [{"id": ids[1], "first_name": "F1"}]
+
+
+def test_fields_with_cursor_keeps_keys_out_of_response(client: TestClient):
+    h = auth(client, "fields2@example.com")
+    ids = _create(client, h, 3)
+    seen, cursor = [], None
+    while True:
+        params = {"mode": "cursor", "order": "name", "limit": 2, "fields": "phone", **({"cursor": cursor} if cursor else {})}
+        r = client.get("/contacts", params=params, headers=h)
+        assert all(c.keys() == {"id", "phone"} for c in r.json())
+        seen += [c["id"] for c in r.json()]
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert seen == ids
+
+
+def test_single_contact_and_birthdays_fields(client: TestClient):
+    h = auth(client, "fields3@example.com")
+    [cid] = _create(client, h, 1)
+    full = client.get(f"/contacts/{cid}", headers=h).json()
+    assert full["extra"].startswith("long note")
+    assert client.get(f"/contacts/{cid}", params={"fields": "email"}, headers=h).json() == {"id": cid, "email": "f0@ex.com"}
+    assert client.get(f"/contacts/{cid + 1000}", params={"fields": "email"}, headers=h).status_code == 404
+
+    r = client.get("/contacts/birthdays/upcoming", params={"days": 365, "fields": "birthday"}, headers=h)
+    assert r.status_code == 200 and all(c.keys() == {"id", "birthday"} for c in r.json())
+
+
+def test_unknown_field_is_rejected(client: TestClient):
+    h = auth(client, "fields4@example.com")
+    r = client.get("/contacts", params={"fields": "phone,password"}, headers=h)
+    assert r.status_code == 400 and "password" in r.json()["detail"]
+    [cid] = _create(client, h, 1)
+    assert client.get(f"/contacts/{cid}", params={"fields": "birthday_md"}, headers=h).status_code == 400
@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+from fastapi.testclient import TestClient
+from app.settings import settings
+from tests.helpers import register_and_login, verify_email_for
+
+
+def _auth(client: TestClient, email: str) -> dict:
+    register_and_login(client, email, "password123")
+    verify_email_for(client, email)
+    r = client.post("/auth/login", data={"username": email, "password": "password123"})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def test_import_csv_in_batches_with_row_errors(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "IMPORT_BATCH_SIZE", 2)
+    h = _auth(client, "imp@example.com")
+    data = (
+        "first_name,last_name,email,phone,birthday,extra\n"
+        "Ann,Lee,ann@ex.com,555555,1990-02-29,\n"        # некоректна дата
+        "Bob,Ray,bob@ex.com,555555,1991-03-01,vip\n"
+        "Cid,Kim,not-an-email,555555,1992-04-02,\n"
+        "Dan,Moe,dan@ex.com,555555,1992-02-29,\n"
+        "Eve,Fox,eve@ex.com,555555,1993-05-05,\n"
+    )
+    r = client.post("/contacts/import", headers=h, files={"file": ("book.csv", data, "text/csv")})
+    assert r.status_code == 200
+    body = r.json()
+    assert body["inserted"] == 3 and body["failed"] == 2
+    assert [e["row"] for e in body["errors"]] == [2, 4]
+    assert any("email" in msg for msg in body["errors"][1]["errors"])
+    listed = client.get("/contacts", headers=h).json()
+    assert sorted(c["first_name"] for c in listed) == ["Bob", "Dan", "Eve"]
+    # birthday_md заповнюється і для пакетної вставки
+    ups = client.get("/contacts/birthdays/upcoming", params={"days": 365}, headers=h).json()
+    assert len(ups) == 3
+
+
+def test_import_ndjson_and_export_both_formats(client: TestClient):
+    h = _auth(client, "exp@example.com")
+    lines = [
+        json.dumps({"first_name": "Ann", "last_name": "Lee", "email": "ann@ex.com", "phone": "555555", "birthday": "1990-01-02"}),
+        "{broken",
+        "",
+        json.dumps({"first_name": "Bob", "last_name": "Ray", "email": "bob@ex.com", "phone": "555555", "birthday": "1991-03-01", "extra": "a,b"}),
+    ]
+    r = client.post("/contacts/import", headers=h,
+                    files={"file": ("book.ndjson", "\n".join(lines), "application/x-ndjson")})
+    assert r.json()["inserted"] == 2 and r.json()["errors"][0]["row"] == 2
+
+    nd = client.get("/contacts/export", headers=h)
+    assert nd.status_code == 200 and nd.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in nd.text.splitlines()]
+    assert [x["first_name"] for x in rows] == ["Ann", "Bob"] and rows[0]["birthday"] == "1990-01-02"
+
+    cs = client.get("/contacts/export", params={"format": "csv"}, headers=h)
+    parsed = list(csv.DictReader(io.StringIO(cs.text)))
+    assert [x["extra"] for x in parsed] == ["", "a,b"]
+
+    unknown = client.post("/contacts/import", headers=h, files={"file": ("book.xls", "x", "application/vnd.ms-excel")})
+    assert unknown.status_code == 415
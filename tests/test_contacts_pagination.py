@@ -0,0 +1,72 @@
+from fastapi.testclient import TestClient
+from app.crud import encode_cursor
+from tests.helpers import register_and_login, verify_email_for
+
+
+def _auth(client: TestClient, email: str) -> dict:
+    register_and_login(client, email, "password123")
+    verify_email_for(client, email)
+    r = client.post("/auth/login", data={"username": email, "password": "password123"})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def _seed(client: TestClient, h: dict, names: list[tuple[str, str]]) -> None:
+    for i, (first, last) in enumerate(names):
+        body = {"first_name": first, "last_name": last, "email": f"p{i}@ex.com",
+                "phone": "555555", "birthday": "1990-01-01"}
+        assert client.post("/contacts", json=body, headers=h).status_code == 201
+
+
+def test_cursor_pagination_by_name_walks_all_pages(client: TestClient):
+    h = _auth(client, "pager@example.com")
+    names = [("Ann", "Zed"), ("Bob", "Adams"), ("Cid", "Lee"), ("Al", "Lee"), ("Eve", "Moss"), ("Fay", "Adams"), ("Gus", "Kim")]
+    _seed(client, h, names)
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"mode": "cursor", "limit": 3, "with_total": True}
+        if cursor:
+            params["cursor"] = cursor
+        r = client.get("/contacts", params=params, headers=h)
+        assert r.status_code == 200
+        assert r.headers["X-Total-Count"] == "7"
+        seen += [(c["last_name"], c["first_name"]) for c in r.json()]
+        pages += 1
+        cursor = r.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+    assert pages == 3
+    assert seen == sorted((last, first) for first, last in names)
+
+
+def test_cursor_pagination_by_id_with_filter_and_bad_cursor(client: TestClient):
+    h = _auth(client, "pager2@example.com")
+    _seed(client, h, [("Ann", "Lee"), ("Bob", "Lee"), ("Cid", "Kim")])
+    r = client.get("/contacts", params={"mode": "cursor", "order": "id", "limit": 1, "last_name": "Lee"}, headers=h)
+    first_id = r.json()[0]["id"]
+    r2 = client.get("/contacts", params={"order": "id", "limit": 1, "last_name": "Lee",
+                                         "cursor": r.headers["X-Next-Cursor"]}, headers=h)
+    assert r2.json()[0]["id"] > first_id and "X-Next-Cursor" not in r2.headers
+    # курсор від іншого сортування або сміття → 400
+    assert client.get("/contacts", params={"order": "name", "cursor": r.headers["X-Next-Cursor"]}, headers=h).status_code == 400
+    assert client.get("/contacts", params={"cursor": "!!!"}, headers=h).status_code == 400
+    # offset-режим без змін
+    assert len(client.get("/contacts", params={"skip": 1, "limit": 10}, headers=h).json()) == 2
+
+
+def test_tampered_cursor_is_rejected(client: TestClient):
+    h = _auth(client, "pager4@example.com")
+    _seed(client, h, [("Ann", "Lee")])
+    forged = [
+        ("name", ([1, 2], "x", 1)),
+        ("name", ("Lee", "Ann", "1")),
+        ("name", ("Lee", None, 1)),
+        ("id", ("1",)),
+        ("id", (True,)),
+        ("id", ({"a": 1},)),
+    ]
+    for order, values in forged:
+        r = client.get("/contacts", params={"order": order, "cursor": encode_cursor(order, values)}, headers=h)
+        assert r.status_code == 400, (order, values)
+    ok = client.get("/contacts", params={"order": "id", "cursor": encode_cursor("id", (0,))}, headers=h)
+    assert ok.status_code == 200 and len(ok.json()) == 1
@@ -0,0 +1,28 @@
+from datetime import date
+from app import crud
+from app.database import SessionLocal
+
+
+def _contact(first: str, last: str, email: str) -> dict:
+    return {"first_name": first, "last_name": last, "email": email,
+            "phone": "12345", "birthday": date(1990, 1, 1), "extra": None}
+
+
+def test_search_ranks_prefix_matches_first_and_escapes_wildcards():
+    db = SessionLocal()
+    owner = crud.create_user(db, type("obj", (), {"email": "search@example.com", "password": "password123"}))
+    other = crud.create_user(db, type("obj", (), {"email": "search2@example.com", "password": "password123"}))
+    crud.create_contact(db, owner.id, _contact("Anna", "Goldsmith", "anna@x.com"))
+    crud.create_contact(db, owner.id, _contact("John", "Smith", "john@x.com"))
+    crud.create_contact(db, owner.id, _contact("Bob", "Brown", "smithy@x.com"))
+    crud.create_contact(db, owner.id, _contact("Eve", "Stone", "eve@x.com"))
+    crud.create_contact(db, other.id, _contact("Jack", "Smith", "jack@x.com"))
+
+    found = crud.search_contacts(db, owner.id, "smi")
+    assert [c.last_name for c in found] == ["Brown", "Smith", "Goldsmith"]
+    assert crud.count_contacts(db, owner.id, q="smi") == 3
+    assert crud.search_contacts(db, owner.id, "SMITH", limit=1)[0].last_name == "Brown"
+    # % і _ у запиті — звичайні символи, а не шаблони LIKE
+    assert crud.search_contacts(db, owner.id, "%") == []
+    assert crud.search_contacts(db, owner.id, "smi", last_name="gold")[0].first_name == "Anna"
+    db.close()
@@ -0,0 +1,42 @@
+import pytest
+from sqlalchemy import create_engine, exc
+from sqlalchemy.pool import NullPool
+from app import metrics
+from app.database import TimedQueuePool, engine_options, pool_stats
+from app.settings import settings
+
+PG_URL = "postgresql+psycopg2://u:p@db:5432/contacts"
+
+
+def test_engine_options_from_settings(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 3)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 2)
+    opts = engine_options(PG_URL)
+    assert opts["poolclass"] is TimedQueuePool
+    assert (opts["pool_size"], opts["max_overflow"]) == (3, 2)
+    assert opts["pool_pre_ping"] is False
+    assert engine_options("sqlite:///./x.db") == {"pool_pre_ping": False}
+
+
+def test_pgbouncer_mode_disables_app_pool_and_statement_cache(monkeypatch):
+    monkeypatch.setattr(settings, "DB_PGBOUNCER", True)
+    assert engine_options(PG_URL)["poolclass"] is NullPool
+    opts = engine_options("postgresql+asyncpg://u:p@db:6432/contacts", is_async=True)
+    assert opts["poolclass"] is NullPool
+    assert opts["connect_args"] == {"statement_cache_size": 0, "prepared_statement_cache_size": 0}
+
+
+def test_pool_checkout_metrics_and_saturation(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path}/pool.db", poolclass=TimedQueuePool,
+                        pool_size=1, max_overflow=0, pool_timeout=0.05)
+    waits, timeouts = metrics.DB_POOL_WAIT.count(), metrics.DB_POOL_TIMEOUTS.value()
+    conn = eng.connect()
+    try:
+        assert pool_stats(eng)["checked_out"] == 1
+        with pytest.raises(exc.TimeoutError):
+            eng.connect()
+    finally:
+        conn.close()
+        eng.dispose()
+    assert metrics.DB_POOL_WAIT.count() == waits + 2
+    assert metrics.DB_POOL_TIMEOUTS.value() == timeouts + 1
@@ -0,0 +1,26 @@
+import json
+from datetime import date, datetime
+from fastapi.testclient import TestClient
+from app import responses
+from tests.test_contacts_full_flow import auth
+
+
+def test_list_projection_matches_contact_out(client: TestClient):
+    h = auth(client, "fastjson1@example.com")
+    body = {"first_name": "Ann", "last_name": "Lee", "email": "ann@ex.com", "phone": "555555", "birthday": "1995-01-02", "extra": "x"}
+    cid = client.post("/contacts", json=body, headers=h).json()["id"]
+    single = client.get(f"/contacts/{cid}", headers=h).json()
+    single.pop("extra")  # списки без extra за замовчуванням
+    for params in ({}, {"mode": "cursor"}, {"q": "ann"}):
+        r = client.get("/contacts", params=params, headers=h)
+        assert r.status_code == 200 and r.headers["content-type"] == "application/json"
+        assert r.json() == [single]
+
+
+def test_dumps_without_orjson_is_equivalent(monkeypatch):
+    data = [{"id": 1, "birthday": date(1990, 1, 2), "created_at": datetime(2024, 5, 6, 7, 8, 9, 123456), "extra": None, "name": "Олена"}]
+    fast = responses.dumps(data)
+    monkeypatch.setattr(responses, "orjson", None)
+    assert json.loads(responses.dumps(data)) == json.loads(fast) == [
+        {"id": 1, "birthday": "1990-01-02", "created_at": "2024-05-06T07:08:09.123456", "extra": None, "name": "Олена"}
+    ]
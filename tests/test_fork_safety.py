@@ -0,0 +1,65 @@
+import os
+import traceback
+import pytest
+from sqlalchemy import text
+from app import avatars, cache, database, mailer, security
+from app.settings import settings
+
+fork_only = pytest.mark.skipif(not hasattr(os, "fork"), reason="потрібен os.fork (POSIX)")
+
+
+def _in_child(check) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 1
+        try:
+            check()
+            code = 0
+        except BaseException:
+            traceback.print_exc()
+        finally:
+            os._exit(code)
+    _, status = os.waitpid(pid, 0)
+    return os.waitstatus_to_exitcode(status)
+
+
+@fork_only
+def test_forked_worker_reinitializes_process_singletons(monkeypatch):
+    with database.engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    parent_pool = database.engine.pool
+    sentinel = object()
+    monkeypatch.setattr(cache, "_client", sentinel)
+    monkeypatch.setattr(security, "_executor", sentinel)
+    monkeypatch.setattr(avatars, "_executor", sentinel)
+    monkeypatch.setattr(mailer, "_local_worker", sentinel)
+    cache.local.set("user:1", {"id": 1})
+
+    def check():
+        assert database.engine.pool is not parent_pool
+        assert cache._client is None and security._executor is None
+        assert avatars._executor is None and mailer._local_worker is None
+        assert cache.local.get("user:1") is cache.MISSING
+        with database.engine.connect() as conn:  # нові з'єднання вже свої
+            assert conn.execute(text("SELECT 1")).scalar() == 1
+
+    assert _in_child(check) == 0
+    # батьківський процес не зачеплений
+    assert database.engine.pool is parent_pool and cache._client is sentinel
+    with database.engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_gunicorn_profile_defaults(monkeypatch):
+    from app import gunicorn_conf
+
+    assert gunicorn_conf.worker_class == "uvicorn.workers.UvicornWorker"
+    assert gunicorn_conf.preload_app is settings.WEB_PRELOAD
+    monkeypatch.setattr(settings, "WEB_WORKERS", 0)
+    assert gunicorn_conf.worker_count() == gunicorn_conf.cpu_count() >= 1
+    monkeypatch.setattr(settings, "WEB_WORKERS", 3)
+    assert gunicorn_conf.worker_count() == 3
+
+    monkeypatch.setattr(settings, "HASH_POOL_WORKERS", None)
+    gunicorn_conf.on_starting(type("Arbiter", (), {"num_workers": 64})())
+    assert settings.HASH_POOL_WORKERS == 1
@@ -0,0 +1,81 @@
+import pytest
+from jose import jwt
+from app import security
+from app.settings import settings
+
+
+@pytest.fixture(autouse=True)
+def _fresh_token_cache():
+    security.clear_token_cache()
+    yield
+    security.clear_token_cache()
+
+
+def test_decoded_claims_are_cached_until_exp(monkeypatch):
+    calls = []
+    real = security._verify_token
+    monkeypatch.setattr(security, "_verify_token", lambda t: calls.append(t) or real(t))
+    token = security.create_access_token(7)
+    claims = security.decode_token(token)
+    claims["sub"] = "tampered"           # копія — кеш не змінюється
+    assert security.decode_token(token)["sub"] == "7"
+    assert len(calls) == 1
+    exp = security.decode_token(token)["exp"]
+    monkeypatch.setattr(security.time, "time", lambda: exp + 1)
+    security.decode_token(token)          # запис у кеші прострочений → повна перевірка
+    assert len(calls) == 2
+
+
+def test_invalid_tokens_are_not_cached():
+    token = security.create_access_token(1)
+    with pytest.raises(Exception):
+        security.decode_token(token[:-2] + "xx")
+    assert security.decode_token(token)["sub"] == "1"
+
+
+def test_key_rotation_by_kid(monkeypatch):
+    legacy = security.create_access_token(1)                 # без kid, підписаний SECRET_KEY
+    monkeypatch.setattr(settings, "JWT_KEYS", "k1:old-secret")
+    monkeypatch.setattr(settings, "JWT_ACTIVE_KID", "k1")
+    old = security.create_access_token(2)
+    monkeypatch.setattr(settings, "JWT_KEYS", "k2:new-secret,k1:old-secret")
+    monkeypatch.setattr(settings, "JWT_ACTIVE_KID", "k2")
+    new = security.create_access_token(3)
+    assert jwt.get_unverified_header(new)["kid"] == "k2"
+    assert [security.decode_token(t)["sub"] for t in (legacy, old, new)] == ["1", "2", "3"]
+
+    monkeypatch.setattr(settings, "JWT_KEYS", "k2:new-secret")  # старий ключ виведено
+    security.clear_token_cache()
+    with pytest.raises(Exception):
+        security.decode_token(old)
+    assert security.decode_token(new)["sub"] == "3"
+
+
+def test_unknown_active_kid_is_a_config_error(monkeypatch):
+    monkeypatch.setattr(settings, "JWT_ACTIVE_KID", "missing")
+    with pytest.raises(RuntimeError):
+        security.create_access_token(1)
+
+
+def test_pyjwt_backend_is_interchangeable(monkeypatch):
+    pytest.importorskip("jwt")
+    monkeypatch.setattr(settings, "JWT_BACKEND", "pyjwt")
+    monkeypatch.setattr(settings, "TOKEN_CACHE_MAX_KEYS", 0)
+    assert security.decode_token(security.create_access_token(5))["sub"] == "5"
+
+
+def test_pyjwt_backend_does_not_touch_jose(monkeypatch):
+    pytest.importorskip("jwt")
+    monkeypatch.setattr(settings, "JWT_BACKEND", "pyjwt")
+    monkeypatch.setattr(settings, "JWT_KEYS", "k1:kid-secret")
+    monkeypatch.setattr(settings, "JWT_ACTIVE_KID", "k1")
+    token = security.create_access_token(6)  # підпис — ще python-jose
+
+    def no_jose():
+        raise AssertionError("python-jose is used on the pyjwt verify path")
+    monkeypatch.setattr(security, "_jose", no_jose)
+    assert security.decode_token(token)["sub"] == "6"
+    monkeypatch.setattr(settings, "JWT_KEYS", "k2:other")
+    security.clear_token_cache()
+    with pytest.raises(Exception, match="Unknown key id"):
+        security.decode_token(token)
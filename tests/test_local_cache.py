@@ -0,0 +1,107 @@
+import asyncio
+import time
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from app import cache, crud_async
+from app.local_cache import MISSING, LocalCache, SingleFlight
+from app.settings import settings
+from tests.helpers import register_and_login
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "_client", r)
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://dummy/0")
+    yield r
+    cache._client = None
+
+
+def test_lru_ttl_and_counters():
+    clock = Clock()
+    c = LocalCache(maxsize=2, ttl=10, clock=clock)
+    c.set("a", 1)
+    c.set("b", 2)
+    assert c.get("a") == 1
+    c.set("c", 3)                      # витісняє "b" (найдавніше використаний)
+    assert c.get("b") is MISSING
+    clock.now += 11
+    assert c.get("a") is MISSING
+    assert c.stats == {"hits": 1, "misses": 2, "evictions": 1, "expired": 1, "invalidations": 0}
+
+
+def test_stale_set_after_invalidation_is_dropped():
+    c = LocalCache()
+    token = c.token("k")
+    c.delete("k")                      # інвалідизація, поки значення читалось
+    assert not c.set("k", "old", token=token)
+    assert c.get("k") is MISSING
+
+
+def test_single_flight_coalesces_concurrent_misses():
+    sf, calls = SingleFlight(), []
+
+    async def load():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "v"
+
+    async def main():
+        return await asyncio.gather(*(sf.do("k", load) for _ in range(10)))
+
+    assert asyncio.run(main()) == ["v"] * 10
+    assert len(calls) == 1 and sf.coalesced == 9
+
+
+def test_default_avatar_served_from_memory(client: TestClient, fake_redis, monkeypatch):
+    calls = []
+    real = crud_async.meta_get
+
+    async def counting(db, key):
+        calls.append(key)
+        return await real(db, key)
+    monkeypatch.setattr(crud_async, "meta_get", counting)
+    monkeypatch.setattr(settings, "DEFAULT_AVATAR_URL", None)
+    for _ in range(5):
+        assert client.get("/users/default-avatar").json() == {"url": None}
+    assert len(calls) == 1
+    fake_redis.flushall()             # Redis теж не потрібен, поки живий рівень у пам'яті
+    assert client.get("/users/default-avatar").json() == {"url": None}
+    assert len(calls) == 1
+
+
+def test_pubsub_invalidation_reaches_other_workers(fake_redis):
+    listener = cache.InvalidationListener(fake_redis)
+    listener.start()
+    try:
+        deadline = time.monotonic() + 2
+        while not fake_redis.pubsub_numsub(cache.INVALIDATION_CHANNEL)[0][1] and time.monotonic() < deadline:
+            time.sleep(0.01)
+        cache.local.set("user:42", ({"id": 42}, 0))
+        # інший воркер інвалідизує ключ: лише повідомлення в каналі, без локального delete
+        fake_redis.publish(cache.INVALIDATION_CHANNEL, '["user:42"]')
+        while cache.local.get("user:42") is not MISSING and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert cache.local.get("user:42") is MISSING
+    finally:
+        listener.stop()
+        listener.join(timeout=3)
+
+
+def test_user_update_invalidates_memory_tier(client: TestClient, fake_redis, db_session):
+    token = register_and_login(client, "tier@example.com", "password123")
+    h = {"Authorization": f"Bearer {token}"}
+    assert client.get("/users/me", headers=h).json()["is_verified"] is False
+    client.get("/users/me", headers=h)  # Redis → пам'ять
+    assert cache.peek_user(client.get("/users/me", headers=h).json()["id"]) is not None
+    from app import crud
+    crud.set_verified(db_session, crud.get_user_by_email(db_session, "tier@example.com"))
+    assert client.get("/users/me", headers=h).json()["is_verified"] is True
@@ -0,0 +1,192 @@
+import json
+import smtplib
+import socketserver
+import threading
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from app import cache, mailer
+from app.settings import settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+
+class FlakyTransport:
+    """Перші ``fail`` відправок на адресу ``bad`` падають, решта — успішні."""
+
+    def __init__(self, bad: str, fail: int):
+        self.bad, self.fail = bad, fail
+        self.sent: list[str] = []
+        self.batches: list[int] = []
+
+    def __call__(self, messages):
+        self.batches.append(len(messages))
+        results = []
+        for msg in messages:
+            if msg["To"] == self.bad and self.fail > 0:
+                self.fail -= 1
+                results.append(smtplib.SMTPRecipientsRefused({}))
+            else:
+                self.sent.append(msg["To"])
+                results.append(None)
+        return results
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "_client", r)
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://dummy/0")
+    yield r
+    cache._client = None
+
+
+def test_redis_queue_batches_and_retries_with_backoff(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "MAIL_RETRY_BASE_SEC", 10)
+    for i in range(3):
+        mailer.enqueue(f"u{i}@example.com", "Hi", "body")
+    clock, transport = Clock(), FlakyTransport("u1@example.com", fail=1)
+    q = mailer.RedisMailQueue(fake_redis, "w1")
+    worker = mailer.MailWorker(q, transport=transport, batch_size=10, clock=clock)
+
+    assert worker.run_once(timeout=0.1) == 3
+    assert transport.batches == [3]
+    assert transport.sent == ["u0@example.com", "u2@example.com"]
+    assert fake_redis.llen(q.processing) == 0
+    [(raw, at)] = fake_redis.zrange(mailer.DELAYED_KEY, 0, -1, withscores=True)
+    assert at == clock.now + 10 and json.loads(raw)["attempts"] == 1
+
+    # до настання часу повтору лист не береться
+    assert worker.run_once(timeout=0.1) == 0
+    clock.now += 10
+    assert worker.run_once(timeout=0.1) == 1
+    assert transport.sent[-1] == "u1@example.com"
+    assert fake_redis.zcard(mailer.DELAYED_KEY) == 0 and fake_redis.llen(mailer.QUEUE_KEY) == 0
+
+
+def test_exhausted_attempts_go_to_dead_letter(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "MAIL_MAX_ATTEMPTS", 2)
+    mailer.enqueue("bad@example.com", "Hi", "body")
+    clock = Clock()
+    worker = mailer.MailWorker(mailer.RedisMailQueue(fake_redis, "w1"),
+                               transport=FlakyTransport("bad@example.com", fail=5), clock=clock)
+    worker.run_once(timeout=0.1)
+    clock.now += settings.MAIL_RETRY_MAX_SEC
+    worker.run_once(timeout=0.1)
+    [dead] = fake_redis.lrange(mailer.DEAD_KEY, 0, -1)
+    assert json.loads(dead)["attempts"] == 2
+    assert fake_redis.zcard(mailer.DELAYED_KEY) == 0
+
+
+def test_unfinished_jobs_are_recovered_after_crash(fake_redis):
+    q = mailer.RedisMailQueue(fake_redis, "w1")
+    mailer.enqueue("a@example.com", "Hi", "body")
+    assert len(q.take(10, 0.1)) == 1  # воркер "впав" до ack
+    assert fake_redis.llen(mailer.QUEUE_KEY) == 0
+    assert q.recover() == 1
+    assert fake_redis.llen(mailer.QUEUE_KEY) == 1 and fake_redis.llen(q.processing) == 0
+
+
+def test_local_queue_retries_without_redis():
+    clock = Clock()
+    q = mailer.LocalMailQueue()
+    transport = FlakyTransport("a@example.com", fail=1)
+    worker = mailer.MailWorker(q, transport=transport, clock=clock)
+    q.push(mailer.new_job("a@example.com", "Hi", "body"))
+    worker.run_once(timeout=0.1)
+    assert q.pending() == 1 and transport.sent == []
+    clock.now += mailer.backoff(1)
+    worker.run_once(timeout=0.1)
+    assert transport.sent == ["a@example.com"] and q.pending() == 0
+
+
+def test_backoff_is_exponential_and_capped(monkeypatch):
+    monkeypatch.setattr(settings, "MAIL_RETRY_BASE_SEC", 5)
+    monkeypatch.setattr(settings, "MAIL_RETRY_MAX_SEC", 30)
+    assert [mailer.backoff(n) for n in (1, 2, 3, 4, 5)] == [5, 10, 20, 30, 30]
+
+
+def test_register_enqueues_verify_email(client: TestClient, fake_redis):
+    r = client.post("/auth/register", json={"email": "mq@example.com", "password": "password123"})
+    assert r.status_code == 201
+    [raw] = fake_redis.lrange(mailer.QUEUE_KEY, 0, -1)
+    job = json.loads(raw)
+    assert job["to"] == "mq@example.com" and job["kind"] == "verify"
+    assert r.headers["X-Verify-Email"] in job["body"]
+
+
+class FakeSMTPHandler(socketserver.StreamRequestHandler):
+    """Мінімальний SMTP-сервер (без TLS і AUTH): лише те, що потрібно smtplib для відправки."""
+
+    def reply(self, line: str) -> None:
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 fake ESMTP")
+        for raw in self.rfile:
+            cmd = raw.decode().strip()
+            verb = cmd.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-fake")
+                self.reply("250 8BITMIME")
+            elif verb == "RCPT":
+                self.server.rcpts.append(cmd.split(":", 1)[1].strip().strip("<>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                for line in self.rfile:
+                    if line == b".\r\n":
+                        break
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:  # HELO, MAIL, RSET, NOOP
+                self.reply("250 OK")
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), FakeSMTPHandler)
+    server.daemon_threads = True
+    server.connections, server.rcpts = 0, []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setattr(settings, "SMTP_HOST", "127.0.0.1")
+    monkeypatch.setattr(settings, "SMTP_PORT", server.server_address[1])
+    monkeypatch.setattr(settings, "SMTP_STARTTLS", False)
+    monkeypatch.setattr(settings, "SMTP_USER", None)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_smtp_pool_reuses_connection(smtp_server):
+    pool = mailer.SMTPPool()
+    jobs = [mailer.new_job(f"p{i}@example.com", "Hi", "body") for i in range(3)]
+    assert pool.send_batch([mailer.build_message(j) for j in jobs]) == [None] * 3
+    assert pool.send_batch([mailer.build_message(jobs[0])]) == [None]
+    pool.close()
+    assert pool.opened == 1 and smtp_server.connections == 1
+    assert smtp_server.rcpts == ["p0@example.com", "p1@example.com", "p2@example.com", "p0@example.com"]
+
+
+def test_stale_processing_lists_are_reclaimed(fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "MAIL_WORKER_LEASE_SEC", 60)
+    gone, alive = mailer.RedisMailQueue(fake_redis, "pod-a:1"), mailer.RedisMailQueue(fake_redis, "pod-b:1")
+    for q in (gone, alive):
+        q.heartbeat()
+        mailer.enqueue("a@example.com", "Hi", "body")
+        assert len(q.take(1, 0.1)) == 1  # обидва взяли по задачі
+    fake_redis.delete(gone.heartbeat_key)  # оренда "pod-a" минула: його перезапустили з новим id
+
+    transport = FlakyTransport("nobody@example.com", fail=0)
+    worker = mailer.MailWorker(mailer.RedisMailQueue(fake_redis, "pod-a:2"), transport=transport, clock=Clock())
+    assert worker.run_once(timeout=0.1) == 1
+    assert transport.sent == ["a@example.com"]
+    assert fake_redis.llen(gone.processing) == 0 and fake_redis.llen(alive.processing) == 1
@@ -0,0 +1,42 @@
+import logging
+from fastapi.testclient import TestClient
+from app import crud, metrics, schemas
+from app.database import SessionLocal
+from app.settings import settings
+from tests.helpers import register_and_login
+
+
+def test_metrics_endpoint_reports_route_templates(client: TestClient):
+    token = register_and_login(client, "metrics@example.com", "password123")
+    h = {"Authorization": f"Bearer {token}"}
+    client.get("/contacts/123456", headers=h)
+    body = client.get("/metrics")
+    assert body.status_code == 200
+    assert body.headers["content-type"].startswith("text/plain")
+    text = body.text
+    # шаблон маршруту, а не конкретний id — кардинальність міток обмежена
+    assert 'http_requests_total{method="GET",route="/contacts/{contact_id}",status="' in text
+    assert "/contacts/123456" not in text
+    assert "http_request_duration_seconds_bucket" in text
+    assert 'password_hashing{stat="in_flight"}' in text
+
+
+def test_request_scope_counts_sql_statements():
+    db = SessionLocal()
+    try:
+        user = crud.create_user(db, schemas.UserCreate(email="scope@example.com", password="password123"),
+                                hashed_password="x")
+        with metrics.request_scope(collect_sql=True) as stats:
+            crud.get_user_by_email(db, user.email)
+            crud.count_contacts(db, user.id)
+        assert stats.queries == 2
+        assert len(stats.statements) == 2 and "SELECT" in stats.statements[0]
+    finally:
+        db.close()
+
+
+def test_slow_request_log(client: TestClient, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "SLOW_REQUEST_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="contacts_api.slow"):
+        assert client.get("/").status_code == 200
+    assert any("Slow request GET /" in r.getMessage() for r in caplog.records)
@@ -0,0 +1,57 @@
+import pytest
+from sqlalchemy import create_engine, inspect, text
+from app import migrate
+
+
+def test_migrate_fresh_db_is_idempotent_and_passes_check(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path}/m.db")
+    with pytest.raises(migrate.SchemaError, match="pending migrations"):
+        migrate.check_schema(eng)
+    assert migrate.migrate(eng) == [m.version for m in migrate.MIGRATIONS]
+    assert migrate.migrate(eng) == []
+    migrate.check_schema(eng)
+    assert "ix_contacts_owner_birthday_md" in {i["name"] for i in inspect(eng).get_indexes("contacts")}
+
+
+def test_old_schema_is_upgraded_in_place(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path}/old.db")
+    with eng.begin() as conn:
+        # схема до birthday_md / avatar_status
+        conn.execute(text("CREATE TABLE users (id INTEGER PRIMARY KEY, email VARCHAR(255) NOT NULL, "
+                          "hashed_password VARCHAR(255) NOT NULL, is_active BOOLEAN, is_verified BOOLEAN, "
+                          "avatar_url VARCHAR(500), role VARCHAR(20), created_at DATETIME, updated_at DATETIME)"))
+        conn.execute(text("CREATE TABLE contacts (id INTEGER PRIMARY KEY, first_name VARCHAR(100), last_name VARCHAR(100), "
+                          "email VARCHAR(255), phone VARCHAR(50), birthday DATE, extra TEXT, created_at DATETIME, "
+                          "updated_at DATETIME, owner_id INTEGER)"))
+        conn.execute(text("INSERT INTO contacts (id, first_name, last_name, email, phone, birthday, owner_id) "
+                          "VALUES (1, 'A', 'B', 'a@example.com', '12345', '1992-02-29', 1)"))
+    migrate.migrate(eng)
+    migrate.check_schema(eng)
+    with eng.connect() as conn:
+        assert conn.execute(text("SELECT birthday_md FROM contacts WHERE id = 1")).scalar() == 229
+
+
+def test_schema_drift_is_detected(tmp_path):
+    eng = create_engine(f"sqlite:///{tmp_path}/drift.db")
+    migrate.migrate(eng)
+    with eng.begin() as conn:
+        conn.execute(text("ALTER TABLE users DROP COLUMN avatar_status"))
+    with pytest.raises(migrate.SchemaError, match="avatar_status"):
+        migrate.check_schema(eng)
+
+
+def test_migrations_build_the_models_schema(tmp_path):
+    # Міграції — знімки схеми, незалежні від app.models; результат має збігатися з моделями
+    from app.models import Base
+    migrated, modeled = create_engine(f"sqlite:///{tmp_path}/migrated.db"), create_engine(f"sqlite:///{tmp_path}/models.db")
+    migrate.migrate(migrated)
+    Base.metadata.create_all(modeled)
+
+    def schema(eng):
+        insp = inspect(eng)
+        return {
+            table: ({c["name"]: (str(c["type"]), c["nullable"]) for c in insp.get_columns(table)},
+                    {i["name"] for i in insp.get_indexes(table)})
+            for table in insp.get_table_names() if table != migrate.schema_migrations.name
+        }
+    assert schema(migrated) == schema(modeled)
@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+from passlib.hash import bcrypt
+from app import crud, security
+from app.settings import settings
+
+
+def test_hashing_queue_full_returns_503(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "HASH_QUEUE_MAX", 0)
+    r = client.post("/auth/register", json={"email": "busy@example.com", "password": "password123"})
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+    assert security.hashing_stats()["rejected"] >= 1
+
+
+def test_login_rehashes_outdated_hash(client: TestClient, db_session):
+    client.post("/auth/register", json={"email": "old@example.com", "password": "password123"})
+    user = crud.get_user_by_email(db_session, "old@example.com")
+    crud.set_password_hash(db_session, user, bcrypt.using(rounds=4).hash("password123"))
+    assert security.needs_rehash(user.hashed_password)
+
+    r = client.post("/auth/login", data={"username": "old@example.com", "password": "password123"})
+    assert r.status_code == 200
+
+    db_session.expire_all()  # хеш перезаписав запит логіну в іншій сесії
+    stored = crud.get_user_by_email(db_session, "old@example.com").hashed_password
+    assert not security.needs_rehash(stored)
+    assert f"${settings.BCRYPT_ROUNDS:02d}$" in stored
+
+
+def test_hashing_stats_record_wait_and_hash_time():
+    before = security.hashing_stats()["completed"]
+    hashed = security.hash_password("password123")
+    assert security.verify_password("password123", hashed)
+    stats = security.hashing_stats()
+    assert stats["completed"] >= before + 2
+    assert stats["hash_seconds_total"] > 0
@@ -0,0 +1,63 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import ratelimit
+from app.ratelimit import MemoryRateLimiter
+from app.settings import settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+
+def test_gcra_allows_burst_then_spaces_requests():
+    clock = Clock()
+    rl = MemoryRateLimiter(clock=clock)
+    results = [rl.hit("k", 5, 60) for _ in range(6)]
+    assert [r.allowed for r in results] == [True] * 5 + [False]
+    assert [r.remaining for r in results[:5]] == [4, 3, 2, 1, 0]
+    assert results[5].retry_after == pytest.approx(12.0)
+    clock.now += 12
+    assert rl.hit("k", 5, 60).allowed
+    assert not rl.hit("k", 5, 60).allowed
+
+
+def test_memory_limiter_evicts_least_recently_used_keys():
+    rl = MemoryRateLimiter(maxsize=3, clock=Clock())
+    for k in ("a", "b", "c"):
+        rl.hit(k, 1, 60)
+    rl.hit("a", 1, 60)       # "a" стає найсвіжішим (хоч і відхилений)
+    rl.hit("d", 1, 60)
+    assert len(rl) == 3
+    assert rl.hit("b", 1, 60).allowed        # "b" витіснено → лічильник з нуля
+    assert not rl.hit("a", 1, 60).allowed
+
+
+def test_redis_limiter_shared_state():
+    pytest.importorskip("lupa")  # fakeredis виконує Lua лише з lupa
+    import fakeredis
+    r = fakeredis.FakeRedis(decode_responses=True)
+    a, b = ratelimit.RedisRateLimiter(r), ratelimit.RedisRateLimiter(r)  # два "воркери"
+    assert [a.hit("k", 2, 60).allowed, b.hit("k", 2, 60).allowed, a.hit("k", 2, 60).allowed] == [True, True, False]
+
+
+def test_me_returns_rate_limit_headers_and_429(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_ME_CALLS", 2)
+    client.post("/auth/register", json={"email": "rlh@example.com", "password": "password123"})
+    token = client.post("/auth/login", data={"username": "rlh@example.com", "password": "password123"}).json()["access_token"]
+    h = {"Authorization": f"Bearer {token}"}
+    first = client.get("/users/me", headers=h)
+    assert first.status_code == 200 and first.headers["X-RateLimit-Limit"] == "2"
+    assert first.headers["X-RateLimit-Remaining"] == "1"
+    client.get("/users/me", headers=h)
+    blocked = client.get("/users/me", headers=h)
+    assert blocked.status_code == 429 and int(blocked.headers["Retry-After"]) >= 1
+
+
+def test_login_is_rate_limited_per_ip_and_email(client: TestClient, monkeypatch):
+    monkeypatch.setattr(settings, "RATE_LIMIT_LOGIN_CALLS", 2)
+    codes = [client.post("/auth/login", data={"username": "nobody@example.com", "password": "x"}).status_code for _ in range(3)]
+    assert codes == [401, 401, 429]
+    assert client.post("/auth/login", data={"username": "other@example.com", "password": "x"}).status_code == 401
@@ -0,0 +1,111 @@
+from datetime import date
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+from app import crud, models, schemas
+from app.database import ReplicaSet, RoutingSession, WriteTracker
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    def __call__(self):
+        return self.now
+
+
+def _engine(path, last_name):
+    """Окрема SQLite-база з тим самим користувачем і контактом, що відрізняється прізвищем."""
+    eng = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(eng)
+    with Session(eng) as s:
+        s.add(models.User(id=1, email="rr@example.com", hashed_password="x", is_verified=True))
+        s.add(models.Contact(id=1, owner_id=1, first_name="Ann", last_name=last_name, email="a@example.com",
+                             phone="123456", birthday=date(1990, 1, 1)))
+        s.commit()
+    return eng
+
+
+def _names(db):
+    return [c.last_name for c in crud.list_contacts(db, 1)]
+
+
+def test_reads_go_to_replica_until_session_writes(tmp_path):
+    primary, replica = _engine(tmp_path / "p.db", "Primary"), _engine(tmp_path / "r.db", "Replica")
+    with RoutingSession(bind=primary, replicas=ReplicaSet([replica]), writes=WriteTracker()) as db:
+        assert _names(db) == ["Replica"]
+        assert crud.count_contacts(db, 1) == 1
+        crud.create_contact(db, 1, schemas.ContactCreate(first_name="Bob", last_name="New", email="b@example.com",
+                                                         phone="654321", birthday=date(1991, 2, 2)))
+        # після запису сесія читає лише з primary
+        assert sorted(_names(db)) == ["New", "Primary"]
+    with Session(replica) as r:
+        assert r.query(models.Contact).count() == 1
+
+
+def test_recent_writer_sticks_to_primary(tmp_path):
+    primary, replica = _engine(tmp_path / "p.db", "Primary"), _engine(tmp_path / "r.db", "Replica")
+    clock = Clock()
+    replicas, writes = ReplicaSet([replica]), WriteTracker(window=5, clock=clock)
+    with RoutingSession(bind=primary, replicas=replicas, writes=writes) as db:
+        db.info["user_id"] = 1
+        crud.update_contact(db, 1, 1, schemas.ContactUpdate(phone="999999"))
+    assert writes.recent(1)
+
+    with RoutingSession(bind=primary, replicas=replicas, writes=writes) as db:
+        db.info["user_id"] = 1
+        assert _names(db) == ["Primary"]
+    with RoutingSession(bind=primary, replicas=replicas, writes=writes) as db:
+        db.info["user_id"] = 2
+        assert _names(db) == ["Replica"]
+
+    clock.now += 6
+    with RoutingSession(bind=primary, replicas=replicas, writes=writes) as db:
+        db.info["user_id"] = 1
+        assert _names(db) == ["Replica"]
+
+
+def test_round_robin_skips_unhealthy_replicas(tmp_path):
+    clock = Clock()
+    a, b = create_engine(f"sqlite:///{tmp_path}/a.db"), create_engine(f"sqlite:///{tmp_path}/b.db")
+    rs = ReplicaSet([a, b], retry_after=30, clock=clock)
+    assert [rs.pick(), rs.pick(), rs.pick()] == [a, b, a]
+    rs.mark_down(b)
+    assert [rs.pick(), rs.pick()] == [a, a]
+    rs.mark_down(a)
+    assert rs.pick() is None
+    clock.now += 31
+    assert {rs.pick(), rs.pick()} == {a, b}
+
+
+def test_replica_miss_and_failure_fall_back_to_primary(tmp_path):
+    primary, replica = _engine(tmp_path / "p.db", "Primary"), _engine(tmp_path / "r.db", "Replica")
+    with Session(primary) as s:
+        s.add(models.Contact(id=2, owner_id=1, first_name="Lag", last_name="Only", email="l@example.com",
+                             phone="123456", birthday=date(1990, 1, 1)))
+        s.commit()
+    with RoutingSession(bind=primary, replicas=ReplicaSet([replica]), writes=WriteTracker()) as db:
+        # контакт ще "не доїхав" до репліки
+        assert crud.get_contact(db, 1, 2).last_name == "Only"
+
+    broken = create_engine(f"sqlite:///{tmp_path}/missing/dir/r.db")
+    replicas = ReplicaSet([broken])
+    with RoutingSession(bind=primary, replicas=replicas, writes=WriteTracker()) as db:
+        assert _names(db) == ["Primary", "Only"]
+    assert not replicas.is_healthy(broken)
+
+
+def test_recent_write_is_shared_between_workers(tmp_path):
+    import fakeredis
+    primary, replica = _engine(tmp_path / "p.db", "Primary"), _engine(tmp_path / "r.db", "Replica")
+    r = fakeredis.FakeRedis(decode_responses=True)
+    replicas = ReplicaSet([replica])
+    # два воркери: спільний Redis, окрема пам'ять процесу
+    writer, reader = WriteTracker(window=5, redis=lambda: r), WriteTracker(window=5, redis=lambda: r)
+    with RoutingSession(bind=primary, replicas=replicas, writes=writer) as db:
+        db.info["user_id"] = 1
+        crud.update_contact(db, 1, 1, schemas.ContactUpdate(phone="999999"))
+    assert not reader.recent(1) and reader.recent_shared(1) and not reader.recent_shared(2)
+    assert 0 < r.pttl("rw:1") <= 5000
+
+    with RoutingSession(bind=primary, replicas=replicas, writes=reader) as db:
+        db.info.update(user_id=1, recent_write=reader.recent_shared(1))
+        assert _names(db) == ["Primary"]
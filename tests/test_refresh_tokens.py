@@ -0,0 +1,68 @@
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from app import cache
+from app.security import create_refresh_token
+from app.settings import settings
+
+
+def _login(client: TestClient, email: str) -> dict:
+    client.post("/auth/register", json={"email": email, "password": "password123"})
+    r = client.post("/auth/login", data={"username": email, "password": "password123"})
+    return r.json()
+
+
+def _refresh(client: TestClient, token: str):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def _rotation_and_reuse(client: TestClient, email: str) -> None:
+    first = _login(client, email)["refresh_token"]
+    r = _refresh(client, first)
+    assert r.status_code == 200
+    second = r.json()["refresh_token"]
+    assert second != first and r.json()["access_token"]
+    third = _refresh(client, second).json()["refresh_token"]
+
+    # повторне використання вже заміненого токена відкликає всю родину
+    reused = _refresh(client, first)
+    assert reused.status_code == 401 and "reuse" in reused.json()["detail"]
+    assert _refresh(client, third).status_code == 401
+
+
+def _logout(client: TestClient, email: str) -> None:
+    tokens = _login(client, email)
+    other = _login(client, email)["refresh_token"]   # інший пристрій — окрема родина
+    assert client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"]}).status_code == 204
+    assert _refresh(client, tokens["refresh_token"]).status_code == 401
+    assert _refresh(client, other).status_code == 200
+
+
+def test_db_store_rotation_and_reuse_detection(client: TestClient):
+    _rotation_and_reuse(client, "rot-db@example.com")
+
+
+def test_db_store_logout(client: TestClient):
+    _logout(client, "logout-db@example.com")
+
+
+def test_untracked_refresh_token_is_rejected(client: TestClient):
+    _login(client, "legacy@example.com")
+    assert _refresh(client, create_refresh_token(1)).status_code == 401
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    pytest.importorskip("lupa")  # fakeredis виконує Lua лише з lupa
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "_client", r)
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://dummy/0")
+    monkeypatch.setattr(settings, "REFRESH_TOKEN_STORE", "redis")
+    yield r
+    cache._client = None
+
+
+def test_redis_store_rotation_and_logout(client: TestClient, redis_store):
+    _rotation_and_reuse(client, "rot-redis@example.com")
+    _logout(client, "logout-redis@example.com")
+    assert all(k.startswith("rtfam:") for k in redis_store.keys("rtfam:*"))
@@ -0,0 +1,69 @@
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from app import cache, crud_async
+from app.settings import settings
+from tests.helpers import register_and_login, verify_email_for
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "_client", r)
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://dummy/0")
+    yield r
+    cache._client = None
+
+
+def _auth(client: TestClient, email: str) -> dict:
+    register_and_login(client, email, "password123")
+    verify_email_for(client, email)
+    r = client.post("/auth/login", data={"username": email, "password": "password123"})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def _contact(i: int) -> dict:
+    return {"first_name": f"N{i}", "last_name": "Cache", "email": f"c{i}@ex.com", "phone": "555555", "birthday": "1990-01-01"}
+
+
+def test_list_is_served_from_cache_and_invalidated_by_writes(client: TestClient, fake_redis, monkeypatch):
+    h = _auth(client, "rc@example.com")
+    cid = client.post("/contacts", json=_contact(1), headers=h).json()["id"]
+    first = client.get("/contacts", params={"with_total": True}, headers=h)
+    assert first.status_code == 200 and first.headers["X-Total-Count"] == "1"
+
+    async def boom(*args, **kwargs):
+        raise AssertionError("cache hit must not query the DB")
+    with monkeypatch.context() as m:
+        m.setattr(crud_async, "list_contacts", boom)
+        m.setattr(crud_async, "count_contacts", boom)
+        hit = client.get("/contacts", params={"with_total": True}, headers=h)
+    assert hit.json() == first.json()
+    assert hit.headers["ETag"] == first.headers["ETag"] and hit.headers["X-Total-Count"] == "1"
+
+    client.put(f"/contacts/{cid}", json={"first_name": "Renamed"}, headers=h)
+    assert client.get("/contacts", headers=h).json()[0]["first_name"] == "Renamed"
+    client.post("/contacts", json=_contact(2), headers=h)
+    assert len(client.get("/contacts", headers=h).json()) == 2
+    client.delete(f"/contacts/{cid}", headers=h)
+    assert len(client.get("/contacts", headers=h).json()) == 1
+
+
+def test_etag_returns_304(client: TestClient, fake_redis):
+    h = _auth(client, "etag@example.com")
+    client.post("/contacts", json=_contact(1), headers=h)
+    r = client.get("/contacts/birthdays/upcoming", params={"days": 365}, headers=h)
+    etag = r.headers["ETag"]
+    assert client.get("/contacts/birthdays/upcoming", params={"days": 365},
+                      headers={**h, "If-None-Match": etag}).status_code == 304
+    client.post("/contacts", json=_contact(2), headers=h)
+    changed = client.get("/contacts/birthdays/upcoming", params={"days": 365}, headers={**h, "If-None-Match": etag})
+    assert changed.status_code == 200 and changed.headers["ETag"] != etag
+
+
+def test_cache_is_scoped_per_owner_and_params(client: TestClient, fake_redis):
+    a, b = _auth(client, "own-a@example.com"), _auth(client, "own-b@example.com")
+    client.post("/contacts", json=_contact(1), headers=a)
+    assert len(client.get("/contacts", headers=a).json()) == 1
+    assert client.get("/contacts", headers=b).json() == []
+    assert client.get("/contacts", params={"first_name": "zzz"}, headers=a).json() == []
@@ -0,0 +1,36 @@
+import os
+import subprocess
+import sys
+import time
+from fastapi.testclient import TestClient
+from app import main, readiness
+
+
+def test_ready_turns_green_after_warm_up(client: TestClient):
+    assert client.get("/").status_code == 200
+    deadline = time.monotonic() + 30
+    r = client.get("/ready")
+    while r.status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        r = client.get("/ready")
+    assert r.status_code == 200
+    assert r.json()["checks"]["db"] == "ok" and r.json()["checks"]["jwt"] == "ok"
+    assert readiness.timings["total"] >= readiness.timings["warmup"] > 0
+
+
+def test_ready_is_503_while_required_step_fails(client: TestClient, monkeypatch):
+    while not main._warmup_task.done():  # дочекатися прогріву, запущеного при старті
+        time.sleep(0.01)
+    def down():
+        raise ConnectionError("db is down")
+    monkeypatch.setattr(readiness, "STEPS", [("db", down, True)])
+    readiness.reset()
+    r = client.get("/ready")
+    assert r.status_code == 503 and r.json()["checks"]["db"] == "error: ConnectionError"
+
+
+def test_rarely_used_subsystems_are_not_imported_eagerly():
+    code = "import sys, app.main; print(','.join(m for m in ('jinja2', 'cloudinary', 'smtplib', 'jose') if m in sys.modules))"
+    env = dict(os.environ, DATABASE_URL="sqlite:///./lazy_test.db", REDIS_URL="", PYTHONPATH=os.pathsep.join(sys.path))
+    out = subprocess.run([sys.executable, "-c", code], env=env, capture_output=True, text=True, check=True)
+    assert out.stdout.strip() == ""
@@ -0,0 +1,61 @@
+import fakeredis
+import pytest
+from fastapi.testclient import TestClient
+from app import cache, crud, models
+from app.settings import settings
+from app.security import create_email_token
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    class DummyRedisModule:
+        @staticmethod
+        def from_url(url, decode_responses=True):
+            return r
+    monkeypatch.setattr(cache, "redis", DummyRedisModule)
+    monkeypatch.setattr(cache, "_client", None)
+    monkeypatch.setattr(settings, "REDIS_URL", "redis://dummy/0")
+    yield r
+    cache._client = None
+
+
+def _login(client: TestClient, email: str) -> dict:
+    client.post("/auth/register", json={"email": email, "password": "password123"})
+    r = client.post("/auth/login", data={"username": email, "password": "password123"})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def test_cache_hit_does_not_touch_db(client: TestClient, fake_redis, db_session):
+    h = _login(client, "hit@example.com")
+    assert client.get("/users/me", headers=h).status_code == 200  # промах → кеш
+    # користувача видалено з БД напряму, але кеш ще дійсний → БД не читається
+    db_session.query(models.User).filter(models.User.email == "hit@example.com").delete()
+    db_session.commit()
+    r = client.get("/users/me", headers=h)
+    assert r.status_code == 200 and r.json()["email"] == "hit@example.com"
+
+
+def test_verify_and_role_change_invalidate_principal(client: TestClient, fake_redis, db_session):
+    h = _login(client, "stale@example.com")
+    # закешовано як неверифікованого
+    assert client.get("/contacts", headers=h).status_code == 403
+    client.get("/auth/verify-email", params={"token": create_email_token("stale@example.com")})
+    assert client.get("/contacts", headers=h).status_code == 200
+
+    assert client.post("/users/admin/default-avatar", headers=h, params={"url": "http://x/y.png"}).status_code == 403
+    uid = db_session.query(models.User).filter(models.User.email == "stale@example.com").one().id
+    crud.set_user_role(db_session, uid, "admin")
+    assert client.post("/users/admin/default-avatar", headers=h, params={"url": "http://x/y.png"}).status_code == 201
+
+
+def test_stale_write_after_invalidation_is_ignored(fake_redis):
+    class U:
+        id = 7; email = "g@e.com"; is_active = True; is_verified = False
+        avatar_url = None; role = "user"; created_at = None; updated_at = None
+    _, gen = cache.lookup_user(7)        # запит прочитав покоління, потім БД
+    cache.invalidate_user(7)             # паралельно хтось змінив користувача
+    cache.cache_user(U(), gen=gen)       # запізнілий запис зі старими даними
+    assert cache.get_cached_user(7) is None
+    cache.cache_user(U())
+    assert cache.get_cached_user(7)["email"] == "g@e.com"